@@ -33,12 +33,28 @@ def main():
         log_dir = Path("logs")
         log_dir.mkdir(exist_ok=True)
         
+        # Трассы команд (JSON строка на команду) - в отдельный файл, если он задан
+        tracing = config.monitoring.tracing
+        if tracing.enabled and tracing.file:
+            logger.add(
+                tracing.file,
+                level="INFO",
+                rotation=config.logging.max_size,
+                retention=config.logging.backup_count,
+                filter=lambda record: 'trace' in record['extra'],
+                format="{message}"
+            )
+            general_filter = lambda record: 'trace' not in record['extra']
+        else:
+            general_filter = None
+        
         # Добавляем файловое логирование
         logger.add(
             config.logging.file,
             level=config.logging.level,
             rotation=config.logging.max_size,
             retention=config.logging.backup_count,
+            filter=general_filter,
             format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {name}:{function}:{line} | {message}"
         )
         
@@ -46,6 +62,7 @@ def main():
         logger.add(
             sys.stdout,
             level=config.logging.level,
+            filter=general_filter,
             format="<green>{time:HH:mm:ss}</green> | <level>{level}</level> | {message}"
         )
         
@@ -0,0 +1,8 @@
+"""
+Офлайн бенчмарки Disco Coop Bot (без игры, сети и Telegram)
+
+Модули запускаются через python -m, например python -m src.benchmarks.vision
+"""
+from .corpus import BenchmarkCase, load_corpus, make_synthetic_corpus
+
+__all__ = ['BenchmarkCase', 'load_corpus', 'make_synthetic_corpus']
@@ -0,0 +1,152 @@
+"""
+Корпус бенчмарка: скриншоты с ожидаемой целью и ее рамкой
+
+Корпус - каталог со скриншотами и файлом corpus.yaml:
+
+    cases:
+      - image: main_menu.png        # путь относительно каталога корпуса
+        target: "Новая игра"        # текст цели для find_element
+        bbox: [812, 540, 240, 48]   # ожидаемая рамка x, y, ширина, высота
+      - image: dialogue.png
+        target: "Уйти"
+        bbox: null                  # цели на кадре нет - правильный ответ "не найдено"
+
+Попадание засчитывается, если центр найденного элемента лежит в рамке
+(с допуском tolerance пикселей).
+"""
+import random
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import yaml
+from PIL import Image, ImageDraw, ImageFont
+
+from ..vision.models import GameElement
+
+
+CORPUS_FILE = "corpus.yaml"
+
+# Надписи кнопок синтетического корпуса (шрифт по умолчанию Pillow - только латиница)
+_SYNTHETIC_LABELS = ["NEW GAME", "CONTINUE", "LOAD GAME", "SETTINGS", "QUIT", "LEAVE",
+                     "ASK ABOUT THE BODY", "INVENTORY", "JOURNAL", "CHARACTER SHEET"]
+
+
+@dataclass
+class BenchmarkCase:
+    """Один кадр корпуса и цель поиска на нем"""
+    name: str
+    image_path: Path
+    target: str
+    bbox: Optional[Tuple[int, int, int, int]] = None  # None - цели на кадре нет
+    
+    def load_image(self) -> Image.Image:
+        """Скриншот в RGB (как у ScreenAnalyzer)"""
+        with Image.open(self.image_path) as image:
+            return image.convert('RGB')
+    
+    def is_hit(self, element: Optional[GameElement], tolerance: int = 8) -> bool:
+        """Совпадает ли результат поиска с ожидаемым"""
+        if self.bbox is None:
+            return element is None
+        if element is None:
+            return False
+        
+        x, y, width, height = self.bbox
+        return (x - tolerance <= element.center_x <= x + width + tolerance and
+                y - tolerance <= element.center_y <= y + height + tolerance)
+
+
+def load_corpus(path: str) -> List[BenchmarkCase]:
+    """
+    Загрузка корпуса из каталога с corpus.yaml
+    
+    Args:
+        path: Каталог корпуса или путь к corpus.yaml
+    
+    Returns:
+        Кейсы в порядке файла
+    """
+    corpus_path = Path(path)
+    if corpus_path.is_dir():
+        corpus_path = corpus_path / CORPUS_FILE
+    if not corpus_path.exists():
+        raise FileNotFoundError(f"Файл корпуса не найден: {corpus_path}")
+    
+    with open(corpus_path, 'r', encoding='utf-8') as f:
+        data = yaml.safe_load(f) or {}
+    
+    cases = []
+    for number, item in enumerate(data.get('cases') or [], start=1):
+        image_path = corpus_path.parent / item['image']
+        if not image_path.exists():
+            raise FileNotFoundError(f"Скриншот кейса {number} не найден: {image_path}")
+        
+        bbox = item.get('bbox')
+        if bbox is not None:
+            if len(bbox) != 4:
+                raise ValueError(f"Кейс {number}: bbox должен быть [x, y, ширина, высота]")
+            bbox = tuple(int(value) for value in bbox)
+        
+        cases.append(BenchmarkCase(
+            name=item.get('name') or f"{item['image']}:{item['target']}",
+            image_path=image_path,
+            target=str(item['target']),
+            bbox=bbox
+        ))
+    return cases
+
+
+def make_synthetic_corpus(path: str, count: int = 10, size: Tuple[int, int] = (1280, 720),
+                          seed: int = 0) -> List[BenchmarkCase]:
+    """
+    Синтетический корпус: кнопки с надписями на темном фоне
+    
+    Нужен для проверки скорости детектора, когда записанных скриншотов нет;
+    точность на нем не заменяет корпус из игры. Каждый четвертый кейс ищет
+    отсутствующую на кадре надпись.
+    
+    Args:
+        path: Каталог корпуса (создается)
+        count: Число кадров
+        size: Размер кадра
+        seed: Зерно генератора (корпус воспроизводим)
+    
+    Returns:
+        Кейсы записанного корпуса
+    """
+    corpus_dir = Path(path)
+    corpus_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    try:
+        font = ImageFont.load_default(size=22)
+    except TypeError:  # Pillow < 10.1
+        font = ImageFont.load_default()
+    
+    items = []
+    for number in range(count):
+        image = Image.new('RGB', size, (18, 20, 26))
+        draw = ImageDraw.Draw(image)
+        labels = rng.sample(_SYNTHETIC_LABELS, 4)
+        boxes = []
+        top = rng.randint(60, 200)
+        left = rng.randint(80, size[0] - 460)
+        for label in labels:
+            box = (left, top, 380, 52)
+            draw.rectangle([left, top, left + box[2], top + box[3]], fill=(44, 40, 52), outline=(200, 180, 140), width=2)
+            draw.text((left + 20, top + 14), label, fill=(235, 225, 205), font=font)
+            boxes.append(box)
+            top += box[3] + rng.randint(24, 60)
+        
+        image_name = f"synthetic_{number:03d}.png"
+        image.save(corpus_dir / image_name)
+        if number % 4 == 3:
+            missing = next(label for label in _SYNTHETIC_LABELS if label not in labels)
+            items.append({'image': image_name, 'target': missing, 'bbox': None})
+        else:
+            choice = rng.randrange(len(labels))
+            items.append({'image': image_name, 'target': labels[choice], 'bbox': list(boxes[choice])})
+    
+    with open(corpus_dir / CORPUS_FILE, 'w', encoding='utf-8') as f:
+        yaml.safe_dump({'cases': items}, f, allow_unicode=True, sort_keys=False)
+    return load_corpus(str(corpus_dir))
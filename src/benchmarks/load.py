@@ -0,0 +1,491 @@
+"""
+Нагрузочный прогон бота: много чатов одновременно шлют игровые команды
+
+    python -m src.benchmarks.load --chats 20 --commands 5 --interval 2 --llm-latency 1.5
+    python -m src.benchmarks.load --chats 50 --commands 3 --interval 0.5 --stream --json load.json
+
+Обработчики DiscoCoopBot вызываются с поддельными Update и контекстом
+(ответы в Telegram только замеряются), скриншоты дает поддельный источник
+(кадры корпуса или синтетические), ввод в игру - поддельный контроллер с
+задержкой, LLM - локальная заглушка с настраиваемой задержкой. Отчет:
+пропускная способность, хвосты задержки, отказы (лимиты, переполнение
+очереди), глубина очереди, задержки event loop и память процесса.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import itertools
+import json
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+from PIL import Image
+
+from .corpus import make_synthetic_corpus
+from .stub_llm import StubLLMServer, StubReply, StubRequest
+from ..bot.disco_bot import DiscoCoopBot
+from ..bot.scheduler import GameJob
+from ..llm.http_client import http_client
+from ..utils.config import Config, TracingConfig
+from ..utils.metrics import process_metrics
+from ..utils.tracing import tracer
+
+
+BOT_USERNAME = "disco_load_bot"
+
+# Команды нагрузки: надписи синтетического корпуса
+DEFAULT_COMMANDS = ["нажми NEW GAME", "нажми CONTINUE", "открой JOURNAL", "открой INVENTORY",
+                    "нажми SETTINGS", "выбери LEAVE", "спроси ASK ABOUT THE BODY"]
+
+
+# ---------------------------------------------------------------- Telegram
+
+class FakeTelegramBot:
+    """context.bot: get_me и send_photo с задержкой API"""
+    
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.photos = 0
+    
+    async def get_me(self) -> Any:
+        return _Obj(id=1, username=BOT_USERNAME)
+    
+    async def send_photo(self, chat_id: int, photo: Any, caption: str = "") -> None:
+        await asyncio.sleep(self.latency)
+        self.photos += 1
+
+
+class _Obj:
+    """Простой объект с атрибутами (поля Update, которые читает бот)"""
+    
+    def __init__(self, **attrs: Any):
+        self.__dict__.update(attrs)
+
+
+class FakeMessage:
+    """Сообщение Telegram: reply_text/edit_text с задержкой API и историей текстов"""
+    
+    _ids = itertools.count(1)
+    
+    def __init__(self, text: str, latency: float):
+        self.message_id = next(self._ids)
+        self.text = text
+        self.latency = latency
+        self.reply_to_message = None
+        self.texts: List[str] = [text]
+        self.replies: List[str] = []
+    
+    async def reply_text(self, text: str, **kwargs: Any) -> 'FakeMessage':
+        await asyncio.sleep(self.latency)
+        self.replies.append(text)
+        return FakeMessage(text, self.latency)
+    
+    async def edit_text(self, text: str, **kwargs: Any) -> 'FakeMessage':
+        await asyncio.sleep(self.latency)
+        self.text = text
+        self.texts.append(text)
+        return self
+
+
+def make_update(chat_id: int, text: str, group: bool, latency: float) -> Any:
+    """Поддельный Update с текстовым сообщением"""
+    return _Obj(
+        effective_chat=_Obj(id=chat_id, type='supergroup' if group else 'private',
+                            title=f"Load chat {chat_id}" if group else None),
+        effective_user=_Obj(id=chat_id * 10, username=f"player{chat_id}", first_name="Player"),
+        message=FakeMessage(text, latency)
+    )
+
+
+# ---------------------------------------------------------------- Игра
+
+class FakeScreenSource:
+    """Источник скриншотов вместо ScreenAnalyzer: кадры по кругу с задержкой захвата"""
+    
+    def __init__(self, frames: List[Image.Image], latency: float):
+        self.frames = frames
+        self.latency = latency
+        self.settler = None
+        self._next = 0
+    
+    async def take_screenshot(self) -> Optional[Image.Image]:
+        await asyncio.sleep(self.latency)
+        frame = self.frames[self._next % len(self.frames)]
+        self._next += 1
+        return frame
+    
+    async def describe_screen(self, screenshot: Image.Image) -> Optional[str]:
+        return None
+
+
+class FakeGameController:
+    """Контроллер игры: ввод только занимает время"""
+    
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.actions = 0
+    
+    def is_game_running(self) -> bool:
+        return True
+    
+    async def execute_actions(self, actions: List[Dict[str, Any]], settle: Any = None) -> bool:
+        await asyncio.sleep(self.latency * len(actions))
+        self.actions += len(actions)
+        return True
+    
+    async def stop_all_actions(self) -> None:
+        pass
+
+
+# ---------------------------------------------------------------- LLM
+
+class SyntheticResponder:
+    """Ответ analysis_prompt с целью из команды и случайной задержкой"""
+    
+    def __init__(self, latency: float, jitter: float, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+    
+    def __call__(self, request: StubRequest) -> StubReply:
+        # Цель - надпись заглавными буквами из строки с командой
+        target = "CONTINUE"
+        for line in request.prompt.splitlines():
+            words = [word for word in line.split() if word.isupper() and word.isalpha()]
+            if words:
+                target = ' '.join(words)
+        text = json.dumps({
+            "analysis": "Экран с кнопками меню",
+            "search_targets": [{"text": target, "type": "button"}],
+            "action_description": f"Нажимаю {target}"
+        }, ensure_ascii=False)
+        factor = 1 + self._rng.uniform(-self.jitter, self.jitter)
+        return StubReply(text=text, latency=max(0.0, self.latency * factor))
+
+
+# ---------------------------------------------------------------- Прогон
+
+@dataclass
+class CommandOutcome:
+    """Судьба одной отправленной команды"""
+    chat_id: int
+    command: str
+    outcome: str            # completed, failed, cancelled, coalesced, queue_full, rejected
+    latency: float          # От сообщения до последнего ответа бота (сек)
+    position: Optional[int] = None
+    reply: str = ""
+
+
+@dataclass
+class LoadReport:
+    """Сводка нагрузочного прогона"""
+    chats: int
+    commands: int
+    wall_time: float
+    completed_per_second: float
+    outcomes: Dict[str, int]
+    latency: Dict[str, float]             # p50/p95/p99/max выполненных команд (сек)
+    queue: Dict[str, float]               # глубина очереди и ожидание в ней
+    event_loop_lag: Dict[str, float]      # p95/max задержки event loop (сек)
+    memory_mb: Dict[str, float]           # RSS до, пик и после
+    stages: Dict[str, Dict[str, float]]
+    llm_requests: int
+    rejections: Dict[str, int] = field(default_factory=dict)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+    
+    def format(self) -> str:
+        """Отчет для консоли"""
+        lines = [
+            f"👥 Чатов: {self.chats}, команд: {self.commands}, время: {self.wall_time:.1f}с, "
+            f"выполнено {self.completed_per_second:.2f} команд/с",
+            f"📬 Исходы: {self.outcomes}",
+        ]
+        if self.rejections:
+            lines.append(f"🚫 Отказы: {self.rejections}")
+        if self.latency:
+            lines.append(
+                f"⏱️ Команда: p50 {self.latency['p50']:.2f}с, p95 {self.latency['p95']:.2f}с, "
+                f"p99 {self.latency['p99']:.2f}с, max {self.latency['max']:.2f}с"
+            )
+        lines.append(
+            f"📥 Очередь: глубина max {self.queue['max_depth']:.0f}, средняя {self.queue['mean_depth']:.1f}; "
+            f"ожидание p50 {self.queue['wait_p50']:.2f}с, p95 {self.queue['wait_p95']:.2f}с"
+        )
+        lines.append(f"🔄 Задержка event loop: p95 {self.event_loop_lag['p95'] * 1000:.1f} мс, "
+                     f"max {self.event_loop_lag['max'] * 1000:.1f} мс")
+        if self.memory_mb:
+            lines.append(f"💾 RSS: {self.memory_mb['start']:.0f} -> пик {self.memory_mb['peak']:.0f} -> "
+                         f"{self.memory_mb['end']:.0f} МБ")
+        lines.append("⏱️ Стадии (p50/p95, мс, замеров):")
+        for name, values in sorted(self.stages.items(), key=lambda item: -item[1]['p95']):
+            lines.append(f"   {name:<18}{values['p50'] * 1000:>9.1f}{values['p95'] * 1000:>9.1f}{values['count']:>7}")
+        lines.append(f"🤖 Запросов к заглушке LLM: {self.llm_requests}")
+        return '\n'.join(lines)
+
+
+def _quantile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def _rss_mb() -> Optional[float]:
+    families = list(process_metrics())
+    return families[0].samples[0][1] / 1024 / 1024 if families else None
+
+
+class LoadGenerator:
+    """
+    Чаты шлют команды с паузой interval (экспоненциальное распределение,
+    как у независимых игроков) через обработчик сообщений бота. Итог
+    команды приходит из on_job_event очереди (по message_id сообщения),
+    отказы до постановки в очередь - по ответу бота.
+    """
+    
+    def __init__(self, config: Config, frames: List[Image.Image], commands: List[str],
+                 chats: int = 10, commands_per_chat: int = 5, interval: float = 2.0,
+                 group: bool = True, llm_latency: float = 1.5, llm_jitter: float = 0.3,
+                 capture_latency: float = 0.05, input_latency: float = 0.1,
+                 telegram_latency: float = 0.05, seed: int = 0):
+        self.config = config
+        self.frames = frames
+        self.commands = commands
+        self.chats = chats
+        self.commands_per_chat = commands_per_chat
+        self.interval = interval
+        self.group = group
+        self.telegram_latency = telegram_latency
+        self.capture_latency = capture_latency
+        self.input_latency = input_latency
+        self.responder = SyntheticResponder(llm_latency, llm_jitter, seed)
+        self._rng = random.Random(seed)
+        self._depths: List[int] = []
+        self._lags: List[float] = []
+        self._rss_samples: List[float] = []
+        self._completions: Dict[int, asyncio.Future] = {}
+        self._positions: Dict[int, int] = {}
+    
+    def _configure(self, stub: StubLLMServer) -> None:
+        config = self.config
+        config.telegram.allowed_chats = [1000 + chat for chat in range(self.chats)]
+        config.llm.base_url = stub.url
+        config.llm.api_key = config.llm.api_key or "load"
+        config.llm.fallbacks = []
+        config.llm.http.warm_up = False
+        config.monitoring.metrics.enabled = False
+        config.monitoring.recorder.enabled = False
+    
+    async def run(self) -> LoadReport:
+        """Прогон нагрузки"""
+        stub = StubLLMServer(self.responder)
+        await stub.start()
+        self._configure(stub)
+        tracer.configure(TracingConfig(enabled=False, window=100000))
+        
+        telegram = FakeTelegramBot(self.telegram_latency)
+        bot = DiscoCoopBot(
+            self.config,
+            game_controller=FakeGameController(self.input_latency),
+            screen_analyzer=FakeScreenSource(self.frames, self.capture_latency)
+        )
+        bot.scheduler.on_job_event = lambda job, event: self._on_job_event(bot, job, event)
+        
+        rss_start = _rss_mb()
+        rss_peak = rss_start
+        bot.scheduler.start()
+        monitor = asyncio.ensure_future(self._monitor(bot))
+        started = time.perf_counter()
+        try:
+            outcomes = await asyncio.gather(*(
+                self._chat(bot, telegram, 1000 + chat) for chat in range(self.chats)
+            ))
+            wall_time = time.perf_counter() - started
+        finally:
+            monitor.cancel()
+            await bot.scheduler.stop()
+            await stub.stop()
+            await http_client.close()
+        
+        results = [outcome for chat in outcomes for outcome in chat]
+        rss_end = _rss_mb()
+        if rss_start is not None:
+            rss_peak = max([rss_peak, rss_end] + self._rss_samples)
+        
+        completed = sorted(result.latency for result in results if result.outcome == 'completed')
+        stages = tracer.stats()
+        queue_stage = stages.get('queue', {})
+        return LoadReport(
+            chats=self.chats,
+            commands=len(results),
+            wall_time=wall_time,
+            completed_per_second=len(completed) / wall_time if wall_time > 0 else 0.0,
+            outcomes=dict(Counter(result.outcome for result in results)),
+            latency={
+                'p50': _quantile(completed, 0.5), 'p95': _quantile(completed, 0.95),
+                'p99': _quantile(completed, 0.99), 'max': completed[-1]
+            } if completed else {},
+            queue={
+                'max_depth': max(self._depths, default=0),
+                'mean_depth': sum(self._depths) / len(self._depths) if self._depths else 0.0,
+                'wait_p50': queue_stage.get('p50', 0.0),
+                'wait_p95': queue_stage.get('p95', 0.0),
+            },
+            event_loop_lag={'p95': _quantile(sorted(self._lags), 0.95), 'max': max(self._lags, default=0.0)},
+            memory_mb={'start': rss_start, 'peak': rss_peak, 'end': rss_end} if rss_start is not None else {},
+            stages=stages,
+            llm_requests=stub.requests,
+            rejections=dict(Counter(result.reply for result in results if result.outcome == 'rejected'))
+        )
+    
+    def _on_job_event(self, bot: DiscoCoopBot, job: GameJob, event: str) -> None:
+        """Событие очереди -> future команды (по id исходного сообщения)"""
+        future = self._completions.get(job.message_id)
+        if future is None or future.done():
+            return
+        if event == 'queued':
+            self._positions[job.message_id] = bot.scheduler.position(job)
+        else:
+            future.set_result(event)
+    
+    async def _chat(self, bot: DiscoCoopBot, telegram: FakeTelegramBot, chat_id: int) -> List[CommandOutcome]:
+        """Один чат: команды с паузами, следующая не ждет завершения предыдущей"""
+        pending = []
+        for _ in range(self.commands_per_chat):
+            await asyncio.sleep(self._rng.expovariate(1 / self.interval) if self.interval > 0 else 0)
+            command = self._rng.choice(self.commands)
+            pending.append(asyncio.ensure_future(self._command(bot, telegram, chat_id, command)))
+        return list(await asyncio.gather(*pending))
+    
+    async def _command(self, bot: DiscoCoopBot, telegram: FakeTelegramBot,
+                       chat_id: int, command: str) -> CommandOutcome:
+        text = f"@{BOT_USERNAME} {command}" if self.group else command
+        update = make_update(chat_id, text, self.group, self.telegram_latency)
+        context = _Obj(bot=telegram, args=None)
+        message_id = update.message.message_id
+        future = self._completions[message_id] = asyncio.get_running_loop().create_future()
+        start = time.perf_counter()
+        try:
+            if self.group:
+                await bot.handle_group_message(update, context)
+            else:
+                await bot.handle_private_message(update, context)
+            
+            if not future.done() and message_id not in self._positions:
+                # Отказ до постановки в очередь (доступ, лимит команд, бюджет LLM)
+                return CommandOutcome(chat_id, command, 'rejected', time.perf_counter() - start,
+                                      reply=self._reply_kind(update))
+            outcome = await future
+            return CommandOutcome(chat_id, command, outcome, time.perf_counter() - start,
+                                  position=self._positions.get(message_id))
+        finally:
+            self._completions.pop(message_id, None)
+            self._positions.pop(message_id, None)
+    
+    @staticmethod
+    def _reply_kind(update: Any) -> str:
+        """Причина отказа по ответу бота"""
+        text = update.message.replies[-1] if update.message.replies else ''
+        if 'лимит команд' in text:
+            return 'rate_limit'
+        if 'Доступ' in text:
+            return 'access'
+        return 'budget' if text.startswith('💸') else 'other'
+    
+    async def _monitor(self, bot: DiscoCoopBot, period: float = 0.05) -> None:
+        """Глубина очереди, задержка event loop и RSS"""
+        loop = asyncio.get_running_loop()
+        samples = 0
+        while True:
+            expected = loop.time() + period
+            await asyncio.sleep(period)
+            self._lags.append(max(0.0, loop.time() - expected))
+            self._depths.append(bot.scheduler.stats()['pending'])
+            samples += 1
+            if samples % 20 == 0:
+                rss = _rss_mb()
+                if rss is not None:
+                    self._rss_samples.append(rss)
+
+
+def load_frames(path: Optional[str]) -> List[Image.Image]:
+    """Кадры из каталога PNG/JPEG или синтетический корпус"""
+    if path:
+        files = sorted(p for p in Path(path).iterdir() if p.suffix.lower() in ('.png', '.jpg', '.jpeg'))
+    else:
+        # Синтетический корпус нужен только на время чтения кадров
+        with tempfile.TemporaryDirectory(prefix='disco_load_') as directory:
+            make_synthetic_corpus(directory, count=8)
+            return _read_frames(sorted(Path(directory).glob('*.png')))
+    if not files:
+        raise FileNotFoundError(f"Нет кадров в {path}")
+    return _read_frames(files)
+
+
+def _read_frames(files: List[Path]) -> List[Image.Image]:
+    frames = []
+    for file in files:
+        with Image.open(file) as image:
+            frames.append(image.convert('RGB'))
+    return frames
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа командной строки"""
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон обработчиков бота")
+    parser.add_argument("--config", help="Файл конфигурации (по умолчанию config/config.yaml)")
+    parser.add_argument("--chats", type=int, default=10, help="Одновременных чатов")
+    parser.add_argument("--commands", type=int, default=5, help="Команд от каждого чата")
+    parser.add_argument("--interval", type=float, default=2.0, help="Средняя пауза между командами чата (сек)")
+    parser.add_argument("--private", action="store_true", help="Личные чаты вместо групп")
+    parser.add_argument("--frames", help="Каталог кадров (по умолчанию - синтетические)")
+    parser.add_argument("--llm-latency", type=float, default=1.5, help="Задержка ответа LLM (сек)")
+    parser.add_argument("--llm-jitter", type=float, default=0.3, help="Разброс задержки LLM (доля)")
+    parser.add_argument("--provider", help="Формат заглушки LLM: ollama, openai, anthropic (по умолчанию из конфигурации)")
+    parser.add_argument("--stream", action="store_true", help="Потоковые ответы LLM")
+    parser.add_argument("--capture-latency", type=float, default=0.05, help="Задержка захвата кадра (сек)")
+    parser.add_argument("--input-latency", type=float, default=0.1, help="Задержка ввода в игру (сек)")
+    parser.add_argument("--telegram-latency", type=float, default=0.05, help="Задержка вызова Telegram API (сек)")
+    parser.add_argument("--seed", type=int, default=0, help="Зерно генератора нагрузки")
+    parser.add_argument("--json", dest="json_path", help="Сохранить отчет в JSON")
+    parser.add_argument("--verbose", action="store_true", help="Показывать журнал и диагностику бота")
+    args = parser.parse_args(argv)
+    
+    config = Config.load(args.config)
+    if args.provider:
+        config.llm.provider = args.provider
+    if args.stream:
+        config.llm.stream = True
+    
+    if not args.verbose:
+        logger.remove()
+        logger.add(sys.stderr, level="WARNING")
+    
+    generator = LoadGenerator(
+        config, load_frames(args.frames), DEFAULT_COMMANDS,
+        chats=args.chats, commands_per_chat=args.commands, interval=args.interval,
+        group=not args.private, llm_latency=args.llm_latency, llm_jitter=args.llm_jitter,
+        capture_latency=args.capture_latency, input_latency=args.input_latency,
+        telegram_latency=args.telegram_latency, seed=args.seed
+    )
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        report = asyncio.run(generator.run())
+    print(report.format())
+    
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report.to_dict(), f, ensure_ascii=False, indent=2)
+        print(f"💾 Отчет сохранен: {args.json_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
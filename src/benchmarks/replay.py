@@ -0,0 +1,304 @@
+"""
+Воспроизведение записанной сессии без игры, Telegram и внешнего LLM
+
+    python -m src.benchmarks.replay recordings/20250101-120000
+    python -m src.benchmarks.replay recordings/20250101-120000 --concurrency 4 --loops 5 --profile replay.prof
+
+Каждая команда журнала (monitoring.recorder) проходит через
+HybridScreenAnalyzer на записанном кадре; LLM отвечает локальная заглушка
+записанными ответами с записанной задержкой (--latency-scale меняет ее
+масштаб). Отчет: задержка команд, стадии из трассировщика, совпадение
+метода и координат с записью.
+"""
+import argparse
+import asyncio
+import contextlib
+import cProfile
+import io
+import json
+import math
+import pstats
+import sys
+import time
+from collections import Counter, deque
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+from PIL import Image
+
+from .stub_llm import StubLLMServer, StubReply, StubRequest
+from ..llm.http_client import http_client
+from ..utils.config import Config, TracingConfig
+from ..utils.recorder import FRAMES_DIR, load_session
+from ..utils.tracing import tracer
+from ..vision.hybrid_analyzer import HybridScreenAnalyzer
+from ..vision.ocr_engine import ocr_engines
+
+
+# Ответ на запрос, которого нет в записи (цели не найдутся, команда завершится как failed)
+EMPTY_ANALYSIS = '{"analysis": "", "search_targets": [], "action_description": ""}'
+
+
+class RecordedResponder:
+    """
+    Ответы LLM из журнала сессии.
+    
+    Запрос сопоставляется с записью по тексту команды в промпте (промпты
+    при воспроизведении берутся из текущей конфигурации); если одна команда
+    встречалась несколько раз, ответы выдаются по кругу в порядке записи.
+    """
+    
+    def __init__(self, records: List[Dict[str, Any]], default_latency: float = 1.0):
+        self.default_latency = default_latency
+        self._exchanges: Dict[str, Deque[Dict[str, Any]]] = {}
+        for record in records:
+            for exchange in record.get('llm', []):
+                key = record['command']
+                self._exchanges.setdefault(key, deque()).append(exchange)
+        # Длинные ключи первыми: "открой дверь слева" не должна отвечать на "открой дверь"
+        self._keys = sorted(self._exchanges, key=len, reverse=True)
+        self.misses = 0
+    
+    def __call__(self, request: StubRequest) -> StubReply:
+        for key in self._keys:
+            if key and key in request.prompt:
+                exchanges = self._exchanges[key]
+                exchange = exchanges[0]
+                exchanges.rotate(-1)
+                usage = exchange.get('usage') or {}
+                return StubReply(
+                    text=exchange.get('response', ''),
+                    latency=float(exchange.get('latency') or 0.0),
+                    prompt_tokens=usage.get('prompt_tokens'),
+                    completion_tokens=usage.get('completion_tokens')
+                )
+        self.misses += 1
+        return StubReply(text=EMPTY_ANALYSIS, latency=self.default_latency)
+
+
+@dataclass
+class ReplayResult:
+    """Результат одной команды"""
+    command: str
+    latency: float
+    method: Optional[str]
+    recorded_method: Optional[str]
+    coordinates: Optional[List[int]]
+    recorded_coordinates: Optional[List[int]]
+    coordinates_match: bool
+
+
+@dataclass
+class ReplayReport:
+    """Сводка воспроизведения"""
+    commands: int
+    concurrency: int
+    wall_time: float
+    commands_per_second: float
+    latency: Dict[str, float]             # p50/p95/max (сек)
+    stages: Dict[str, Dict[str, float]]   # tracer.stats()
+    method_agreement: float
+    coordinates_agreement: float
+    methods: Dict[str, int]
+    llm_requests: int
+    unmatched_llm_requests: int
+    results: List[ReplayResult] = field(default_factory=list)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+    
+    def format(self) -> str:
+        """Отчет для консоли"""
+        lines = [
+            f"📼 Команд: {self.commands} (параллельно {self.concurrency}) за {self.wall_time:.2f}с - "
+            f"{self.commands_per_second:.2f} команд/с",
+            f"⏱️ Команда: p50 {self.latency['p50'] * 1000:.0f} мс, p95 {self.latency['p95'] * 1000:.0f} мс, "
+            f"max {self.latency['max'] * 1000:.0f} мс",
+            "⏱️ Стадии (p50/p95, мс, замеров):",
+        ]
+        for name, values in sorted(self.stages.items(), key=lambda item: -item[1]['p95']):
+            lines.append(f"   {name:<16}{values['p50'] * 1000:>9.1f}{values['p95'] * 1000:>9.1f}{values['count']:>7}")
+        lines.append(f"🧭 Методы: {dict(self.methods)}")
+        lines.append(f"🎯 Совпадение с записью: метод {self.method_agreement:.1%}, "
+                     f"координаты {self.coordinates_agreement:.1%}")
+        lines.append(f"🤖 Запросов к заглушке LLM: {self.llm_requests}, без записанного ответа: "
+                     f"{self.unmatched_llm_requests}")
+        return '\n'.join(lines)
+
+
+def _quantile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+class ReplayRunner:
+    """Прогон записанных команд через HybridScreenAnalyzer с заглушкой LLM"""
+    
+    def __init__(self, config: Config, session_dir: str, latency_scale: float = 1.0,
+                 cold: bool = False, tolerance: int = 8):
+        self.config = config
+        self.session_dir = Path(session_dir)
+        self.records = [record for record in load_session(session_dir) if record.get('frame')]
+        self.latency_scale = latency_scale
+        self.cold = cold
+        self.tolerance = tolerance
+        self._frames: Dict[str, Image.Image] = {}
+    
+    def _frame(self, name: str) -> Image.Image:
+        frame = self._frames.get(name)
+        if frame is None:
+            with Image.open(self.session_dir / FRAMES_DIR / name) as image:
+                frame = self._frames[name] = image.convert('RGB')
+        return frame
+    
+    def _configure(self, stub: StubLLMServer) -> None:
+        """LLM конфигурации указывает на заглушку с провайдером из записи"""
+        llm = self.config.llm
+        providers = Counter(
+            exchange['provider'] for record in self.records for exchange in record.get('llm', [])
+        )
+        if providers:
+            llm.provider = providers.most_common(1)[0][0]
+        llm.base_url = stub.url
+        llm.api_key = llm.api_key or "replay"
+        llm.fallbacks = []
+        llm.http.warm_up = False
+        
+        if self.cold:
+            # Каждая команда проходит весь конвейер, как в первый раз
+            llm.plan_cache.enabled = False
+            self.config.vision.ocr.cache_size = 0
+            self.config.vision.ocr.incremental = False
+        
+        http_client.configure(llm.http)
+        tracer.configure(TracingConfig(enabled=False, window=100000))
+    
+    async def run(self, concurrency: int = 1, loops: int = 1) -> ReplayReport:
+        """
+        Воспроизведение
+        
+        Args:
+            concurrency: Команд одновременно (нагрузочный прогон)
+            loops: Сколько раз пройти журнал
+        
+        Returns:
+            Отчет
+        """
+        if not self.records:
+            raise ValueError(f"В журнале {self.session_dir} нет команд с кадрами")
+        
+        responder = RecordedResponder(self.records)
+        models = sorted({exchange['model'] for record in self.records for exchange in record.get('llm', [])})
+        stub = StubLLMServer(responder, latency_scale=self.latency_scale, models=models)
+        await stub.start()
+        try:
+            self._configure(stub)
+            analyzer = HybridScreenAnalyzer(self.config)
+            if ocr_engines.supported:
+                # Загрузка моделей OCR не входит в замер
+                ocr_engines.get_reader(analyzer.element_detector.ocr_detector.languages)
+            for record in self.records:
+                self._frame(record['frame'])
+            
+            semaphore = asyncio.Semaphore(max(1, concurrency))
+            
+            async def replay(record: Dict[str, Any]) -> ReplayResult:
+                async with semaphore:
+                    return await self._replay_command(analyzer, record)
+            
+            started = time.perf_counter()
+            results = await asyncio.gather(*(
+                replay(record) for _ in range(max(1, loops)) for record in self.records
+            ))
+            wall_time = time.perf_counter() - started
+        finally:
+            await stub.stop()
+            await http_client.close()
+        
+        latencies = sorted(result.latency for result in results)
+        return ReplayReport(
+            commands=len(results),
+            concurrency=concurrency,
+            wall_time=wall_time,
+            commands_per_second=len(results) / wall_time if wall_time > 0 else 0.0,
+            latency={'p50': _quantile(latencies, 0.5), 'p95': _quantile(latencies, 0.95), 'max': latencies[-1]},
+            stages=tracer.stats(),
+            method_agreement=sum(1 for r in results if r.method == r.recorded_method) / len(results),
+            coordinates_agreement=sum(1 for r in results if r.coordinates_match) / len(results),
+            methods=dict(Counter(result.method or 'none' for result in results)),
+            llm_requests=stub.requests,
+            unmatched_llm_requests=responder.misses,
+            results=list(results)
+        )
+    
+    async def _replay_command(self, analyzer: HybridScreenAnalyzer, record: Dict[str, Any]) -> ReplayResult:
+        trace = tracer.new_trace('replay', command=record['command'])
+        start = time.perf_counter()
+        with tracer.activate(trace), tracer.span('analysis'):
+            result = await analyzer.analyze_and_find_element(self._frame(record['frame']), record['command'])
+        latency = time.perf_counter() - start
+        tracer.finish(trace)
+        
+        detection = record.get('detection') or {}
+        coordinates = list(result['coordinates']) if result and result.get('coordinates') else None
+        recorded = detection.get('coordinates')
+        if coordinates is None or recorded is None:
+            coordinates_match = coordinates is None and recorded is None
+        else:
+            coordinates_match = math.dist(coordinates, recorded) <= self.tolerance
+        return ReplayResult(
+            command=record['command'],
+            latency=latency,
+            method=(result or {}).get('method'),
+            recorded_method=detection.get('method'),
+            coordinates=coordinates,
+            recorded_coordinates=recorded,
+            coordinates_match=coordinates_match
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа командной строки"""
+    parser = argparse.ArgumentParser(description="Воспроизведение записанной сессии команд")
+    parser.add_argument("session", help="Каталог сессии (monitoring.recorder)")
+    parser.add_argument("--config", help="Файл конфигурации (по умолчанию config/config.yaml)")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="Масштаб записанной задержки LLM (0 - мгновенные ответы)")
+    parser.add_argument("--concurrency", type=int, default=1, help="Команд одновременно")
+    parser.add_argument("--loops", type=int, default=1, help="Повторов журнала")
+    parser.add_argument("--cold", action="store_true", help="Без кэша планов и кэша OCR")
+    parser.add_argument("--json", dest="json_path", help="Сохранить отчет в JSON")
+    parser.add_argument("--profile", help="Сохранить профиль cProfile в файл")
+    parser.add_argument("--verbose", action="store_true", help="Показывать диагностику конвейера")
+    args = parser.parse_args(argv)
+    
+    runner = ReplayRunner(Config.load(args.config), args.session,
+                          latency_scale=args.latency_scale, cold=args.cold)
+    
+    profiler = cProfile.Profile() if args.profile else None
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        if profiler:
+            profiler.enable()
+        try:
+            report = asyncio.run(runner.run(concurrency=args.concurrency, loops=args.loops))
+        finally:
+            if profiler:
+                profiler.disable()
+    
+    print(report.format())
+    
+    if profiler:
+        profiler.dump_stats(args.profile)
+        print(f"💾 Профиль сохранен: {args.profile}")
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(15)
+    
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report.to_dict(), f, ensure_ascii=False, indent=2)
+        print(f"💾 Отчет сохранен: {args.json_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
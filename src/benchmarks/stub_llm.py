@@ -0,0 +1,237 @@
+"""
+Локальный сервер-заглушка LLM: форматы Ollama, OpenAI-совместимого API и Anthropic
+
+Ответы выдает функция responder, задержка эмулируется на сервере
+(с потоковой выдачей по фрагментам), поэтому агент, роутер и бюджет
+работают так же, как с настоящим провайдером.
+"""
+import asyncio
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from aiohttp import web
+
+from ..llm.budget import estimate_tokens
+
+
+@dataclass
+class StubRequest:
+    """Запрос, пришедший в заглушку"""
+    api: str            # ollama, openai, anthropic
+    model: str
+    prompt: str         # Весь текст запроса (system + user)
+    stream: bool
+    prefill: str = ""   # Начало ответа за модель (Anthropic)
+
+
+@dataclass
+class StubReply:
+    """Ответ заглушки"""
+    text: str
+    latency: float = 0.0                      # Время генерации всего ответа (сек)
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+
+
+Responder = Callable[[StubRequest], StubReply]
+
+
+def _text_parts(content: Any) -> List[str]:
+    """Текст из content сообщения (строка или список частей)"""
+    if isinstance(content, str):
+        return [content]
+    if isinstance(content, list):
+        return [part.get('text', '') for part in content if isinstance(part, dict) and part.get('type') == 'text']
+    return []
+
+
+class StubLLMServer:
+    """
+    HTTP заглушка LLM на aiohttp.
+    
+    - Ollama: /api/generate (NDJSON поток или один JSON), /api/tags
+    - OpenAI-совместимые: /v1/chat/completions (SSE с usage в конце)
+    - Anthropic: /v1/messages (SSE события или один JSON, prefill учитывается)
+    
+    Задержка ответа умножается на latency_scale; в потоке она делится
+    поровну между фрагментами по chunk_chars символов.
+    """
+    
+    def __init__(self, responder: Responder, host: str = "127.0.0.1", port: int = 0,
+                 latency_scale: float = 1.0, chunk_chars: int = 16, models: Optional[List[str]] = None):
+        self.responder = responder
+        self.host = host
+        self.port = port
+        self.latency_scale = latency_scale
+        self.chunk_chars = max(1, chunk_chars)
+        self.models = models or []
+        self.requests = 0
+        self._runner: Optional[web.AppRunner] = None
+    
+    @property
+    def url(self) -> str:
+        """Базовый URL для llm.base_url"""
+        return f"http://{self.host}:{self.port}"
+    
+    async def start(self) -> None:
+        app = web.Application(client_max_size=64 * 1024 * 1024)  # base64 кадры в запросах
+        app.router.add_get('/api/tags', self._handle_tags)
+        app.router.add_post('/api/generate', self._handle_ollama)
+        app.router.add_post('/v1/chat/completions', self._handle_openai)
+        app.router.add_post('/v1/messages', self._handle_anthropic)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # port=0 - порт выбирает система
+        self.port = self._runner.addresses[0][1]
+    
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+    
+    async def __aenter__(self) -> 'StubLLMServer':
+        await self.start()
+        return self
+    
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.stop()
+    
+    def _reply(self, request: StubRequest) -> StubReply:
+        self.requests += 1
+        reply = self.responder(request)
+        text = reply.text
+        if request.prefill and text.startswith(request.prefill):
+            # Агент сам добавляет prefill к ответу
+            text = text[len(request.prefill):]
+        return StubReply(
+            text=text,
+            latency=reply.latency * self.latency_scale,
+            prompt_tokens=reply.prompt_tokens if reply.prompt_tokens is not None else estimate_tokens(request.prompt),
+            completion_tokens=(reply.completion_tokens if reply.completion_tokens is not None
+                               else estimate_tokens(reply.text))
+        )
+    
+    def _chunks(self, text: str) -> List[str]:
+        return [text[i:i + self.chunk_chars] for i in range(0, len(text), self.chunk_chars)] or ['']
+    
+    async def _stream(self, http_request: web.Request, reply: StubReply, content_type: str,
+                      lines: List[bytes], tail: List[bytes]) -> web.StreamResponse:
+        """Отдача фрагментов с равномерной задержкой"""
+        response = web.StreamResponse(headers={'Content-Type': content_type})
+        await response.prepare(http_request)
+        delay = reply.latency / len(lines) if lines else reply.latency
+        for line in lines:
+            await asyncio.sleep(delay)
+            await response.write(line)
+        for line in tail:
+            await response.write(line)
+        await response.write_eof()
+        return response
+    
+    async def _handle_tags(self, request: web.Request) -> web.Response:
+        return web.json_response({'models': [{'name': name} for name in self.models]})
+    
+    async def _handle_ollama(self, http_request: web.Request) -> web.StreamResponse:
+        payload = await http_request.json()
+        request = StubRequest(
+            api='ollama',
+            model=payload.get('model', ''),
+            prompt='\n'.join(filter(None, [payload.get('system'), payload.get('prompt')])),
+            stream=bool(payload.get('stream'))
+        )
+        reply = self._reply(request)
+        final = {
+            'model': request.model,
+            'done': True,
+            'done_reason': 'stop',
+            'prompt_eval_count': reply.prompt_tokens,
+            'eval_count': reply.completion_tokens,
+        }
+        if not request.stream:
+            await asyncio.sleep(reply.latency)
+            return web.json_response({**final, 'response': reply.text})
+        
+        lines = [
+            (json.dumps({'model': request.model, 'response': chunk, 'done': False}, ensure_ascii=False) + '\n').encode()
+            for chunk in self._chunks(reply.text)
+        ]
+        tail = [(json.dumps({**final, 'response': ''}) + '\n').encode()]
+        return await self._stream(http_request, reply, 'application/x-ndjson', lines, tail)
+    
+    async def _handle_openai(self, http_request: web.Request) -> web.StreamResponse:
+        payload = await http_request.json()
+        prompt = '\n'.join(
+            text for message in payload.get('messages', []) for text in _text_parts(message.get('content'))
+        )
+        request = StubRequest(api='openai', model=payload.get('model', ''), prompt=prompt,
+                              stream=bool(payload.get('stream')))
+        reply = self._reply(request)
+        usage = {'prompt_tokens': reply.prompt_tokens, 'completion_tokens': reply.completion_tokens,
+                 'total_tokens': reply.prompt_tokens + reply.completion_tokens}
+        if not request.stream:
+            await asyncio.sleep(reply.latency)
+            return web.json_response({
+                'model': request.model,
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': reply.text},
+                             'finish_reason': 'stop'}],
+                'usage': usage,
+            })
+        
+        def event(data: Dict[str, Any]) -> bytes:
+            return f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode()
+        
+        lines = [
+            event({'model': request.model, 'choices': [{'index': 0, 'delta': {'content': chunk}}]})
+            for chunk in self._chunks(reply.text)
+        ]
+        tail = [
+            event({'model': request.model, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]}),
+            event({'model': request.model, 'choices': [], 'usage': usage}),
+            b"data: [DONE]\n\n",
+        ]
+        return await self._stream(http_request, reply, 'text/event-stream', lines, tail)
+    
+    async def _handle_anthropic(self, http_request: web.Request) -> web.StreamResponse:
+        payload = await http_request.json()
+        messages = payload.get('messages', [])
+        prefill = ''
+        if messages and messages[-1].get('role') == 'assistant':
+            prefill = ''.join(_text_parts(messages[-1].get('content')))
+            messages = messages[:-1]
+        prompt = '\n'.join(
+            _text_parts(payload.get('system')) +
+            [text for message in messages for text in _text_parts(message.get('content'))]
+        )
+        request = StubRequest(api='anthropic', model=payload.get('model', ''), prompt=prompt,
+                              stream=bool(payload.get('stream')), prefill=prefill)
+        reply = self._reply(request)
+        if not request.stream:
+            await asyncio.sleep(reply.latency)
+            return web.json_response({
+                'type': 'message',
+                'role': 'assistant',
+                'model': request.model,
+                'content': [{'type': 'text', 'text': reply.text}],
+                'stop_reason': 'end_turn',
+                'usage': {'input_tokens': reply.prompt_tokens, 'output_tokens': reply.completion_tokens},
+            })
+        
+        def event(name: str, data: Dict[str, Any]) -> bytes:
+            return f"event: {name}\ndata: {json.dumps({'type': name, **data}, ensure_ascii=False)}\n\n".encode()
+        
+        lines = [event('message_start', {'message': {
+            'model': request.model, 'usage': {'input_tokens': reply.prompt_tokens, 'output_tokens': 0}
+        }})]
+        lines += [
+            event('content_block_delta', {'index': 0, 'delta': {'type': 'text_delta', 'text': chunk}})
+            for chunk in self._chunks(reply.text)
+        ]
+        tail = [
+            event('message_delta', {'delta': {'stop_reason': 'end_turn'},
+                                    'usage': {'output_tokens': reply.completion_tokens}}),
+            event('message_stop', {}),
+        ]
+        return await self._stream(http_request, reply, 'text/event-stream', lines, tail)
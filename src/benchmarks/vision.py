@@ -0,0 +1,311 @@
+"""
+Бенчмарк детектора элементов на корпусе скриншотов
+
+    python -m src.benchmarks.vision benchmarks/corpus --repeat 5 --json report.json
+    python -m src.benchmarks.vision benchmarks/corpus --baseline report.json
+
+Замеряет задержку стадий find_element (подготовка кадра, OCR, UI контуры,
+индекс сцены, поиск цели), пропускную способность, пиковую память и точность
+попаданий. Работает без игры, сети и Telegram; при сравнении с базовым
+отчетом завершается с кодом 1, если стадии замедлились или упала точность.
+"""
+import argparse
+import contextlib
+import io
+import json
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from .corpus import BenchmarkCase, load_corpus, make_synthetic_corpus
+from ..utils.config import OCRConfig
+from ..vision.element_detector import GameElementDetector
+from ..vision.models import GameElement
+from ..vision.ocr_engine import ocr_engines
+from ..vision.scene_index import SceneIndex
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:
+    RESOURCE_AVAILABLE = False
+
+
+# Стадии в порядке выполнения (как в GameElementDetector.find_element)
+STAGES = ('prepare', 'ocr', 'ui', 'index', 'match', 'total')
+
+
+@dataclass
+class CaseResult:
+    """Результат одного кейса"""
+    name: str
+    target: str
+    hit: bool
+    method: Optional[str] = None
+    text_found: str = ""
+    center: Optional[Tuple[int, int]] = None
+
+
+@dataclass
+class BenchmarkReport:
+    """Сводка прогона"""
+    cases: int
+    repeat: int
+    ocr_available: bool
+    stages: Dict[str, Dict[str, float]]  # стадия -> mean/p50/p95/max (мс)
+    frames_per_second: float
+    peak_traced_mb: float
+    max_rss_mb: Optional[float]
+    accuracy: float
+    results: List[CaseResult] = field(default_factory=list)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+    
+    def format(self) -> str:
+        """Таблица для консоли"""
+        lines = [
+            f"📊 Кейсов: {self.cases}, повторов: {self.repeat}, "
+            f"OCR: {'да' if self.ocr_available else 'нет (easyocr не установлен)'}",
+            f"{'стадия':<10}{'mean':>10}{'p50':>10}{'p95':>10}{'max':>10}  (мс)",
+        ]
+        for stage in STAGES:
+            values = self.stages.get(stage)
+            if values:
+                lines.append(f"{stage:<10}" + ''.join(
+                    f"{values[key]:>10.2f}" for key in ('mean', 'p50', 'p95', 'max')
+                ))
+        lines.append(f"⚡ Пропускная способность: {self.frames_per_second:.2f} кадр/с")
+        memory = f"💾 Пик памяти (tracemalloc): {self.peak_traced_mb:.1f} МБ"
+        if self.max_rss_mb is not None:
+            memory += f", пик RSS процесса: {self.max_rss_mb:.1f} МБ"
+        lines.append(memory)
+        hits = sum(1 for result in self.results if result.hit)
+        lines.append(f"🎯 Точность: {self.accuracy:.1%} ({hits}/{len(self.results)})")
+        for result in self.results:
+            if not result.hit:
+                found = f"{result.method} '{result.text_found}' {result.center}" if result.method else "не найдено"
+                lines.append(f"   ❌ {result.name}: {found}")
+        return '\n'.join(lines)
+
+
+def _quantile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _max_rss_mb() -> Optional[float]:
+    if not RESOURCE_AVAILABLE:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux - килобайты, macOS - байты
+    return max_rss / 1024 / (1024 if sys.platform == 'darwin' else 1)
+
+
+class VisionBenchmark:
+    """
+    Прогон GameElementDetector по корпусу.
+    
+    Стадии вызываются по отдельности в том же порядке, что и в
+    build_scene_index/find_in_index. Кэш OCR и инкрементальная раскладка
+    по умолчанию выключены, чтобы повторы не превращались в попадания в кэш.
+    Пиковая память снимается отдельным проходом под tracemalloc, чтобы
+    накладные расходы трассировки не попадали в задержки.
+    """
+    
+    def __init__(self, ocr_config: Optional[OCRConfig] = None):
+        self.ocr_config = ocr_config or OCRConfig(incremental=False, cache_size=0)
+        self.detector = GameElementDetector(self.ocr_config)
+    
+    def run(self, cases: List[BenchmarkCase], repeat: int = 3, warmup: int = 1,
+            tolerance: int = 8) -> BenchmarkReport:
+        """
+        Прогон корпуса
+        
+        Args:
+            cases: Кейсы корпуса
+            repeat: Замеряемых повторов каждого кейса
+            warmup: Прогревочных повторов (не замеряются)
+            tolerance: Допуск попадания в рамку (px)
+        
+        Returns:
+            Отчет с задержками, памятью и точностью
+        """
+        ocr_available = ocr_engines.supported
+        if ocr_available:
+            # Загрузка моделей не входит в замер
+            ocr_engines.get_reader(self.detector.ocr_detector.languages)
+        
+        images = [case.load_image() for case in cases]
+        timings: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+        
+        for _ in range(warmup):
+            for case, image in zip(cases, images):
+                self._run_case(image, case.target)
+        
+        started = time.perf_counter()
+        results: List[CaseResult] = []
+        for iteration in range(repeat):
+            for case, image in zip(cases, images):
+                element, case_timings = self._run_case(image, case.target)
+                for stage, seconds in case_timings.items():
+                    timings[stage].append(seconds)
+                if iteration == 0:
+                    results.append(self._case_result(case, element, tolerance))
+        elapsed = time.perf_counter() - started
+        
+        tracemalloc.start()
+        try:
+            for case, image in zip(cases, images):
+                self._run_case(image, case.target)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        
+        stages = {}
+        for stage, values in timings.items():
+            if not values:
+                continue
+            ordered = sorted(values)
+            stages[stage] = {
+                'mean': sum(ordered) / len(ordered) * 1000,
+                'p50': _quantile(ordered, 0.5) * 1000,
+                'p95': _quantile(ordered, 0.95) * 1000,
+                'max': ordered[-1] * 1000,
+            }
+        
+        frames = len(cases) * repeat
+        return BenchmarkReport(
+            cases=len(cases),
+            repeat=repeat,
+            ocr_available=ocr_available,
+            stages=stages,
+            frames_per_second=frames / elapsed if elapsed > 0 else 0.0,
+            peak_traced_mb=peak / 1024 / 1024,
+            max_rss_mb=_max_rss_mb(),
+            accuracy=sum(1 for result in results if result.hit) / len(results) if results else 0.0,
+            results=results
+        )
+    
+    def _run_case(self, image: Image.Image, target: str) -> Tuple[Optional[GameElement], Dict[str, float]]:
+        """Одна цель на одном кадре с замером стадий"""
+        detector = self.detector
+        timings = {}
+        # Диагностические print детекторов не должны попадать в отчет
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = stage_start = time.perf_counter()
+            cv_image = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+            gray = cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
+            timings['prepare'] = time.perf_counter() - stage_start
+            
+            stage_start = time.perf_counter()
+            ocr_results = detector.ocr_detector.read_text(cv_image) if detector.ocr_detector.available else None
+            timings['ocr'] = time.perf_counter() - stage_start
+            
+            stage_start = time.perf_counter()
+            ui_elements = detector.ui_detector.detect(gray)
+            timings['ui'] = time.perf_counter() - stage_start
+            
+            stage_start = time.perf_counter()
+            index = SceneIndex(image.size, ocr_results, ui_elements)
+            timings['index'] = time.perf_counter() - stage_start
+            
+            stage_start = time.perf_counter()
+            element = detector.find_in_index(index, target)
+            end = time.perf_counter()
+            timings['match'] = end - stage_start
+            timings['total'] = end - start
+        return element, timings
+    
+    @staticmethod
+    def _case_result(case: BenchmarkCase, element: Optional[GameElement], tolerance: int) -> CaseResult:
+        return CaseResult(
+            name=case.name,
+            target=case.target,
+            hit=case.is_hit(element, tolerance),
+            method=element.method if element else None,
+            text_found=element.text_found if element else "",
+            center=(element.center_x, element.center_y) if element else None
+        )
+
+
+def compare_reports(report: Dict[str, Any], baseline: Dict[str, Any],
+                    max_slowdown: float = 1.2, max_accuracy_drop: float = 0.0) -> List[str]:
+    """
+    Регрессии относительно базового отчета
+    
+    Args:
+        report: Текущий отчет (BenchmarkReport.to_dict)
+        baseline: Базовый отчет
+        max_slowdown: Допустимый рост p50 стадии (1.2 - на 20%)
+        max_accuracy_drop: Допустимое падение точности (доля)
+    
+    Returns:
+        Описания регрессий (пусто - регрессий нет)
+    """
+    regressions = []
+    for stage, values in baseline.get('stages', {}).items():
+        current = report['stages'].get(stage)
+        # Стадии короче миллисекунды слишком шумные для сравнения
+        if not current or values['p50'] < 1.0:
+            continue
+        if current['p50'] > values['p50'] * max_slowdown:
+            regressions.append(f"{stage}: p50 {values['p50']:.2f} -> {current['p50']:.2f} мс")
+    
+    if report['accuracy'] < baseline.get('accuracy', 0.0) - max_accuracy_drop:
+        regressions.append(f"точность: {baseline['accuracy']:.1%} -> {report['accuracy']:.1%}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Точка входа командной строки"""
+    parser = argparse.ArgumentParser(description="Бенчмарк детектора элементов на корпусе скриншотов")
+    parser.add_argument("corpus", help="Каталог корпуса с corpus.yaml")
+    parser.add_argument("--repeat", type=int, default=3, help="Замеряемых повторов каждого кейса")
+    parser.add_argument("--warmup", type=int, default=1, help="Прогревочных повторов")
+    parser.add_argument("--tolerance", type=int, default=8, help="Допуск попадания в рамку (px)")
+    parser.add_argument("--json", dest="json_path", help="Сохранить отчет в JSON (базовый отчет для сравнения)")
+    parser.add_argument("--baseline", help="Сравнить с отчетом JSON и вернуть 1 при регрессии")
+    parser.add_argument("--max-slowdown", type=float, default=1.2, help="Допустимый рост p50 стадии")
+    parser.add_argument("--max-accuracy-drop", type=float, default=0.0, help="Допустимое падение точности")
+    parser.add_argument("--synthetic", type=int, metavar="N",
+                        help="Сгенерировать синтетический корпус из N кадров в каталог corpus")
+    args = parser.parse_args(argv)
+    
+    if args.synthetic:
+        make_synthetic_corpus(args.corpus, args.synthetic)
+        print(f"🧪 Синтетический корпус: {args.corpus}")
+    
+    cases = load_corpus(args.corpus)
+    if not cases:
+        print("❌ Корпус пуст")
+        return 1
+    
+    report = VisionBenchmark().run(cases, repeat=args.repeat, warmup=args.warmup, tolerance=args.tolerance)
+    print(report.format())
+    
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report.to_dict(), f, ensure_ascii=False, indent=2)
+        print(f"💾 Отчет сохранен: {args.json_path}")
+    
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_reports(report.to_dict(), baseline, args.max_slowdown, args.max_accuracy_drop)
+        if regressions:
+            print("🚨 Регрессии относительно базового отчета:")
+            for regression in regressions:
+                print(f"   {regression}")
+            return 1
+        print("✅ Регрессий нет")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -22,20 +22,108 @@ from loguru import logger
 
 from ..utils.config import Config
 from ..llm.agent import LLMAgent
+from ..llm.budget import llm_budget
+from ..llm.http_client import http_client
 from ..vision.screen_analyzer import ScreenAnalyzer
 from ..vision.hybrid_analyzer import HybridScreenAnalyzer
+from ..vision.ocr_engine import ocr_engines
+from ..utils.executor import executors
+from ..utils.tracing import tracer
+from ..utils.metrics import MetricFamily, MetricsServer, metrics
+from ..utils.recorder import session_recorder
 from ..game.controller import GameController
+from .scheduler import GameJob, GameJobScheduler, QueueFullError
+
+
+class ProgressEditor:
+    """
+    Прогресс потокового ответа LLM в сообщении "Выполняю команду"
+    
+    Сообщение редактируется не чаще раза в interval секунд (лимиты Telegram)
+    и не больше одного редактирования одновременно. close() прекращает
+    обновления и дожидается начатого редактирования, чтобы устаревший
+    прогресс не перезаписал итоговый ответ.
+    """
+    
+    def __init__(self, message, interval: float = 2.0):
+        self.message = message
+        self.interval = interval
+        self._last_edit = 0.0
+        self._last_text = ''
+        self._edit: Optional[asyncio.Task] = None
+        self._closed = False
+    
+    def __call__(self, description: str) -> None:
+        description = description.strip()
+        now = time.time()
+        if self._closed or not description or description == self._last_text:
+            return
+        if now - self._last_edit < self.interval or (self._edit and not self._edit.done()):
+            return
+        self._last_edit = now
+        self._last_text = description
+        self._edit = asyncio.ensure_future(self._edit_text(f"🎮 {description}..."))
+    
+    async def close(self) -> None:
+        """Остановка обновлений (анализ закончен)"""
+        self._closed = True
+        if self._edit is not None:
+            await asyncio.gather(self._edit, return_exceptions=True)
+            self._edit = None
+    
+    async def _edit_text(self, text: str) -> None:
+        """Обновление сообщения (ошибки не критичны)"""
+        try:
+            await self.message.edit_text(text)
+        except Exception as e:
+            logger.debug(f"Progress edit skipped: {e}")
 
 
 class DiscoCoopBot:
     """Основной класс Telegram бота для Disco Coop"""
     
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, game_controller: Optional[GameController] = None,
+                 screen_analyzer: Optional[ScreenAnalyzer] = None):
+        """
+        Args:
+            config: Конфигурация
+            game_controller: Контроллер игры (по умолчанию - GameController)
+            screen_analyzer: Источник скриншотов (по умолчанию - ScreenAnalyzer);
+                             подменяются в нагрузочных прогонах без игры
+        """
         self.config = config
         self.llm_agent = LLMAgent(config)
-        self.screen_analyzer = ScreenAnalyzer(config)
+        self.screen_analyzer = screen_analyzer or ScreenAnalyzer(config)
         self.hybrid_analyzer = HybridScreenAnalyzer(config)
-        self.game_controller = GameController(config)
+        self.game_controller = game_controller or GameController(config)
+        
+        # Все игровые команды выполняются через одну очередь
+        self.scheduler = GameJobScheduler(self.game_controller, config.game.queue)
+        
+        # Пулы для OCR, OpenCV и кодирования изображений вне event loop
+        executors.configure(
+            vision_workers=config.performance.vision_workers,
+            encode_workers=config.performance.encode_workers,
+            encode_in_processes=config.performance.encode_in_processes
+        )
+        
+        # Одна HTTP сессия с keep-alive пулом для всех LLM агентов
+        http_client.configure(config.llm.http)
+        
+        # Учет токенов и времени LLM, лимиты на чат
+        llm_budget.configure(config.llm.budget)
+        
+        # Трассы стадий команд
+        tracer.configure(config.monitoring.tracing)
+        
+        # Журнал команд для офлайн воспроизведения
+        session_recorder.configure(config.monitoring.recorder)
+        
+        # Метрики очереди, кэшей и бэкендов снимаются при запросе /metrics
+        metrics.register_collector(self._collect_metrics)
+        self.metrics_server = (
+            MetricsServer(config.monitoring.metrics, metrics) if config.monitoring.metrics.enabled else None
+        )
         
         # Статистика и контроль доступа
         self.chat_last_command: Dict[int, datetime] = {}
@@ -174,11 +262,13 @@ class DiscoCoopBot:
 • Экстренная остановка: `{}`
 
 **Статус бота:** {}
+**OCR:** {}
         """.format(
             self.config.security.rate_limit,
             self.config.security.max_session_time,
             self.config.security.emergency_stop_command,
-            "🟢 Активен" if self.game_controller.is_game_running() else "🔴 Игра не найдена"
+            "🟢 Активен" if self.game_controller.is_game_running() else "🔴 Игра не найдена",
+            ocr_engines.describe_status()
         )
         
         await update.message.reply_text(help_text, parse_mode='Markdown')
@@ -195,6 +285,11 @@ class DiscoCoopBot:
             await update.message.reply_text("⏳ Превышен лимит команд. Подождите минуту.")
             return
         
+        budget_error = llm_budget.check_chat(chat_id)
+        if budget_error:
+            await update.message.reply_text(f"💸 Для этого чата {budget_error}. Попробуйте позже.")
+            return
+        
         # Показываем, что бот работает
         await update.message.reply_text("📸 Анализирую экран...")
         
@@ -207,16 +302,12 @@ class DiscoCoopBot:
                 return
             
             # Анализируем скриншот (передаем уже существующий)
-            description = await self.screen_analyzer.describe_screen(screenshot)
+            with llm_budget.chat(chat_id):
+                description = await self.screen_analyzer.describe_screen(screenshot)
             
             if description:
-                # Отправляем скриншот с описанием
-                from io import BytesIO
-                
-                # Сохраняем скриншот в память
-                bio = BytesIO()
-                screenshot.save(bio, format='PNG')
-                bio.seek(0)
+                # Сохраняем скриншот в память (кодирование вне event loop)
+                bio = io.BytesIO(await executors.encode(screenshot, 'PNG'))
                 
                 # Отправляем фото с описанием в подписи
                 await update.message.reply_photo(
@@ -264,7 +355,7 @@ class DiscoCoopBot:
         # Обрабатываем команду напрямую
         await self.process_game_action(update, context, command_args)
     
-
+    
     
     async def handle_inline_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик inline запросов для групп"""
@@ -317,27 +408,78 @@ class DiscoCoopBot:
             await update.message.reply_text("⏳ Превышен лимит команд. Подождите минуту.")
             return
         
+        budget_error = llm_budget.check_chat(chat_id)
+        if budget_error:
+            await update.message.reply_text(f"💸 Для этого чата {budget_error}. Попробуйте позже.")
+            return
+        
         if not self.game_controller.is_game_running():
             await update.message.reply_text("❌ Игра не запущена или не найдена.")
             return
         
         # Показываем, что обрабатываем команду
-        processing_msg = await update.message.reply_text("🎮 Выполняю команду...")
+        processing_msg = await update.message.reply_text("🎮 Команда принята...")
+        
+        job = self._build_game_job(update, context, user_command, processing_msg)
         
         try:
+            queued_job, position, coalesced = self.scheduler.submit(job)
+        except QueueFullError as e:
+            await processing_msg.edit_text(f"⏳ {e}. Попробуйте позже.")
+            return
+        
+        if coalesced:
+            await processing_msg.edit_text(f"🔁 Такая команда уже в очереди (позиция {position})")
+        elif position > 1:
+            await processing_msg.edit_text(f"⏳ Команда в очереди, позиция {position}")
+    
+    def _build_game_job(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                        user_command: str, processing_msg) -> GameJob:
+        """Игровая команда, разбитая на стадии для очереди"""
+        chat_id = update.effective_chat.id
+        trace = tracer.new_trace('game', chat_id=chat_id, command=user_command)
+        record = session_recorder.new_record(chat_id, user_command)
+        
+        async def prepare():
+            tracer.add_span(trace, 'queue', trace.start, time.perf_counter())
+            with tracer.activate(trace), session_recorder.activate(record):
+                return await _prepare()
+        
+        async def _prepare():
+            await processing_msg.edit_text("🎮 Выполняю команду...")
+            
             # Получаем текущий скриншот
-            screenshot = await self.screen_analyzer.take_screenshot()
+            with tracer.span('screenshot'):
+                screenshot = await self.screen_analyzer.take_screenshot()
             
             if not screenshot:
-                await processing_msg.edit_text("❌ Не удалось получить скриншот игры")
-                return
+                return {'response': "❌ Не удалось получить скриншот игры"}
+            await session_recorder.add_frame(record, screenshot)
             
             # Используем гибридный анализатор для получения точных координат
-            hybrid_result = await self.hybrid_analyzer.analyze_and_find_element(screenshot, user_command)
+            progress = ProgressEditor(processing_msg)
+            try:
+                with llm_budget.chat(chat_id), tracer.span('analysis'):
+                    hybrid_result = await self.hybrid_analyzer.analyze_and_find_element(
+                        screenshot, user_command, on_progress=progress
+                    )
+            finally:
+                await progress.close()
+            trace.attrs['method'] = (hybrid_result or {}).get('method')
+            session_recorder.record_detection(record, hybrid_result)
+            return {'hybrid_result': hybrid_result}
+        
+        async def execute(game_controller: GameController, prepared: dict):
+            with tracer.activate(trace):
+                return await _execute(game_controller, prepared)
+        
+        async def _execute(game_controller: GameController, prepared: dict):
+            hybrid_result = prepared.get('hybrid_result')
+            if hybrid_result is None:
+                return prepared
             
-            if hybrid_result and hybrid_result.get('success'):
+            if hybrid_result.get('success'):
                 # Гибридный анализатор нашел элемент с точными координатами
-                method = hybrid_result.get('method', 'unknown')
                 coordinates = hybrid_result.get('coordinates')
                 
                 if coordinates:
@@ -352,45 +494,77 @@ class DiscoCoopBot:
                         'description': action_description
                     }]
                     
-                    # Выполняем действие
-                    success = await self.game_controller.execute_actions(actions)
+                    # Выполняем действие и ждем, пока экран отреагирует
+                    with tracer.span('execute'):
+                        success = await game_controller.execute_actions(actions, settle=self.screen_analyzer.settler)
+                    session_recorder.record_actions(record, actions, success)
                     
                     if success:
                         # Делаем скриншот после выполнения действия
-                        await asyncio.sleep(0.5)  # Небольшая пауза для обновления экрана
-                        result_screenshot = await self.screen_analyzer.take_screenshot()
+                        if self.screen_analyzer.settler is None:
+                            with tracer.span('settle_sleep'):
+                                await asyncio.sleep(0.5)  # Небольшая пауза для обновления экрана
+                        with tracer.span('result_screenshot'):
+                            result_screenshot = await self.screen_analyzer.take_screenshot()
                         
-                        # Отправляем результат с описанием и скриншотом
-                        response = f"✅ {action_description}"
-                        
-                        if result_screenshot:
-                            # Конвертируем скриншот в PNG для отправки
-                            img_buffer = io.BytesIO()
-                            result_screenshot.save(img_buffer, format='PNG')
-                            img_buffer.seek(0)
-                            
-                            await processing_msg.edit_text(response)
-                            await context.bot.send_photo(
-                                chat_id=update.effective_chat.id,
-                                photo=img_buffer,
-                                caption="🎮 Результат действия"
-                            )
-                        else:
-                            await processing_msg.edit_text(response)
-                    else:
-                        response = f"⚠️ {action_description} (выполнено частично)"
-                        await processing_msg.edit_text(response)
-                else:
-                    response = "❓ Элемент найден, но координаты недоступны"
-                    await processing_msg.edit_text(response)
-            else:
-                # Гибридный анализатор не смог найти элемент
-                response = "❓ Элемент не найден на экране. Попробуйте переформулировать команду."
-                await processing_msg.edit_text(response)
+                        return {
+                            'response': f"✅ {action_description}",
+                            'screenshot': result_screenshot
+                        }
+                    # План из кэша не сработал - в следующий раз спросим LLM
+                    self.hybrid_analyzer.forget_plan(hybrid_result)
+                    return {'response': f"⚠️ {action_description} (выполнено частично)"}
+                return {'response': "❓ Элемент найден, но координаты недоступны"}
             
-        except Exception as e:
-            logger.error(f"Error processing command '{user_command}': {e}")
+            # Гибридный анализатор не смог найти элемент
+            return {'response': "❓ Элемент не найден на экране. Попробуйте переформулировать команду."}
+        
+        async def finish(result: dict):
+            with tracer.activate(trace):
+                try:
+                    await _finish(result)
+                finally:
+                    tracer.finish(trace)
+                    session_recorder.finish(record, response=result.get('response'),
+                                            total_ms=round((time.perf_counter() - trace.start) * 1000, 1))
+        
+        async def _finish(result: dict):
+            with tracer.span('reply'):
+                await processing_msg.edit_text(result['response'])
+            
+            result_screenshot = result.get('screenshot')
+            if result_screenshot:
+                # Конвертируем скриншот в PNG для отправки
+                with tracer.span('encode_png'):
+                    img_buffer = io.BytesIO(await executors.encode(result_screenshot, 'PNG'))
+                
+                with tracer.span('send_photo'):
+                    await context.bot.send_photo(
+                        chat_id=chat_id,
+                        photo=img_buffer,
+                        caption="🎮 Результат действия"
+                    )
+        
+        async def on_error(error: Exception):
+            tracer.finish(trace, error=type(error).__name__)
+            session_recorder.finish(record, error=type(error).__name__)
             await processing_msg.edit_text("❌ Ошибка при выполнении команды.")
+        
+        async def on_cancel():
+            tracer.finish(trace, cancelled=True)
+            session_recorder.finish(record, cancelled=True)
+            await processing_msg.edit_text("🛑 Команда отменена")
+        
+        return GameJob(
+            chat_id=chat_id,
+            command=user_command,
+            prepare=prepare,
+            execute=execute,
+            finish=finish,
+            on_error=on_error,
+            on_cancel=on_cancel,
+            message_id=update.message.message_id
+        )
     
     async def handle_game_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработка игровых команд из обычных сообщений"""
@@ -433,13 +607,17 @@ class DiscoCoopBot:
             await update.message.reply_text("❌ Недостаточно прав.")
             return
         
-        # Останавливаем все активные действия
+        # Отменяем команды в очереди и останавливаем все активные действия
+        cancelled = await self.scheduler.clear()
         await self.game_controller.stop_all_actions()
         
         # Очищаем активные сессии
         self.active_sessions.clear()
         
-        await update.message.reply_text("🛑 Экстренная остановка выполнена. Все действия остановлены.")
+        await update.message.reply_text(
+            f"🛑 Экстренная остановка выполнена. Все действия остановлены, "
+            f"отменено команд в очереди: {cancelled}."
+        )
         logger.warning(f"Emergency stop triggered by user {user_id}")
     
     async def cleanup_sessions(self):
@@ -464,15 +642,80 @@ class DiscoCoopBot:
         # Добавляем callback для запуска фоновых задач
         async def post_init(application):
             """Callback после инициализации приложения"""
+            # Загружаем OCR модели в фоне, чтобы первая команда не ждала
+            ocr_engines.preload()
+            
+            # Соединение с LLM провайдером открываем заранее (TCP + TLS)
+            if self.config.llm.http.warm_up:
+                asyncio.create_task(http_client.warm_up([self.config.llm.base_url]))
+            
+            # Исполнитель очереди игровых команд
+            self.scheduler.start()
+            
+            if self.metrics_server:
+                try:
+                    await self.metrics_server.start()
+                except OSError as e:
+                    logger.error(f"Не удалось запустить эндпоинт метрик: {e}")
+            
             # Запускаем фоновую задачу очистки сессий
             asyncio.create_task(self._cleanup_task())
         
+        async def post_shutdown(application):
+            """Callback после остановки приложения"""
+            await self.scheduler.stop()
+            await http_client.close()
+            if self.metrics_server:
+                await self.metrics_server.stop()
+            executors.shutdown()
+        
         # Регистрируем callback
         self.application.post_init = post_init
+        self.application.post_shutdown = post_shutdown
         
         # Запускаем бота (run_polling сам управляет event loop)
         self.application.run_polling(drop_pending_updates=True)
     
+    def _collect_metrics(self) -> List[MetricFamily]:
+        """Состояние очереди команд, кэшей и LLM бэкендов для /metrics"""
+        queue = self.scheduler.stats()
+        families = [
+            MetricFamily('disco_queue_depth', 'gauge', 'Game commands waiting in the queue',
+                         [({}, queue['pending'])]),
+            MetricFamily('disco_queue_running', 'gauge', 'Game commands being executed',
+                         [({}, queue['running'])]),
+            MetricFamily('disco_commands_total', 'counter', 'Game commands by outcome', [
+                ({'result': result}, queue[result])
+                for result in ('completed', 'failed', 'coalesced', 'cancelled')
+            ]),
+        ]
+        
+        caches = [('ocr', self.hybrid_analyzer.element_detector.ocr_detector.cache.stats())]
+        if self.hybrid_analyzer.plan_cache:
+            caches.append(('plan', self.hybrid_analyzer.plan_cache.stats()))
+        families.append(MetricFamily('disco_cache_requests_total', 'counter', 'Cache lookups by result', [
+            ({'cache': name, 'result': result}, stats[result])
+            for name, stats in caches
+            for result in ('hits', 'misses')
+        ]))
+        families.append(MetricFamily('disco_cache_hit_ratio', 'gauge', 'Cache hit ratio since start', [
+            ({'cache': name}, stats['hit_rate']) for name, stats in caches
+        ]))
+        families.append(MetricFamily('disco_cache_entries', 'gauge', 'Entries in cache', [
+            ({'cache': name}, stats['size']) for name, stats in caches
+        ]))
+        
+        backends = self.llm_agent.router.stats()
+        families.append(MetricFamily('disco_llm_backend_up', 'gauge', 'LLM backend is not in circuit breaker cooldown', [
+            ({'backend': backend['name'], 'model': backend['model']}, 1 if backend['available'] else 0)
+            for backend in backends
+        ]))
+        families.append(MetricFamily('disco_llm_backend_failures_total', 'counter', 'Failed LLM attempts per backend', [
+            ({'backend': backend['name'], 'model': backend['model']}, backend['failures'])
+            for backend in backends
+        ]))
+        return families
+    
     async def _cleanup_task(self):
         """Фоновая задача очистки сессий"""
         while True:
@@ -0,0 +1,272 @@
+"""
+Очередь игровых команд: честная очередь по чатам и единственный исполнитель
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+
+from ..game.controller import GameController
+from ..utils.config import QueueConfig
+
+
+@dataclass
+class GameJob:
+    """
+    Игровая команда, разбитая на стадии:
+    
+    - prepare: скриншот, LLM и поиск координат (игру не трогает)
+    - execute: ввод в игру и скриншот результата (только исполнитель очереди)
+    - finish: ответ в Telegram (идет параллельно с подготовкой следующей команды)
+    """
+    chat_id: int
+    command: str
+    prepare: Callable[[], Awaitable[Any]]
+    execute: Callable[[GameController, Any], Awaitable[Any]]
+    finish: Callable[[Any], Awaitable[None]]
+    on_error: Optional[Callable[[Exception], Awaitable[None]]] = None
+    on_cancel: Optional[Callable[[], Awaitable[None]]] = None
+    message_id: Optional[int] = None  # сообщение Telegram с командой
+    created_at: float = field(default_factory=time.time)
+    generation: int = 0
+    
+    @property
+    def key(self) -> str:
+        """Ключ для склейки одинаковых команд"""
+        return ' '.join(self.command.lower().split())
+
+
+class QueueFullError(Exception):
+    """Очередь команд переполнена"""
+
+
+class GameJobScheduler:
+    """
+    Планировщик игровых команд
+    
+    Все команды проходят через одну очередь: чаты обслуживаются по кругу,
+    ввод в игру выполняет только один исполнитель, владеющий GameController.
+    Повторная отправка той же команды, пока она ждет в очереди, склеивается.
+    
+    on_job_event вызывается при постановке команды в очередь ("queued") и
+    ровно один раз с ее итогом: "completed" (после ответа в Telegram),
+    "failed", "cancelled", "coalesced" или "queue_full".
+    """
+    
+    def __init__(self, controller: GameController, config: QueueConfig,
+                 on_job_event: Optional[Callable[[GameJob, str], None]] = None):
+        self.controller = controller
+        self.max_pending = config.max_pending
+        self.max_per_chat = config.max_per_chat
+        self.coalesce = config.coalesce
+        self.on_job_event = on_job_event
+        
+        self._queues: "OrderedDict[int, Deque[GameJob]]" = OrderedDict()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._finishing: Set[asyncio.Task] = set()
+        self._generation = 0
+        self.current: Optional[GameJob] = None
+        
+        # Статистика
+        self.completed = 0
+        self.failed = 0
+        self.coalesced = 0
+        self.cancelled = 0
+    
+    @property
+    def pending(self) -> int:
+        """Количество ожидающих команд"""
+        return sum(len(queue) for queue in self._queues.values())
+    
+    def start(self) -> None:
+        """Запуск исполнителя (вызывается внутри event loop)"""
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.ensure_future(self._run())
+    
+    async def stop(self) -> None:
+        """Остановка исполнителя и отмена ожидающих команд"""
+        await self.clear()
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._finishing:
+            await asyncio.gather(*self._finishing, return_exceptions=True)
+    
+    def submit(self, job: GameJob) -> Tuple[GameJob, int, bool]:
+        """
+        Постановка команды в очередь
+        
+        Args:
+            job: Команда
+        
+        Returns:
+            (команда в очереди, позиция начиная с 1, склеена ли с уже ожидающей)
+        
+        Raises:
+            QueueFullError: Превышен общий лимит или лимит чата
+        """
+        queue = self._queues.get(job.chat_id)
+        
+        # Та же команда уже ждет в очереди этого чата - второй раз не выполняем
+        if self.coalesce and queue and queue[-1].key == job.key:
+            self.coalesced += 1
+            self._notify(job, 'coalesced')
+            return queue[-1], self.position(queue[-1]), True
+        
+        if self.pending >= self.max_pending:
+            self._notify(job, 'queue_full')
+            raise QueueFullError("Очередь команд заполнена")
+        if queue and len(queue) >= self.max_per_chat:
+            self._notify(job, 'queue_full')
+            raise QueueFullError("Слишком много команд этого чата в очереди")
+        
+        job.generation = self._generation
+        if queue is None:
+            queue = self._queues[job.chat_id] = deque()
+        queue.append(job)
+        self._notify(job, 'queued')
+        
+        if self._wakeup:
+            self._wakeup.set()
+        return job, self.position(job), False
+    
+    def position(self, job: GameJob) -> int:
+        """
+        Позиция команды с учетом обхода чатов по кругу (1 - выполняется следующей)
+        """
+        queue = self._queues.get(job.chat_id)
+        if not queue or job not in queue:
+            return 0
+        
+        index = queue.index(job)
+        chats = list(self._queues.keys())
+        own_order = chats.index(job.chat_id)
+        
+        # За каждый круг каждый чат отдает по одной команде
+        ahead = index
+        for order, chat_id in enumerate(chats):
+            if chat_id == job.chat_id:
+                continue
+            other = len(self._queues[chat_id])
+            ahead += min(other, index)
+            if order < own_order and other > index:
+                ahead += 1
+        
+        if self.current is not None:
+            ahead += 1
+        return ahead + 1
+    
+    async def clear(self) -> int:
+        """
+        Отмена всех ожидающих команд (экстренная остановка)
+        
+        Команда, которая сейчас готовится, не будет выполнена в игре.
+        
+        Returns:
+            Количество отмененных команд
+        """
+        self._generation += 1
+        jobs: List[GameJob] = [job for queue in self._queues.values() for job in queue]
+        self._queues.clear()
+        
+        for job in jobs:
+            self.cancelled += 1
+            if job.on_cancel:
+                await self._safe_call(job.on_cancel())
+            self._notify(job, 'cancelled')
+        return len(jobs)
+    
+    def stats(self) -> Dict[str, int]:
+        """Статистика очереди"""
+        return {
+            'pending': self.pending,
+            'running': 1 if self.current else 0,
+            'completed': self.completed,
+            'failed': self.failed,
+            'coalesced': self.coalesced,
+            'cancelled': self.cancelled,
+        }
+    
+    async def _next_job(self) -> GameJob:
+        """Следующая команда: первый чат в круге, затем он уходит в конец"""
+        while not self._queues:
+            self._wakeup.clear()
+            await self._wakeup.wait()
+        
+        chat_id, queue = next(iter(self._queues.items()))
+        job = queue.popleft()
+        if queue:
+            self._queues.move_to_end(chat_id)
+        else:
+            del self._queues[chat_id]
+        return job
+    
+    async def _run(self) -> None:
+        """Цикл исполнителя"""
+        while True:
+            job = await self._next_job()
+            self.current = job
+            wait_time = time.time() - job.created_at
+            logger.info(f"▶️ Команда чата {job.chat_id}: {job.command} (ожидание {wait_time:.1f}с, "
+                        f"в очереди {self.pending})")
+            
+            try:
+                prepared = await job.prepare()
+                
+                # Экстренная остановка во время подготовки - в игру не пишем
+                if job.generation != self._generation:
+                    self.cancelled += 1
+                    if job.on_cancel:
+                        await self._safe_call(job.on_cancel())
+                    self._notify(job, 'cancelled')
+                    continue
+                
+                result = await job.execute(self.controller, prepared)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error processing command '{job.command}': {e}")
+                self.failed += 1
+                if job.on_error:
+                    await self._safe_call(job.on_error(e))
+                self._notify(job, 'failed')
+                continue
+            finally:
+                self.current = None
+            
+            # Ответ в Telegram отправляется параллельно с подготовкой следующей команды
+            self.completed += 1
+            task = asyncio.ensure_future(self._finish(job, result))
+            self._finishing.add(task)
+            task.add_done_callback(self._finishing.discard)
+    
+    async def _finish(self, job: GameJob, result: Any) -> None:
+        """Ответ в Telegram, затем итог команды"""
+        await self._safe_call(job.finish(result))
+        self._notify(job, 'completed')
+    
+    def _notify(self, job: GameJob, event: str) -> None:
+        """Событие команды для on_job_event (ошибки наблюдателя не мешают очереди)"""
+        if self.on_job_event is None:
+            return
+        try:
+            self.on_job_event(job, event)
+        except Exception as e:
+            logger.error(f"Game job event handler failed: {e}")
+    
+    @staticmethod
+    async def _safe_call(awaitable: Awaitable[Any]) -> None:
+        """Колбэки задачи не должны останавливать исполнителя"""
+        try:
+            await awaitable
+        except Exception as e:
+            logger.error(f"Game job callback failed: {e}")
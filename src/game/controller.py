@@ -3,27 +3,15 @@
 """
 import asyncio
 import platform
-import time
-from typing import List, Dict, Any, Optional
-
-# Пытаемся импортировать пакеты управления вводом
-try:
-    import pyautogui
-    PYAUTOGUI_AVAILABLE = True
-except ImportError:
-    PYAUTOGUI_AVAILABLE = False
-    pyautogui = None
-
-try:
-    from pynput import mouse, keyboard
-    from pynput.mouse import Button, Listener as MouseListener  
-    from pynput.keyboard import Key, Listener as KeyboardListener
-    PYNPUT_AVAILABLE = True
-except ImportError:
-    PYNPUT_AVAILABLE = False
-    mouse = keyboard = Button = MouseListener = Key = KeyboardListener = None
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
 
 from ..utils.config import Config
+from ..utils.executor import executors
+from .input_backend import create_input_backend
+from .window_tracker import get_window_tracker
+
+if TYPE_CHECKING:
+    from ..vision.settle import ScreenSettler
 
 
 class GameController:
@@ -40,40 +28,14 @@ class GameController:
         self.multi_display_config = config.game.multi_display
         self.game_screen_offset = None  # Будет определен автоматически
         self.game_display_info = None
+        self._displays: Optional[List[Dict[str, Any]]] = None  # Кэш xrandr
+        self._display_window_pos: Optional[tuple] = None  # Позиция окна при определении дисплея
         
-        # Проверяем доступность библиотек
-        if not PYAUTOGUI_AVAILABLE:
-            raise ImportError("PyAutoGUI не установлен. Установите его командой: pip install PyAutoGUI")
-        
-        if not PYNPUT_AVAILABLE:
-            print("⚠️  Внимание: pynput недоступен. Некоторые функции могут не работать.")
-        
-        # Настройки PyAutoGUI
-        pyautogui.PAUSE = config.game.action_delay
-        pyautogui.FAILSAFE = True  # Перемещение мыши в угол останавливает выполнение
-        
-        # Маппинг клавиш (только если pynput доступен)
-        if PYNPUT_AVAILABLE:
-            self.key_mapping = {
-                'space': ' ',
-                'enter': '\n',
-                'tab': '\t',
-                'escape': Key.esc,
-                'up': Key.up,
-                'down': Key.down,
-                'left': Key.left,
-                'right': Key.right,
-                'f1': Key.f1,
-                'f2': Key.f2,
-                'f3': Key.f3,
-                'f4': Key.f4,
-                'f5': Key.f5,
-                'ctrl': Key.ctrl,
-                'alt': Key.alt,
-                'shift': Key.shift,
-            }
-        else:
-            self.key_mapping = {}
+        # Кэш окна игры (ID, геометрия, фокус) вместо xdotool на каждое действие
+        self.window_tracker = get_window_tracker(self.window_title)
+        
+        # Бэкенд ввода: XTest с постоянным соединением или pyautogui
+        self.input = create_input_backend(config.game.input.backend, config.game.input.key_hold)
     
     def is_game_running(self) -> bool:
         """
@@ -87,9 +49,9 @@ class GameController:
             if platform.system() != "Linux":
                 print("❌ Этот проект поддерживает только Steam Deck (Linux)")
                 return False
-                
+            
             return self._is_game_running_linux()
-                
+        
         except Exception as e:
             print(f"Error checking game status: {e}")
             return False
@@ -99,30 +61,29 @@ class GameController:
         import subprocess
         
         try:
-            # Ищем процесс игры
-            cmd = f"pgrep -f '{self.window_title.lower()}'"
-            result = subprocess.run(cmd, shell=True, capture_output=True)
-            
-            if result.returncode == 0:
+            # Окно игры уже известно трекеру - процессы не запускаем
+            if self.window_tracker.is_alive():
                 return True
             
-            # Альтернативный поиск через xdotool
-            cmd = f"xdotool search --name '{self.window_title}'"
-            result = subprocess.run(cmd, shell=True, capture_output=True)
-            
-            return result.returncode == 0 and result.stdout.strip()
+            # Ищем процесс игры
+            result = subprocess.run(['pgrep', '-f', self.window_title.lower()], capture_output=True)
             
+            return result.returncode == 0
+        
         except Exception:
             return False
     
-
-    async def execute_actions(self, actions: List[Dict[str, Any]]) -> bool:
+    
+    async def execute_actions(self, actions: List[Dict[str, Any]],
+                              settle: Optional["ScreenSettler"] = None) -> bool:
         """
         Выполнение списка действий
         
         Args:
             actions: Список действий для выполнения
-            
+            settle: Ожидание реакции экрана после каждого действия
+                    (без него - фиксированная пауза action_delay между действиями)
+        
         Returns:
             True если все действия выполнены успешно
         """
@@ -141,19 +102,25 @@ class GameController:
         success_count = 0
         
         try:
-            for action in actions:
+            for i, action in enumerate(actions):
                 if self.emergency_stop:
                     break
                 
+                baseline = await settle.snapshot() if settle else None
+                
                 success = await self._execute_single_action(action)
                 if success:
                     success_count += 1
                 
-                # Задержка между действиями
-                await asyncio.sleep(self.action_delay)
+                if settle:
+                    # Ждем, пока игра отреагирует и экран успокоится
+                    await settle.wait(baseline)
+                elif i < len(actions) - 1:
+                    # Задержка между действиями (после последнего не нужна)
+                    await asyncio.sleep(self.action_delay)
             
             return success_count == len(actions)
-            
+        
         except Exception as e:
             print(f"Error executing actions: {e}")
             return False
@@ -205,19 +172,10 @@ class GameController:
             await self._focus_game_window()
             
             # Выполняем клик
-            if button == 'right':
-                pyautogui.rightClick(adjusted_x, adjusted_y)
-                # Для дополнительных кликов
-                for _ in range(clicks - 1):
-                    pyautogui.rightClick(adjusted_x, adjusted_y)
-            else:
-                pyautogui.leftClick(adjusted_x, adjusted_y)
-                # Для дополнительных кликов
-                for _ in range(clicks - 1):
-                    pyautogui.leftClick(adjusted_x, adjusted_y)
+            await executors.run_input(self.input.click, adjusted_x, adjusted_y, button, clicks)
             
             return True
-            
+        
         except Exception as e:
             print(f"Click action failed: {e}")
             return False
@@ -231,9 +189,9 @@ class GameController:
         try:
             # Корректируем координаты для мультидисплея
             adjusted_x, adjusted_y = self.adjust_coordinates(x, y)
-            pyautogui.moveTo(adjusted_x, adjusted_y, duration=duration)
+            await executors.run_input(self.input.move, adjusted_x, adjusted_y, duration)
             return True
-            
+        
         except Exception as e:
             print(f"Move mouse action failed: {e}")
             return False
@@ -243,22 +201,13 @@ class GameController:
         key = action.get('key', '')
         
         try:
-            # Преобразуем ключ
-            mapped_key = self.key_mapping.get(key.lower(), key)
-            
             # Фокусируемся на игре
             await self._focus_game_window()
             
-            if isinstance(mapped_key, str):
-                pyautogui.press(mapped_key)
-            else:
-                # Для специальных клавиш используем pynput
-                keyboard_controller = keyboard.Controller()
-                keyboard_controller.press(mapped_key)
-                keyboard_controller.release(mapped_key)
+            await executors.run_input(self.input.press_key, key)
             
             return True
-            
+        
         except Exception as e:
             print(f"Key press action failed: {e}")
             return False
@@ -270,9 +219,9 @@ class GameController:
         
         try:
             await self._focus_game_window()
-            pyautogui.typewrite(text, interval=interval)
+            await executors.run_input(self.input.type_text, text, interval)
             return True
-            
+        
         except Exception as e:
             print(f"Type text action failed: {e}")
             return False
@@ -285,15 +234,15 @@ class GameController:
         y = action.get('y')
         
         try:
-            # Если указаны координаты, перемещаемся туда
+            # Если указаны координаты, прокручиваем в этой точке
             if x is not None and y is not None:
-                pyautogui.moveTo(x, y)
+                x, y = self.adjust_coordinates(x, y)
             
             scroll_amount = amount if direction == 'up' else -amount
-            pyautogui.scroll(scroll_amount)
+            await executors.run_input(self.input.scroll, scroll_amount, x, y)
             
             return True
-            
+        
         except Exception as e:
             print(f"Scroll action failed: {e}")
             return False
@@ -308,9 +257,11 @@ class GameController:
         
         try:
             await self._focus_game_window()
-            pyautogui.dragTo(to_x, to_y, duration=duration, button='left')
+            from_x, from_y = self.adjust_coordinates(from_x, from_y)
+            to_x, to_y = self.adjust_coordinates(to_x, to_y)
+            await executors.run_input(self.input.drag, from_x, from_y, to_x, to_y, duration)
             return True
-            
+        
         except Exception as e:
             print(f"Drag action failed: {e}")
             return False
@@ -325,18 +276,11 @@ class GameController:
         try:
             await self._focus_game_window()
             
-            # Преобразуем клавиши
-            mapped_keys = []
-            for key in keys:
-                mapped_key = self.key_mapping.get(key.lower(), key)
-                mapped_keys.append(mapped_key)
-            
-            # Используем pyautogui для простых комбинаций
-            if len(mapped_keys) <= 3:
-                pyautogui.hotkey(*mapped_keys)
+            # Клавиши нажимаются по порядку и отпускаются в обратном
+            await executors.run_input(self.input.hotkey, [key.lower() for key in keys])
             
             return True
-            
+        
         except Exception as e:
             print(f"Key combination action failed: {e}")
             return False
@@ -348,39 +292,32 @@ class GameController:
             if platform.system() != "Linux":
                 print("❌ Этот проект поддерживает только Steam Deck (Linux)")
                 return False
-                
+            
             return await self._focus_window_linux()
-                
+        
         except Exception as e:
             print(f"Error focusing game window: {e}")
             return False
     
     async def _focus_window_linux(self) -> bool:
         """Фокусировка окна в Linux"""
-        import subprocess
-        
         try:
-            # Находим ID окна
-            cmd = f"xdotool search --name '{self.window_title}'"
-            result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+            # Окно уже активно - ничего не делаем
+            if self.window_tracker.is_focused():
+                return True
             
-            if result.returncode == 0 and result.stdout.strip():
-                window_id = result.stdout.strip().split('\n')[0]
-                
-                # Активируем окно
-                subprocess.run(f"xdotool windowactivate {window_id}", shell=True)
-                
+            # Активируем окно
+            if self.window_tracker.activate():
                 # Небольшая задержка для активации
                 await asyncio.sleep(0.1)
-                
                 return True
             
             return False
-            
+        
         except Exception:
             return False
     
-
+    
     async def stop_all_actions(self):
         """Экстренная остановка всех действий"""
         self.emergency_stop = True
@@ -397,11 +334,11 @@ class GameController:
     
     def get_screen_size(self) -> tuple:
         """Получение размера экрана"""
-        return pyautogui.size()
+        return self.input.screen_size()
     
     def get_mouse_position(self) -> tuple:
         """Получение текущей позиции мыши"""
-        return pyautogui.position()
+        return self.input.position()
     
     def detect_game_display(self) -> Optional[Dict[str, Any]]:
         """
@@ -418,9 +355,9 @@ class GameController:
             if platform.system() != "Linux":
                 print("❌ Этот проект поддерживает только Steam Deck (Linux)")
                 return None
-                
+            
             return self._detect_game_display_linux()
-                
+        
         except Exception as e:
             print(f"❌ Ошибка определения дисплея игры: {e}")
             import traceback
@@ -429,97 +366,25 @@ class GameController:
     
     def _detect_game_display_linux(self) -> Optional[Dict[str, Any]]:
         """Определение дисплея с игрой в Linux"""
-        import subprocess
-        
         try:
-            # Получаем информацию о всех дисплеях
-            displays_cmd = "xrandr --listmonitors"
-            result = subprocess.run(displays_cmd, shell=True, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                print(f"❌ Команда xrandr вернула ошибку: {result.stderr}")
+            displays = self._list_displays_linux()
+            if displays is None:
                 return None
             
-            print(f"🖥️  Вывод xrandr --listmonitors:")
-            print(result.stdout)
+            # Определяем на каком дисплее находится окно игры
+            window_pos = self.window_tracker.position()
+            self._display_window_pos = window_pos
             
-            displays = []
-            for line in result.stdout.split('\n')[1:]:  # Пропускаем заголовок
-                if line.strip():
-                    try:
-                        print(f"🔍 Парсим строку: '{line.strip()}'")
-                        parts = line.strip().split()
-                        if len(parts) >= 4:
-                            # Парсим строку вида: "0: +*eDP-1 1280/309x800/193+0+0  eDP-1"
-                            geometry = parts[2]  # например "1280/309x800/193+0+0"
-                            print(f"  Геометрия: {geometry}")
-                            
-                            if 'x' in geometry and '+' in geometry:
-                                size_part = geometry.split('+')[0]  # "1280/309x800/193"
-                                offset_parts = geometry.split('+')[1:]  # ["0", "0"]
-                                print(f"  Размер: {size_part}, Смещения: {offset_parts}")
-                                
-                                if '/' in size_part:
-                                    width_part = size_part.split('x')[0]  # "1280/309"
-                                    height_part = size_part.split('x')[1]  # "800/193"
-                                    width = int(width_part.split('/')[0])
-                                    height = int(height_part.split('/')[0])
-                                    
-                                    # Очищаем offset от дополнительной информации
-                                    x_offset_str = offset_parts[0].split()[0]  # "0" из "0 (screen: 0)"
-                                    y_offset_str = offset_parts[1].split()[0] if len(offset_parts) > 1 else "0"
-                                    x_offset = int(x_offset_str)
-                                    y_offset = int(y_offset_str)
-                                    
-                                    display_info = {
-                                        'name': parts[-1],
-                                        'width': width,
-                                        'height': height,
-                                        'x': x_offset,
-                                        'y': y_offset,
-                                        'primary': '*' in line
-                                    }
-                                    displays.append(display_info)
-                                    print(f"  ✅ Добавлен дисплей: {display_info}")
-                    except Exception as e:
-                        print(f"  ❌ Ошибка парсинга строки '{line.strip()}': {e}")
-            
-            # Ищем окно игры и определяем на каком дисплее оно находится
-            window_cmd = f"xdotool search --name '{self.window_title}'"
-            window_result = subprocess.run(window_cmd, shell=True, capture_output=True, text=True)
-            
-            if window_result.returncode == 0 and window_result.stdout.strip():
-                window_id = window_result.stdout.strip().split('\n')[0]
-                
-                # Получаем позицию окна
-                geometry_cmd = f"xdotool getwindowgeometry {window_id}"
-                geom_result = subprocess.run(geometry_cmd, shell=True, capture_output=True, text=True)
+            if window_pos:
+                window_x, window_y = window_pos
+                print(f"  Позиция окна: ({window_x}, {window_y})")
                 
-                if geom_result.returncode == 0:
-                    print(f"🔍 Вывод xdotool getwindowgeometry:")
-                    print(geom_result.stdout)
-                    
-                    # Парсим вывод getwindowgeometry
-                    for line in geom_result.stdout.split('\n'):
-                        if 'Position:' in line:
-                            pos_str = line.split('Position:')[1].strip()
-                            print(f"  Позиция строка: '{pos_str}'")
-                            
-                            if ',' in pos_str:
-                                # Очищаем координаты от дополнительной информации типа "(screen: 0)"
-                                x_str = pos_str.split(',')[0].strip().split()[0]  # "0" из "0 (screen: 0)"
-                                y_str = pos_str.split(',')[1].strip().split()[0]  # "0" из "0 (screen: 0)"
-                                window_x = int(x_str)
-                                window_y = int(y_str)
-                                print(f"  Позиция окна: ({window_x}, {window_y})")
-                                
-                                # Определяем на каком дисплее находится окно
-                                for display in displays:
-                                    if (display['x'] <= window_x < display['x'] + display['width'] and
-                                        display['y'] <= window_y < display['y'] + display['height']):
-                                        
-                                        print(f"🎮 Игра найдена на дисплее {display['name']}: {display['width']}x{display['height']} +{display['x']}+{display['y']}")
-                                        return display
+                for display in displays:
+                    if (display['x'] <= window_x < display['x'] + display['width'] and
+                        display['y'] <= window_y < display['y'] + display['height']):
+                        
+                        print(f"🎮 Игра найдена на дисплее {display['name']}: {display['width']}x{display['height']} +{display['x']}+{display['y']}")
+                        return display
             
             # Если не удалось найти окно, используем fallback логику
             if self.multi_display_config.prefer_external_display and len(displays) > 1:
@@ -535,19 +400,83 @@ class GameController:
                 print(f"🖥️  Используем основной дисплей: {primary_display['name']}")
             
             return primary_display
-            
+        
         except Exception as e:
             print(f"Error detecting Linux display: {e}")
             return None
     
-
+    def _list_displays_linux(self) -> Optional[List[Dict[str, Any]]]:
+        """
+        Список дисплеев из xrandr (кэшируется: мониторы меняются редко,
+        сбрасывается вместе с game_display_info)
+        """
+        import subprocess
+        
+        if self._displays is not None:
+            return self._displays
+        
+        # Получаем информацию о всех дисплеях
+        result = subprocess.run(['xrandr', '--listmonitors'], capture_output=True, text=True)
+        
+        if result.returncode != 0:
+            print(f"❌ Команда xrandr вернула ошибку: {result.stderr}")
+            return None
+        
+        print(f"🖥️  Вывод xrandr --listmonitors:")
+        print(result.stdout)
+        
+        displays = []
+        for line in result.stdout.split('\n')[1:]:  # Пропускаем заголовок
+            if line.strip():
+                try:
+                    print(f"🔍 Парсим строку: '{line.strip()}'")
+                    parts = line.strip().split()
+                    if len(parts) >= 4:
+                        # Парсим строку вида: "0: +*eDP-1 1280/309x800/193+0+0  eDP-1"
+                        geometry = parts[2]  # например "1280/309x800/193+0+0"
+                        print(f"  Геометрия: {geometry}")
+                        
+                        if 'x' in geometry and '+' in geometry:
+                            size_part = geometry.split('+')[0]  # "1280/309x800/193"
+                            offset_parts = geometry.split('+')[1:]  # ["0", "0"]
+                            print(f"  Размер: {size_part}, Смещения: {offset_parts}")
+                            
+                            if '/' in size_part:
+                                width_part = size_part.split('x')[0]  # "1280/309"
+                                height_part = size_part.split('x')[1]  # "800/193"
+                                width = int(width_part.split('/')[0])
+                                height = int(height_part.split('/')[0])
+                                
+                                # Очищаем offset от дополнительной информации
+                                x_offset_str = offset_parts[0].split()[0]  # "0" из "0 (screen: 0)"
+                                y_offset_str = offset_parts[1].split()[0] if len(offset_parts) > 1 else "0"
+                                x_offset = int(x_offset_str)
+                                y_offset = int(y_offset_str)
+                                
+                                display_info = {
+                                    'name': parts[-1],
+                                    'width': width,
+                                    'height': height,
+                                    'x': x_offset,
+                                    'y': y_offset,
+                                    'primary': '*' in line
+                                }
+                                displays.append(display_info)
+                                print(f"  ✅ Добавлен дисплей: {display_info}")
+                except Exception as e:
+                    print(f"  ❌ Ошибка парсинга строки '{line.strip()}': {e}")
+        
+        self._displays = displays
+        return displays
+    
+    
     def adjust_coordinates(self, x: int, y: int) -> tuple:
         """
         Корректировка координат с учетом мультидисплея
         
         Args:
             x, y: Исходные координаты (относительно игрового окна)
-            
+        
         Returns:
             Скорректированные координаты для конкретного дисплея
         """
@@ -557,6 +486,11 @@ class GameController:
         
         # Если автоопределение включено, получаем информацию о дисплее
         if self.multi_display_config.auto_detect_game_screen:
+            # Окно перенесли на другое место - дисплей определяем заново
+            window_pos = self.window_tracker.position()
+            if window_pos is not None and window_pos != self._display_window_pos:
+                self.game_display_info = None
+            
             if self.game_display_info is None:
                 print("🔍 Определяем дисплей с игрой...")
                 self.game_display_info = self.detect_game_display()
@@ -0,0 +1,384 @@
+"""
+Бэкенды эмуляции ввода для GameController
+"""
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+
+try:
+    from Xlib import X, XK, display as xdisplay
+    from Xlib.ext import xtest
+    XTEST_AVAILABLE = True
+except ImportError:
+    XTEST_AVAILABLE = False
+    X = XK = xdisplay = xtest = None
+
+try:
+    import pyautogui
+    PYAUTOGUI_AVAILABLE = True
+except ImportError:
+    PYAUTOGUI_AVAILABLE = False
+    pyautogui = None
+
+try:
+    from pynput import keyboard
+    from pynput.keyboard import Key
+    PYNPUT_AVAILABLE = True
+except ImportError:
+    PYNPUT_AVAILABLE = False
+    keyboard = Key = None
+
+
+class InputBackend(ABC):
+    """
+    Базовый класс бэкенда ввода
+    
+    Методы блокирующие: GameController вызывает их в пуле input
+    (один поток - один владелец соединения с X сервером).
+    """
+    
+    name = "base"
+    
+    def is_available(self) -> bool:
+        """Может ли бэкенд работать в текущем окружении"""
+        return True
+    
+    @abstractmethod
+    def click(self, x: int, y: int, button: str = 'left', clicks: int = 1) -> None:
+        """Клик (clicks раз) в точке экрана"""
+    
+    @abstractmethod
+    def move(self, x: int, y: int, duration: float = 0.0) -> None:
+        """Перемещение указателя (плавно, если duration > 0)"""
+    
+    @abstractmethod
+    def press_key(self, key: str) -> None:
+        """Нажатие и отпускание клавиши"""
+    
+    @abstractmethod
+    def hotkey(self, keys: List[str]) -> None:
+        """Сочетание клавиш (нажатие по порядку, отпускание в обратном)"""
+    
+    @abstractmethod
+    def type_text(self, text: str, interval: float = 0.0) -> None:
+        """Ввод текста"""
+    
+    @abstractmethod
+    def scroll(self, amount: int, x: Optional[int] = None, y: Optional[int] = None) -> None:
+        """Прокрутка колесом (положительное amount - вверх)"""
+    
+    @abstractmethod
+    def drag(self, from_x: int, from_y: int, to_x: int, to_y: int, duration: float = 0.5) -> None:
+        """Перетаскивание левой кнопкой"""
+    
+    @abstractmethod
+    def screen_size(self) -> Tuple[int, int]:
+        """Размер экрана (ширина, высота)"""
+    
+    @abstractmethod
+    def position(self) -> Tuple[int, int]:
+        """Текущее положение указателя"""
+    
+    def close(self) -> None:
+        """Освобождение ресурсов"""
+
+
+class XTestInputBackend(InputBackend):
+    """
+    Ввод через расширение XTest с одним постоянным соединением с X сервером.
+    
+    События одного действия отправляются пачкой и сбрасываются на сервер
+    одним flush; паузы - только удержание кнопки/клавиши (key_hold),
+    чтобы игра успела увидеть нажатие в кадре.
+    """
+    
+    name = "xtest"
+    
+    # Имена клавиш из команд -> X keysym
+    KEY_NAMES = {
+        'enter': 'Return', 'return': 'Return', 'esc': 'Escape', 'escape': 'Escape',
+        'space': 'space', 'tab': 'Tab', 'backspace': 'BackSpace', 'delete': 'Delete',
+        'up': 'Up', 'down': 'Down', 'left': 'Left', 'right': 'Right',
+        'home': 'Home', 'end': 'End', 'pageup': 'Prior', 'pagedown': 'Next',
+        'ctrl': 'Control_L', 'control': 'Control_L', 'alt': 'Alt_L', 'shift': 'Shift_L',
+        'win': 'Super_L', 'super': 'Super_L',
+    }
+    
+    BUTTONS = {'left': 1, 'middle': 2, 'right': 3}
+    SCROLL_UP, SCROLL_DOWN = 4, 5
+    
+    def __init__(self, key_hold: float = 0.02, move_rate: int = 120):
+        self.key_hold = key_hold
+        self.move_rate = move_rate
+        self._display = None
+        self._lock = threading.Lock()
+    
+    def is_available(self) -> bool:
+        if not XTEST_AVAILABLE or not os.environ.get('DISPLAY'):
+            return False
+        try:
+            return self._get_display().has_extension('XTEST')
+        except Exception:
+            return False
+    
+    def click(self, x: int, y: int, button: str = 'left', clicks: int = 1) -> None:
+        code = self.BUTTONS.get(button, 1)
+        with self._lock:
+            disp = self._get_display()
+            xtest.fake_input(disp, X.MotionNotify, x=x, y=y)
+            for _ in range(max(1, clicks)):
+                xtest.fake_input(disp, X.ButtonPress, code)
+                self._hold(disp)
+                xtest.fake_input(disp, X.ButtonRelease, code)
+            disp.sync()
+    
+    def move(self, x: int, y: int, duration: float = 0.0) -> None:
+        with self._lock:
+            disp = self._get_display()
+            self._move_locked(disp, x, y, duration)
+            disp.sync()
+    
+    def press_key(self, key: str) -> None:
+        with self._lock:
+            disp = self._get_display()
+            keycode = self._keycode(key)
+            xtest.fake_input(disp, X.KeyPress, keycode)
+            self._hold(disp)
+            xtest.fake_input(disp, X.KeyRelease, keycode)
+            disp.sync()
+    
+    def hotkey(self, keys: List[str]) -> None:
+        with self._lock:
+            disp = self._get_display()
+            keycodes = [self._keycode(key) for key in keys]
+            for keycode in keycodes:
+                xtest.fake_input(disp, X.KeyPress, keycode)
+            self._hold(disp)
+            for keycode in reversed(keycodes):
+                xtest.fake_input(disp, X.KeyRelease, keycode)
+            disp.sync()
+    
+    def type_text(self, text: str, interval: float = 0.0) -> None:
+        with self._lock:
+            disp = self._get_display()
+            shift = disp.keysym_to_keycode(XK.string_to_keysym('Shift_L'))
+            for char in text:
+                keycode, needs_shift = self._char_keycode(disp, char)
+                if needs_shift:
+                    xtest.fake_input(disp, X.KeyPress, shift)
+                xtest.fake_input(disp, X.KeyPress, keycode)
+                xtest.fake_input(disp, X.KeyRelease, keycode)
+                if needs_shift:
+                    xtest.fake_input(disp, X.KeyRelease, shift)
+                if interval > 0:
+                    disp.flush()
+                    time.sleep(interval)
+            disp.sync()
+    
+    def scroll(self, amount: int, x: Optional[int] = None, y: Optional[int] = None) -> None:
+        button = self.SCROLL_UP if amount > 0 else self.SCROLL_DOWN
+        with self._lock:
+            disp = self._get_display()
+            if x is not None and y is not None:
+                xtest.fake_input(disp, X.MotionNotify, x=x, y=y)
+            for _ in range(abs(amount)):
+                xtest.fake_input(disp, X.ButtonPress, button)
+                xtest.fake_input(disp, X.ButtonRelease, button)
+            disp.sync()
+    
+    def drag(self, from_x: int, from_y: int, to_x: int, to_y: int, duration: float = 0.5) -> None:
+        with self._lock:
+            disp = self._get_display()
+            xtest.fake_input(disp, X.MotionNotify, x=from_x, y=from_y)
+            xtest.fake_input(disp, X.ButtonPress, self.BUTTONS['left'])
+            self._hold(disp)
+            self._move_locked(disp, to_x, to_y, duration)
+            xtest.fake_input(disp, X.ButtonRelease, self.BUTTONS['left'])
+            disp.sync()
+    
+    def screen_size(self) -> Tuple[int, int]:
+        with self._lock:
+            screen = self._get_display().screen()
+            return screen.width_in_pixels, screen.height_in_pixels
+    
+    def position(self) -> Tuple[int, int]:
+        with self._lock:
+            pointer = self._get_display().screen().root.query_pointer()
+            return pointer.root_x, pointer.root_y
+    
+    def close(self) -> None:
+        with self._lock:
+            if self._display is not None:
+                self._display.close()
+                self._display = None
+    
+    def _move_locked(self, disp, x: int, y: int, duration: float) -> None:
+        """Перемещение указателя; с duration - плавно с частотой move_rate"""
+        steps = int(duration * self.move_rate)
+        if steps > 1:
+            pointer = disp.screen().root.query_pointer()
+            start_x, start_y = pointer.root_x, pointer.root_y
+            step_delay = duration / steps
+            for i in range(1, steps):
+                xtest.fake_input(disp, X.MotionNotify,
+                                 x=start_x + (x - start_x) * i // steps,
+                                 y=start_y + (y - start_y) * i // steps)
+                disp.flush()
+                time.sleep(step_delay)
+        xtest.fake_input(disp, X.MotionNotify, x=x, y=y)
+    
+    def _hold(self, disp) -> None:
+        """Удержание нажатия, чтобы игра обработала его в отдельном кадре"""
+        if self.key_hold > 0:
+            disp.flush()
+            time.sleep(self.key_hold)
+    
+    def _keycode(self, key: str) -> int:
+        """Keycode клавиши по имени ('enter', 'f1', 'a')"""
+        disp = self._get_display()
+        name = self.KEY_NAMES.get(key.lower(), key)
+        if len(name) > 1 and name[0] in 'fF' and name[1:].isdigit():
+            name = name.upper()
+        keysym = XK.string_to_keysym(name)
+        if keysym == X.NoSymbol and len(name) == 1:
+            keysym = self._char_keysym(name)
+        keycode = disp.keysym_to_keycode(keysym) if keysym != X.NoSymbol else 0
+        if not keycode:
+            raise ValueError(f"Неизвестная клавиша: {key}")
+        return keycode
+    
+    def _char_keycode(self, disp, char: str) -> Tuple[int, bool]:
+        """Keycode символа и нужен ли Shift"""
+        keysym = self._char_keysym(char)
+        keycode = disp.keysym_to_keycode(keysym)
+        if not keycode:
+            raise ValueError(f"Символ {char!r} отсутствует в текущей раскладке")
+        return keycode, disp.keycode_to_keysym(keycode, 0) != keysym
+    
+    @staticmethod
+    def _char_keysym(char: str) -> int:
+        """Keysym символа: Latin-1 совпадает с кодом, остальное - Unicode keysym"""
+        if char == '\n':
+            return XK.string_to_keysym('Return')
+        if char == '\t':
+            return XK.string_to_keysym('Tab')
+        code = ord(char)
+        return code if code < 0x100 else 0x01000000 | code
+    
+    def _get_display(self):
+        if self._display is None:
+            self._display = xdisplay.Display()
+        return self._display
+
+
+class PyAutoGUIInputBackend(InputBackend):
+    """Ввод через pyautogui (и pynput для специальных клавиш)"""
+    
+    name = "pyautogui"
+    
+    def __init__(self, key_hold: float = 0.02):
+        self.key_hold = key_hold
+        
+        if PYAUTOGUI_AVAILABLE:
+            # Пауза после каждого вызова pyautogui - только удержание, без action_delay
+            pyautogui.PAUSE = key_hold
+            pyautogui.FAILSAFE = True  # Перемещение мыши в угол останавливает выполнение
+        
+        # Маппинг клавиш (только если pynput доступен)
+        if PYNPUT_AVAILABLE:
+            self.key_mapping = {
+                'space': ' ',
+                'enter': '\n',
+                'tab': '\t',
+                'escape': Key.esc,
+                'up': Key.up,
+                'down': Key.down,
+                'left': Key.left,
+                'right': Key.right,
+                'f1': Key.f1,
+                'f2': Key.f2,
+                'f3': Key.f3,
+                'f4': Key.f4,
+                'f5': Key.f5,
+                'ctrl': Key.ctrl,
+                'alt': Key.alt,
+                'shift': Key.shift,
+            }
+            self._keyboard = keyboard.Controller()
+        else:
+            self.key_mapping = {}
+            self._keyboard = None
+    
+    def is_available(self) -> bool:
+        return PYAUTOGUI_AVAILABLE
+    
+    def click(self, x: int, y: int, button: str = 'left', clicks: int = 1) -> None:
+        pyautogui.click(x, y, clicks=max(1, clicks), button='right' if button == 'right' else 'left')
+    
+    def move(self, x: int, y: int, duration: float = 0.0) -> None:
+        pyautogui.moveTo(x, y, duration=duration)
+    
+    def press_key(self, key: str) -> None:
+        mapped_key = self.key_mapping.get(key.lower(), key)
+        if isinstance(mapped_key, str):
+            pyautogui.press(mapped_key)
+        else:
+            # Для специальных клавиш используем pynput
+            self._keyboard.press(mapped_key)
+            self._keyboard.release(mapped_key)
+    
+    def hotkey(self, keys: List[str]) -> None:
+        pyautogui.hotkey(*keys)
+    
+    def type_text(self, text: str, interval: float = 0.0) -> None:
+        pyautogui.typewrite(text, interval=interval)
+    
+    def scroll(self, amount: int, x: Optional[int] = None, y: Optional[int] = None) -> None:
+        if x is not None and y is not None:
+            pyautogui.moveTo(x, y)
+        pyautogui.scroll(amount)
+    
+    def drag(self, from_x: int, from_y: int, to_x: int, to_y: int, duration: float = 0.5) -> None:
+        pyautogui.moveTo(from_x, from_y)
+        pyautogui.dragTo(to_x, to_y, duration=duration, button='left')
+    
+    def screen_size(self) -> Tuple[int, int]:
+        return tuple(pyautogui.size())
+    
+    def position(self) -> Tuple[int, int]:
+        return tuple(pyautogui.position())
+
+
+def create_input_backend(preferred: str = "auto", key_hold: float = 0.02) -> InputBackend:
+    """
+    Выбор бэкенда ввода
+    
+    Args:
+        preferred: "auto" (xtest, при недоступности pyautogui), "xtest" или "pyautogui"
+        key_hold: Удержание кнопки/клавиши (сек)
+    
+    Returns:
+        Доступный бэкенд
+    
+    Raises:
+        ImportError: Ни один бэкенд недоступен
+    """
+    preferred = preferred.lower()
+    candidates: List[InputBackend] = []
+    if preferred in ("auto", "xtest"):
+        candidates.append(XTestInputBackend(key_hold=key_hold))
+    if preferred in ("auto", "pyautogui"):
+        candidates.append(PyAutoGUIInputBackend(key_hold=key_hold))
+    
+    for backend in candidates:
+        if backend.is_available():
+            print(f"🖱️  Бэкенд ввода: {backend.name}")
+            return backend
+        backend.close()
+    
+    raise ImportError(
+        "Нет доступного бэкенда ввода. Установите python3-xlib (XTest) "
+        "или PyAutoGUI: pip install PyAutoGUI"
+    )
@@ -0,0 +1,260 @@
+"""
+Отслеживание окна игры: кэш ID окна, геометрии и фокуса
+"""
+import subprocess
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+try:
+    from Xlib import X, display as xdisplay
+    from Xlib.error import XError
+    from Xlib.protocol import event as xevent
+    XLIB_AVAILABLE = True
+except ImportError:
+    XLIB_AVAILABLE = False
+    X = xdisplay = xevent = None
+    XError = Exception
+
+
+Geometry = Tuple[int, int, int, int]  # x, y, width, height в координатах экрана
+
+
+class WindowTracker:
+    """
+    Кэш окна игры вместо запуска xdotool на каждое действие.
+    
+    ID окна ищется один раз и повторно только после исчезновения окна.
+    Геометрия обновляется по событиям X11 (ConfigureNotify/DestroyNotify),
+    а без них - не чаще раза в poll_interval секунд. Без python-xlib
+    используется xdotool (без shell) с тем же кэшированием.
+    """
+    
+    def __init__(self, window_title: str, poll_interval: float = 1.0):
+        self.window_title = window_title
+        self.poll_interval = poll_interval
+        
+        self._lock = threading.Lock()
+        self._display = None
+        self._window = None
+        self._window_id: Optional[int] = None
+        self._geometry: Optional[Geometry] = None
+        self._checked_at = 0.0
+        self._use_xlib = XLIB_AVAILABLE
+        
+        # Статистика поиска окна
+        self.resolves = 0
+    
+    def window_id(self) -> Optional[int]:
+        """ID окна игры (None, если окно не найдено)"""
+        with self._lock:
+            self._refresh_locked()
+            return self._window_id
+    
+    def geometry(self) -> Optional[Geometry]:
+        """Положение и размер окна в координатах экрана"""
+        with self._lock:
+            self._refresh_locked()
+            return self._geometry
+    
+    def position(self) -> Optional[Tuple[int, int]]:
+        """Левый верхний угол окна"""
+        geometry = self.geometry()
+        return (geometry[0], geometry[1]) if geometry else None
+    
+    def is_alive(self) -> bool:
+        """Существует ли окно игры"""
+        return self.window_id() is not None
+    
+    def invalidate(self) -> None:
+        """Сбросить кэш (следующий запрос ищет окно заново)"""
+        with self._lock:
+            self._forget_locked()
+    
+    def is_focused(self) -> bool:
+        """Активно ли окно игры"""
+        with self._lock:
+            self._refresh_locked()
+            if self._window_id is None:
+                return False
+            if self._use_xlib:
+                try:
+                    disp = self._get_display()
+                    root = disp.screen().root
+                    active = root.get_full_property(disp.intern_atom('_NET_ACTIVE_WINDOW'), X.AnyPropertyType)
+                    return bool(active and active.value and active.value[0] == self._window_id)
+                except XError:
+                    return False
+            result = self._run_xdotool(['getactivewindow'])
+            return bool(result) and result.strip() == str(self._window_id)
+    
+    def activate(self) -> bool:
+        """Активация окна игры"""
+        with self._lock:
+            self._refresh_locked()
+            if self._window_id is None:
+                return False
+            
+            if self._use_xlib:
+                try:
+                    disp = self._get_display()
+                    root = disp.screen().root
+                    message = xevent.ClientMessage(
+                        window=self._window,
+                        client_type=disp.intern_atom('_NET_ACTIVE_WINDOW'),
+                        data=(32, [2, X.CurrentTime, 0, 0, 0])
+                    )
+                    root.send_event(message, event_mask=X.SubstructureRedirectMask | X.SubstructureNotifyMask)
+                    disp.flush()
+                    return True
+                except XError:
+                    self._forget_locked()
+                    return False
+            
+            return self._run_xdotool(['windowactivate', str(self._window_id)]) is not None
+    
+    def close(self) -> None:
+        """Закрытие соединения с X сервером"""
+        with self._lock:
+            if self._display is not None:
+                self._display.close()
+                self._display = None
+            self._forget_locked()
+    
+    def _refresh_locked(self) -> None:
+        """Поиск окна при необходимости и обновление геометрии"""
+        if self._use_xlib:
+            try:
+                self._refresh_xlib()
+                return
+            except Exception as e:
+                # Нет доступа к X серверу напрямую - переходим на xdotool
+                print(f"⚠️  WindowTracker: Xlib недоступен ({e}), используется xdotool")
+                self._use_xlib = False
+                self._display = None
+                self._forget_locked()
+        
+        self._refresh_xdotool()
+    
+    def _refresh_xlib(self) -> None:
+        disp = self._get_display()
+        
+        # События окна: перемещение, изменение размера, закрытие
+        while self._window is not None and disp.pending_events():
+            ev = disp.next_event()
+            if ev.type in (X.DestroyNotify, X.UnmapNotify):
+                self._forget_locked()
+            elif ev.type == X.ConfigureNotify:
+                self._checked_at = 0.0
+        
+        now = time.time()
+        if now - self._checked_at < self.poll_interval:
+            return
+        
+        if self._window is None:
+            self._window = self._find_window_xlib(disp)
+            if self._window is None:
+                self._checked_at = now
+                return
+            self._window_id = self._window.id
+            self.resolves += 1
+            self._window.change_attributes(event_mask=X.StructureNotifyMask)
+        
+        root = disp.screen().root
+        try:
+            geometry = self._window.get_geometry()
+            origin = root.translate_coords(self._window, 0, 0)
+        except XError:
+            # Окно пропало - найдем заново при следующем запросе
+            self._forget_locked()
+            return
+        
+        self._geometry = (origin.x, origin.y, geometry.width, geometry.height)
+        self._checked_at = now
+    
+    def _find_window_xlib(self, disp):
+        """Поиск окна по заголовку через _NET_CLIENT_LIST"""
+        root = disp.screen().root
+        client_list = root.get_full_property(disp.intern_atom('_NET_CLIENT_LIST'), X.AnyPropertyType)
+        window_ids = client_list.value if client_list else []
+        
+        net_wm_name = disp.intern_atom('_NET_WM_NAME')
+        utf8_string = disp.intern_atom('UTF8_STRING')
+        
+        for window_id in window_ids:
+            window = disp.create_resource_object('window', window_id)
+            try:
+                name_prop = window.get_full_property(net_wm_name, utf8_string)
+                if name_prop:
+                    name = name_prop.value.decode('utf-8', errors='ignore')
+                else:
+                    name = window.get_wm_name() or ""
+            except XError:
+                continue
+            
+            if self.window_title in name:
+                return window
+        
+        return None
+    
+    def _refresh_xdotool(self) -> None:
+        now = time.time()
+        if now - self._checked_at < self.poll_interval:
+            return
+        self._checked_at = now
+        
+        if self._window_id is None:
+            output = self._run_xdotool(['search', '--name', self.window_title])
+            if not output or not output.strip():
+                return
+            self._window_id = int(output.strip().split('\n')[0])
+            self.resolves += 1
+        
+        output = self._run_xdotool(['getwindowgeometry', '--shell', str(self._window_id)])
+        if output is None:
+            self._forget_locked()
+            return
+        
+        values = dict(line.split('=', 1) for line in output.splitlines() if '=' in line)
+        try:
+            self._geometry = (int(values['X']), int(values['Y']), int(values['WIDTH']), int(values['HEIGHT']))
+        except (KeyError, ValueError):
+            self._geometry = None
+    
+    @staticmethod
+    def _run_xdotool(args) -> Optional[str]:
+        """Запуск xdotool без shell, None при ошибке"""
+        try:
+            result = subprocess.run(['xdotool'] + list(args), capture_output=True, text=True, timeout=5)
+        except (OSError, subprocess.SubprocessError):
+            return None
+        return result.stdout if result.returncode == 0 else None
+    
+    def _forget_locked(self) -> None:
+        self._window = None
+        self._window_id = None
+        self._geometry = None
+        self._checked_at = 0.0
+    
+    def _get_display(self):
+        if self._display is None:
+            self._display = xdisplay.Display()
+        return self._display
+
+
+_trackers: Dict[str, WindowTracker] = {}
+_trackers_lock = threading.Lock()
+
+
+def get_window_tracker(window_title: str) -> WindowTracker:
+    """
+    Общий для процесса трекер окна игры
+    
+    GameController (фокус, смещение дисплея) и захват экрана получают
+    один и тот же объект, поэтому окно ищется и отслеживается один раз.
+    """
+    with _trackers_lock:
+        tracker = _trackers.get(window_title)
+        if tracker is None:
+            tracker = _trackers[window_title] = WindowTracker(window_title)
+        return tracker
@@ -1,15 +1,28 @@
 """
 LLM Agent для обработки команд и взаимодействия с Ollama
 """
-import json
 import asyncio
+import time
 import aiohttp
-from typing import Dict, List, Optional, Any
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Any
 from PIL import Image
-import io
-import base64
 
-from ..utils.config import Config
+from ..utils.config import Config, LLMBackendConfig
+from ..utils.tracing import tracer
+from ..utils.recorder import session_recorder
+from .budget import llm_budget
+from .http_client import http_client
+from .json_output import ANALYSIS_SCHEMA, parse_llm_json
+from .payload import EncodedImage, PayloadEncoder
+from .prompts import PromptParts, split_prompt
+from .router import shared_router
+from .streaming import (
+    StreamingJSONExtractor, anthropic_usage, iter_anthropic_stream, iter_ollama_stream,
+    iter_openai_stream, ollama_usage, openai_usage
+)
+
+
+ANTHROPIC_VERSION = "2023-06-01"
 
 
 class LLMAgent:
@@ -20,15 +33,26 @@ class LLMAgent:
         self.base_url = config.llm.base_url
         self.model = config.llm.model
         self.vision_model = config.llm.vision_model
-        self.session = None
+        self.stream = config.llm.stream
+        self.json_mode = config.llm.json_mode
+        self.payload_encoder = PayloadEncoder(config.llm.image)
+        
+        # Основной и резервные бэкенды: failover, circuit breaker, hedging
+        self.router = shared_router(config.llm)
     
     async def _get_session(self) -> aiohttp.ClientSession:
-        """Получение HTTP сессии"""
-        if self.session is None or self.session.closed:
-            self.session = aiohttp.ClientSession(
-                timeout=aiohttp.ClientTimeout(total=180)  # 3 минуты для Steam Deck с учетом медленной модели
-            )
-        return self.session
+        """Общая HTTP сессия с пулом keep-alive соединений"""
+        return await http_client.session()
+    
+    async def _read_stream(self, chunks: AsyncIterator[str],
+                           on_chunk: Optional[Callable[[str], None]] = None) -> str:
+        """Сборка потокового ответа с передачей фрагментов по мере прихода"""
+        parts = []
+        async for chunk in chunks:
+            parts.append(chunk)
+            if on_chunk:
+                on_chunk(chunk)
+        return ''.join(parts)
     
     async def is_available(self) -> bool:
         """Проверка доступности LLM сервиса"""
@@ -77,7 +101,7 @@ class LLMAgent:
             print(f"🤖 Модель: {self.model}")
             print(f"👁️ Vision модель: {self.vision_model}")
             return True
-            
+        
         except Exception as e:
             print(f"❌ Ошибка проверки {self.config.llm.provider} API: {e}")
             return False
@@ -113,7 +137,7 @@ class LLMAgent:
                     error_text = await response.text()
                     print(f"❌ Тест модели неудачен {response.status}: {error_text}")
                     return False
-                    
+        
         except Exception as e:
             error_type = type(e).__name__
             if "Timeout" in error_type:
@@ -124,26 +148,50 @@ class LLMAgent:
                 print(f"❌ Ошибка тестирования модели: {e}")
             return False
     
-
     
-    async def analyze_for_elements(self, screenshot: Image.Image, command: str) -> Optional[Dict[str, Any]]:
+    
+    async def analyze_for_elements(self, screenshot: Image.Image, command: str,
+                                   on_target: Optional[Callable[[Dict[str, Any]], None]] = None,
+                                   on_progress: Optional[Callable[[str], None]] = None) -> Optional[Dict[str, Any]]:
         """
         Анализ экрана для поиска элементов (используется гибридным анализатором)
         
         Args:
             screenshot: Скриншот для анализа
             command: Команда пользователя
-            
+            on_target: Вызывается для каждой поисковой цели, как только она получена
+            on_progress: Вызывается с частичным action_description при потоковом ответе
+        
         Returns:
             Словарь с анализом и поисковыми целями
         """
         try:
-            width, height = screenshot.size
-            
-            # Используем промпт из конфигурации
-            analysis_prompt = self.config.llm.analysis_prompt.format(command=command)
-            
-            response = await self._query_vision_llm(analysis_prompt, screenshot)
+            # Инструкции из конфигурации - кэшируемый префикс, строка с командой - в конце
+            analysis_prompt = split_prompt(self.config.llm.analysis_prompt, command=command)
+            
+            # Модель видит уменьшенную копию - координаты из ответа переводим в кадр
+            with tracer.span('encode'):
+                image = await self.payload_encoder.encode(screenshot)
+            
+            # При потоковом ответе цели извлекаются до окончания генерации
+            extractor = None
+            if on_target or on_progress:
+                extractor = StreamingJSONExtractor(
+                    on_target=(lambda target: on_target(image.map_coordinates(target))) if on_target else None,
+                    on_progress=on_progress
+                )
+            
+            # Лимит генерации по длине прошлых ответов на analysis_prompt
+            max_tokens = llm_budget.max_tokens('analysis', self.config.llm.budget.vision_max_tokens)
+            
+            response = await self._query_vision_llm(
+                analysis_prompt, image,
+                on_chunk=extractor.feed if extractor and self.stream else None,
+                on_reset=extractor.reset if extractor and self.stream else None,
+                schema=ANALYSIS_SCHEMA if self.json_mode else None,
+                purpose='analysis',
+                max_tokens=max_tokens
+            )
             
             if not response:
                 return None
@@ -151,22 +199,19 @@ class LLMAgent:
             # Парсим ответ (ожидаем JSON)
             response_text = response.get('response', '') if 'response' in response else str(response)
             
-            # Очищаем от markdown разметки (```json ... ```)
-            if '```json' in response_text:
-                # Извлекаем JSON из markdown блока
-                start_marker = '```json'
-                end_marker = '```'
-                start_idx = response_text.find(start_marker)
-                if start_idx != -1:
-                    start_idx += len(start_marker)
-                    end_idx = response_text.find(end_marker, start_idx)
-                    if end_idx != -1:
-                        response_text = response_text[start_idx:end_idx].strip()
-            
-            try:
-                result = json.loads(response_text)
+            if extractor and not self.stream:
+                extractor.feed(response_text)
+            
+            # Markdown блоки, текст вокруг JSON и обрезанный по max_tokens ответ
+            result = parse_llm_json(response_text)
+            if result is not None:
                 result['success'] = True
                 
+                image.map_coordinates(result)
+                for target in result.get('search_targets', []):
+                    if isinstance(target, dict):
+                        image.map_coordinates(target)
+                
                 # Логируем команду LLM
                 action_desc = result.get('action_description', 'Неизвестное действие')
                 search_targets = result.get('search_targets', [])
@@ -175,33 +220,34 @@ class LLMAgent:
                 print(f"🔍 Поисковые цели: {targets_text}")
                 
                 return result
-            except (json.JSONDecodeError, ValueError):
-                print(f"Ошибка парсинга JSON от LLM: {response_text}")
-                return {
-                    'analysis': 'JSON parsing failed',
-                    'search_targets': [],
-                    'success': False
-                }
-                
+            
+            print(f"Ошибка парсинга JSON от LLM: {response_text}")
+            return {
+                'analysis': 'JSON parsing failed',
+                'search_targets': [],
+                'success': False
+            }
+        
         except Exception as e:
             print(f"Error analyzing for elements: {e}")
             return None
-
+    
     async def describe_screen(self, screenshot: Image.Image) -> Optional[str]:
         """
         Описание содержимого экрана
         
         Args:
             screenshot: Скриншот для анализа
-            
+        
         Returns:
             Текстовое описание экрана или None при ошибке
         """
         try:
-            prompt = self.config.vision.describe_prompt
+            prompt = PromptParts(static=self.config.vision.describe_prompt.strip(), dynamic="")
             
             # Используем только vision модель для анализа изображений
-            response = await self._query_vision_llm(prompt, screenshot)
+            image = await self.payload_encoder.encode(screenshot)
+            response = await self._query_vision_llm(prompt, image)
             
             if not response:
                 print("❌ Vision модель недоступна или не может обработать изображение")
@@ -220,50 +266,67 @@ class LLMAgent:
             
             print("❌ Неожиданная структура ответа от Vision LLM")
             return None
-            
+        
         except Exception as e:
             print(f"Error describing screen: {e}")
             return None
     
-
     
-    async def _query_llm(self, prompt: str, screenshot: Optional[Image.Image] = None) -> Optional[Dict[str, Any]]:
-        """Запрос к текстовой LLM"""
-        provider = self.config.llm.provider.lower()
+    
+    async def _query_llm(self, prompt: str, screenshot: Optional[Image.Image] = None,
+                         on_chunk: Optional[Callable[[str], None]] = None) -> Optional[Dict[str, Any]]:
+        """Запрос к текстовой LLM (с переключением между бэкендами)"""
+        async def request(backend: LLMBackendConfig, chunk_cb: Optional[Callable[[str], None]]):
+            provider = backend.provider.lower()
+            if provider == "ollama":
+                query = self._query_ollama_api(backend, prompt, chunk_cb)
+            elif provider == "anthropic":
+                query = self._query_anthropic_api(
+                    backend, PromptParts(static="", dynamic=prompt), None, chunk_cb,
+                    max_tokens=self.config.llm.max_tokens, temperature=self.config.llm.temperature
+                )
+            else:
+                query = self._query_openai_api(backend, prompt, chunk_cb)
+            return await self._record_usage(backend, backend.model, query, 'text', self.config.llm.max_tokens,
+                                            prompt)
         
-        if provider == "openai" or provider == "deepseek" or provider == "anthropic":
-            return await self._query_openai_api(prompt)
-        else:
-            return await self._query_ollama_api(prompt)
+        return await self.router.call(request, on_chunk)
     
-    async def _query_ollama_api(self, prompt: str) -> Optional[Dict[str, Any]]:
+    async def _query_ollama_api(self, backend: LLMBackendConfig, prompt: str,
+                                on_chunk: Optional[Callable[[str], None]] = None) -> Optional[Dict[str, Any]]:
         """Запрос к локальной Ollama"""
         try:
             session = await self._get_session()
             
-            print(f"🤖 Отправляем запрос к Ollama модели: {self.model}")
+            print(f"🤖 Отправляем запрос к Ollama модели: {backend.model}")
             
             payload = {
-                "model": self.model,
+                "model": backend.model,
                 "prompt": prompt,
-                "stream": False,
+                "stream": self.stream,
                 "options": {
                     "temperature": self.config.llm.temperature,
                     "num_predict": self.config.llm.max_tokens
                 }
             }
             
-            async with session.post(f"{self.base_url}/api/generate", json=payload) as response:
+            async with session.post(f"{backend.base_url}/api/generate", json=payload) as response:
                 if response.status == 200:
-                    return await response.json()
+                    if self.stream:
+                        usage = {}
+                        text = await self._read_stream(iter_ollama_stream(response, usage), on_chunk)
+                        return {"response": text, "usage": usage}
+                    result = await response.json()
+                    result['usage'] = ollama_usage(result)
+                    return result
                 else:
                     error_text = await response.text()
                     print(f"Ollama API error {response.status}: {error_text}")
-                    
+        
         except Exception as e:
             error_type = type(e).__name__
             if "ClientConnectorError" in error_type:
-                print(f"❌ Не удается подключиться к Ollama серверу ({self.base_url})")
+                print(f"❌ Не удается подключиться к Ollama серверу ({backend.base_url})")
                 print(f"💡 Проверьте что Ollama запущен: systemctl --user status ollama")
             elif "Timeout" in error_type:
                 print(f"❌ Таймаут при запросе к Ollama: {e}")
@@ -275,17 +338,18 @@ class LLMAgent:
         
         return None
     
-    async def _query_openai_api(self, prompt: str) -> Optional[Dict[str, Any]]:
+    async def _query_openai_api(self, backend: LLMBackendConfig, prompt: str,
+                                on_chunk: Optional[Callable[[str], None]] = None) -> Optional[Dict[str, Any]]:
         """Запрос к OpenAI-совместимому API (OpenAI, DeepSeek, etc.)"""
         try:
             session = await self._get_session()
             
-            print(f"🚀 Отправляем запрос к {self.config.llm.provider} модели: {self.model}")
+            print(f"🚀 Отправляем запрос к {backend.provider} модели: {backend.model}")
             
             # Получаем API ключ и URL
-            api_key = getattr(self.config.llm, 'api_key', None)
+            api_key = backend.api_key
             if not api_key:
-                print(f"❌ API ключ не найден для {self.config.llm.provider}")
+                print(f"❌ API ключ не найден для {backend.provider}")
                 return None
             
             headers = {
@@ -295,75 +359,120 @@ class LLMAgent:
             
             # Формируем payload в формате OpenAI
             payload = {
-                "model": self.model,
+                "model": backend.model,
                 "messages": [
                     {"role": "user", "content": prompt}
                 ],
                 "temperature": self.config.llm.temperature,
-                "max_tokens": self.config.llm.max_tokens
+                "max_tokens": self.config.llm.max_tokens,
+                "stream": self.stream
             }
+            if self.stream:
+                # Последний фрагмент потока с usage для учета токенов
+                payload["stream_options"] = {"include_usage": True}
             
-            async with session.post(f"{self.base_url}/v1/chat/completions", 
+            async with session.post(self._chat_completions_url(backend), 
                                   json=payload, headers=headers) as response:
                 if response.status == 200:
+                    if self.stream:
+                        usage = {}
+                        text = await self._read_stream(iter_openai_stream(response, usage), on_chunk)
+                        return {"response": text, "usage": usage}
                     result = await response.json()
                     # Преобразуем в формат Ollama для совместимости
                     if 'choices' in result and len(result['choices']) > 0:
                         content = result['choices'][0]['message']['content']
-                        return {"response": content}
+                        return {"response": content, "usage": openai_usage(result)}
                     return None
                 else:
                     error_text = await response.text()
-                    print(f"{self.config.llm.provider} API error {response.status}: {error_text}")
-                    
+                    print(f"{backend.provider} API error {response.status}: {error_text}")
+        
         except Exception as e:
-            print(f"❌ Error querying {self.config.llm.provider} API: {e}")
+            print(f"❌ Error querying {backend.provider} API: {e}")
             import traceback
             traceback.print_exc()
         
         return None
     
-    async def _query_vision_llm(self, prompt: str, screenshot: Image.Image) -> Optional[Dict[str, Any]]:
-        """Запрос к vision LLM для анализа изображений"""
-        provider = self.config.llm.provider.lower()
+    async def _query_vision_llm(self, prompt: PromptParts, image: EncodedImage,
+                                on_chunk: Optional[Callable[[str], None]] = None,
+                                schema: Optional[Dict[str, Any]] = None,
+                                purpose: str = 'describe',
+                                max_tokens: Optional[int] = None,
+                                on_reset: Optional[Callable[[], None]] = None) -> Optional[Dict[str, Any]]:
+        """Запрос к vision LLM для анализа изображений (с переключением между бэкендами)"""
+        max_tokens = max_tokens or self.config.llm.budget.vision_max_tokens
         
-        if provider == "openai":
-            return await self._query_openai_vision_api(prompt, screenshot)
-        else:
-            return await self._query_ollama_vision_api(prompt, screenshot)
+        async def request(backend: LLMBackendConfig, chunk_cb: Optional[Callable[[str], None]]):
+            provider = backend.provider.lower()
+            if provider == "ollama":
+                query = self._query_ollama_vision_api(backend, prompt, image, chunk_cb, schema, max_tokens)
+            elif provider == "anthropic":
+                query = self._query_anthropic_api(backend, prompt, image, chunk_cb,
+                                                  max_tokens=max_tokens, temperature=0.1, schema=schema)
+            else:
+                # OpenAI, DeepSeek и другие совместимые API
+                query = self._query_openai_vision_api(backend, prompt, image, chunk_cb, schema, max_tokens)
+            model = backend.vision_model or backend.model
+            return await self._record_usage(backend, model, query, purpose, max_tokens, prompt.dynamic)
+        
+        return await self.router.call(request, on_chunk, on_reset)
     
-    async def _query_ollama_vision_api(self, prompt: str, screenshot: Image.Image) -> Optional[Dict[str, Any]]:
+    async def _record_usage(self, backend: LLMBackendConfig, model: str, query: Awaitable[Optional[Dict[str, Any]]],
+                            purpose: str, max_tokens: int, prompt: str = "") -> Optional[Dict[str, Any]]:
+        """Учет токенов и задержки успешного запроса в бюджете (и в журнале сессии, если он ведется)"""
+        start = time.time()
+        with tracer.span('llm_request', provider=backend.provider, model=model) as span:
+            response = await query
+            if response is not None:
+                span.attrs['tokens'] = (response.get('usage') or {}).get('completion_tokens')
+        if response is not None:
+            latency = time.time() - start
+            llm_budget.record(backend.provider, model, latency,
+                              usage=response.get('usage'), text=response.get('response', ''),
+                              purpose=purpose, max_tokens=max_tokens)
+            session_recorder.record_llm(backend.provider, model, purpose, prompt, response, latency)
+        return response
+    
+    async def _query_ollama_vision_api(self, backend: LLMBackendConfig, prompt: PromptParts, image: EncodedImage,
+                                       on_chunk: Optional[Callable[[str], None]] = None,
+                                       schema: Optional[Dict[str, Any]] = None,
+                                       max_tokens: int = 500) -> Optional[Dict[str, Any]]:
         """Запрос к локальной Ollama vision модели"""
         try:
-            # Конвертируем изображение в base64
-            print(f"🖼️  Конвертируем изображение {screenshot.size} в base64...")
-            img_buffer = io.BytesIO()
-            screenshot.save(img_buffer, format='PNG')
-            img_data = img_buffer.getvalue()
-            img_base64 = base64.b64encode(img_data).decode('utf-8')
-            
-            print(f"📏 Размер изображения: {len(img_data)} байт, base64: {len(img_base64)} символов")
-            
             session = await self._get_session()
             
             payload = {
-                "model": self.vision_model,
-                "prompt": prompt,
-                "images": [img_base64],
-                "stream": False,
+                "model": backend.vision_model or backend.model,
+                "prompt": prompt.dynamic or prompt.static,
+                "images": [image.b64],
+                "stream": self.stream,
                 "options": {
                     "temperature": 0.1,
-                    "num_predict": 500
+                    "num_predict": max_tokens
                 }
             }
-            
-            async with session.post(f"{self.base_url}/api/generate", json=payload) as response:
+            if prompt.dynamic:
+                # Одинаковый system промпт - Ollama переиспользует KV кэш префикса
+                payload["system"] = prompt.static
+            if schema:
+                # Ollama ограничивает генерацию JSON схемой
+                payload["format"] = schema
+            
+            async with session.post(f"{backend.base_url}/api/generate", json=payload) as response:
                 if response.status == 200:
-                    return await response.json()
+                    if self.stream:
+                        usage = {}
+                        text = await self._read_stream(iter_ollama_stream(response, usage), on_chunk)
+                        return {"response": text, "usage": usage}
+                    result = await response.json()
+                    result['usage'] = ollama_usage(result)
+                    return result
                 else:
                     error_text = await response.text()
                     print(f"Ollama Vision API error {response.status}: {error_text}")
-                    
+        
         except Exception as e:
             error_type = type(e).__name__
             if "Timeout" in error_type:
@@ -376,24 +485,17 @@ class LLMAgent:
         
         return None
     
-    async def _query_openai_vision_api(self, prompt: str, screenshot: Image.Image) -> Optional[Dict[str, Any]]:
+    async def _query_openai_vision_api(self, backend: LLMBackendConfig, prompt: PromptParts, image: EncodedImage,
+                                       on_chunk: Optional[Callable[[str], None]] = None,
+                                       schema: Optional[Dict[str, Any]] = None,
+                                       max_tokens: int = 500) -> Optional[Dict[str, Any]]:
         """Запрос к OpenAI Vision API"""
         try:
-            # Конвертируем изображение в base64
-            print(f"🖼️  Конвертируем изображение {screenshot.size} в base64...")
-            
-            img_buffer = io.BytesIO()
-            screenshot.save(img_buffer, format='PNG')  # PNG поддерживает RGBA и лучше по качеству
-            img_data = img_buffer.getvalue()
-            img_base64 = base64.b64encode(img_data).decode('utf-8')
-            
-            print(f"📏 Размер изображения: {len(img_data)} байт")
-            
             session = await self._get_session()
             
-            api_key = getattr(self.config.llm, 'api_key', None)
+            api_key = backend.api_key
             if not api_key:
-                print("❌ API ключ не найден для OpenAI")
+                print(f"❌ API ключ не найден для {backend.provider}")
                 return None
             
             headers = {
@@ -401,48 +503,153 @@ class LLMAgent:
                 "Content-Type": "application/json"
             }
             
+            # Статические инструкции первыми: OpenAI и DeepSeek кэшируют общий префикс
+            content = [{"type": "text", "text": prompt.dynamic}] if prompt.dynamic else []
+            content.append({
+                "type": "image_url",
+                "image_url": {
+                    "url": image.data_url
+                }
+            })
+            
             # Формируем payload для vision API
             payload = {
-                "model": self.vision_model,
+                "model": backend.vision_model or backend.model,
                 "messages": [
-                    {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{img_base64}"
-                                }
-                            }
-                        ]
-                    }
+                    {"role": "system", "content": prompt.static},
+                    {"role": "user", "content": content}
                 ],
                 "temperature": 0.1,
-                "max_tokens": 500
+                "max_tokens": max_tokens,
+                "stream": self.stream
             }
+            if self.stream:
+                payload["stream_options"] = {"include_usage": True}
+            if schema:
+                payload["response_format"] = self._response_format(backend, schema)
             
-            print(f"🚀 Отправляем запрос к OpenAI Vision API...")
+            print(f"🚀 Отправляем запрос к {backend.provider} Vision API...")
             
-            async with session.post(f"{self.base_url}/v1/chat/completions", 
+            async with session.post(self._chat_completions_url(backend), 
                                   json=payload, headers=headers) as response:
                 if response.status == 200:
+                    if self.stream:
+                        usage = {}
+                        text = await self._read_stream(iter_openai_stream(response, usage), on_chunk)
+                        return {"response": text, "usage": usage}
                     result = await response.json()
                     if 'choices' in result and len(result['choices']) > 0:
                         content = result['choices'][0]['message']['content']
-                        return {"response": content}
+                        return {"response": content, "usage": openai_usage(result)}
                     return None
                 else:
                     error_text = await response.text()
-                    print(f"OpenAI Vision API error {response.status}: {error_text}")
-                    
+                    print(f"{backend.provider} Vision API error {response.status}: {error_text}")
+        
+        except Exception as e:
+            print(f"❌ Error querying {backend.provider} Vision API: {e}")
+            import traceback
+            traceback.print_exc()
+        
+        return None
+    
+    async def _query_anthropic_api(self, backend: LLMBackendConfig, prompt: PromptParts,
+                                   image: Optional[EncodedImage] = None,
+                                   on_chunk: Optional[Callable[[str], None]] = None,
+                                   max_tokens: int = 500, temperature: float = 0.1,
+                                   schema: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Запрос к Anthropic Messages API (статические инструкции кэшируются через cache_control)"""
+        try:
+            session = await self._get_session()
+            
+            api_key = backend.api_key
+            if not api_key:
+                print("❌ API ключ не найден для anthropic")
+                return None
+            
+            headers = {
+                "x-api-key": api_key,
+                "anthropic-version": ANTHROPIC_VERSION,
+                "Content-Type": "application/json"
+            }
+            
+            content: List[Dict[str, Any]] = []
+            if image is not None:
+                content.append({
+                    "type": "image",
+                    "source": {"type": "base64", "media_type": image.mime, "data": image.b64}
+                })
+            if prompt.dynamic:
+                content.append({"type": "text", "text": prompt.dynamic})
+            
+            payload: Dict[str, Any] = {
+                "model": (backend.vision_model or backend.model) if image is not None else backend.model,
+                "max_tokens": max_tokens,
+                "temperature": temperature,
+                "messages": [{"role": "user", "content": content}],
+                "stream": self.stream
+            }
+            # JSON схемы в Messages API нет - ответ начинается с "{" за модель (prefill)
+            prefill = "{" if schema else ""
+            if prefill:
+                payload["messages"].append({"role": "assistant", "content": prefill})
+            if prompt.static:
+                payload["system"] = [{
+                    "type": "text",
+                    "text": prompt.static,
+                    "cache_control": {"type": "ephemeral"}
+                }]
+            
+            print(f"🚀 Отправляем запрос к Anthropic модели: {payload['model']}")
+            
+            base_url = backend.base_url.rstrip('/')
+            if base_url.endswith('/v1'):
+                base_url = base_url[:-3]
+            
+            async with session.post(f"{base_url}/v1/messages", json=payload, headers=headers) as response:
+                if response.status == 200:
+                    if self.stream:
+                        if prefill and on_chunk:
+                            on_chunk(prefill)
+                        usage = {}
+                        text = await self._read_stream(iter_anthropic_stream(response, usage), on_chunk)
+                        return {"response": prefill + text, "usage": usage}
+                    result = await response.json()
+                    reported = result.get('usage', {})
+                    if reported.get('cache_read_input_tokens'):
+                        print(f"📦 Префикс промпта из кэша: {reported['cache_read_input_tokens']} токенов")
+                    text = ''.join(block.get('text', '') for block in result.get('content', [])
+                                   if block.get('type') == 'text')
+                    return {"response": prefill + text, "usage": anthropic_usage(result)}
+                else:
+                    error_text = await response.text()
+                    print(f"Anthropic API error {response.status}: {error_text}")
+        
         except Exception as e:
-            print(f"❌ Error querying OpenAI Vision API: {e}")
+            print(f"❌ Error querying Anthropic API: {e}")
             import traceback
             traceback.print_exc()
         
         return None
     
+    @staticmethod
+    def _response_format(backend: LLMBackendConfig, schema: Dict[str, Any]) -> Dict[str, Any]:
+        """response_format: JSON схема у OpenAI, JSON режим у остальных совместимых API"""
+        if backend.provider.lower() == "openai":
+            return {
+                "type": "json_schema",
+                "json_schema": {"name": "screen_analysis", "schema": schema, "strict": False}
+            }
+        return {"type": "json_object"}
+    
+    @staticmethod
+    def _chat_completions_url(backend: LLMBackendConfig) -> str:
+        """URL chat/completions (base_url может быть указан как с /v1, так и без)"""
+        base_url = backend.base_url.rstrip('/')
+        if not base_url.endswith('/v1'):
+            base_url += '/v1'
+        return f"{base_url}/chat/completions"
+    
     def _parse_llm_response(self, response: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Парсинг ответа LLM"""
         try:
@@ -455,32 +662,20 @@ class LLMAgent:
             response_text = response['response'].strip()
             print(f"🔍 Текст ответа: {response_text[:200]}...")
             
-            # Пытаемся распарсить JSON
-            if response_text.startswith('{') and response_text.endswith('}'):
-                return json.loads(response_text)
-            
-            # Ищем JSON в тексте
-            json_start = response_text.find('{')
-            json_end = response_text.rfind('}')
-            
-            if json_start >= 0 and json_end > json_start:
-                json_str = response_text[json_start:json_end + 1]
-                return json.loads(json_str)
+            # Общий восстанавливающий парсер
+            parsed = parse_llm_json(response_text)
+            if parsed is not None:
+                return parsed
             
             # Если JSON не найден, создаем базовую структуру
             return {
                 "actions": [],
                 "description": "Не удалось понять команду"
             }
-            
-        except json.JSONDecodeError:
-            print(f"Failed to parse JSON from LLM response: {response.get('response', '')}")
-            return None
+        
         except Exception as e:
             print(f"Error parsing LLM response: {e}")
             return None
     
     async def close(self):
-        """Закрытие HTTP сессии"""
-        if self.session and not self.session.closed:
-            await self.session.close()
\ No newline at end of file
+        """Сессия общая для всех агентов - закрывается через http_client.close()"""
\ No newline at end of file
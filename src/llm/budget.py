@@ -0,0 +1,186 @@
+"""
+Бюджет LLM запросов: токены и задержки по моделям, адаптивный max_tokens, лимиты чатов
+"""
+import contextvars
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterator, Optional, Tuple
+
+from ..utils.config import BudgetConfig
+from ..utils.metrics import LLM_REQUEST_SECONDS, LLM_TOKENS
+
+
+# Чат, для которого выполняется текущий запрос (переносится в дочерние задачи asyncio)
+_current_chat: "contextvars.ContextVar[Optional[int]]" = contextvars.ContextVar('llm_chat', default=None)
+
+# Грубая оценка токенов по длине текста, когда провайдер не вернул usage
+_CHARS_PER_TOKEN = 3.5
+
+
+def estimate_tokens(text: str) -> int:
+    """Приблизительное число токенов текста"""
+    return int(math.ceil(len(text) / _CHARS_PER_TOKEN)) if text else 0
+
+
+@dataclass
+class ModelStats:
+    """Статистика вызовов одной модели"""
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    truncated: int = 0
+    latencies: Optional[Deque[float]] = None
+    
+    def latency_quantile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LLMBudget:
+    """
+    Учет токенов и времени LLM запросов.
+    
+    - по каждой паре (провайдер, модель): число вызовов, токены запроса и
+      ответа, обрезанные ответы, задержки (p50/p95)
+    - max_tokens для запроса вида purpose (например, "analysis") подбирается
+      по квантилю длины прошлых ответов с запасом; обрезанный ответ считается
+      вдвое длиннее лимита, чтобы следующий лимит вырос
+    - лимиты токенов и секунд LLM на чат за скользящий час
+    """
+    
+    def __init__(self):
+        self.config = BudgetConfig()
+        self._models: Dict[Tuple[str, str], ModelStats] = {}
+        self._completions: Dict[str, Deque[int]] = {}
+        self._chats: Dict[int, Deque[Tuple[float, int, float]]] = {}
+    
+    def configure(self, config: BudgetConfig) -> None:
+        """Настройка лимитов"""
+        self.config = config
+    
+    @contextmanager
+    def chat(self, chat_id: int) -> Iterator[None]:
+        """Запросы внутри блока (и запущенных в нем задач) учитываются на чат"""
+        token = _current_chat.set(chat_id)
+        try:
+            yield
+        finally:
+            _current_chat.reset(token)
+    
+    def max_tokens(self, purpose: str, default: Optional[int]) -> Optional[int]:
+        """Лимит генерации для запроса по распределению длин прошлых ответов"""
+        config = self.config
+        samples = self._completions.get(purpose)
+        if not config.adaptive_max_tokens or not samples or len(samples) < config.min_samples:
+            return default
+        
+        ordered = sorted(samples)
+        observed = ordered[min(len(ordered) - 1, int(config.quantile * len(ordered)))]
+        limit = int(math.ceil(observed * config.headroom))
+        return max(config.min_tokens, min(config.max_tokens, limit))
+    
+    def record(self, provider: str, model: str, latency: float,
+               usage: Optional[Dict[str, Any]] = None, text: str = "",
+               purpose: Optional[str] = None, max_tokens: Optional[int] = None) -> None:
+        """
+        Учет завершенного запроса
+        
+        Args:
+            provider: Провайдер бэкенда
+            model: Модель
+            latency: Время запроса (сек)
+            usage: prompt_tokens, completion_tokens, truncated (если провайдер вернул)
+            text: Текст ответа (для оценки токенов без usage)
+            purpose: Вид запроса для адаптивного max_tokens
+            max_tokens: Лимит, с которым был сделан запрос
+        """
+        usage = usage or {}
+        prompt_tokens = int(usage.get('prompt_tokens') or 0)
+        completion_tokens = int(usage.get('completion_tokens') or estimate_tokens(text))
+        truncated = bool(usage.get('truncated')) or bool(
+            max_tokens and usage.get('completion_tokens') and completion_tokens >= max_tokens
+        )
+        
+        stats = self._models.get((provider, model))
+        if stats is None:
+            stats = ModelStats(latencies=deque(maxlen=self.config.window))
+            self._models[(provider, model)] = stats
+        stats.calls += 1
+        stats.prompt_tokens += prompt_tokens
+        stats.completion_tokens += completion_tokens
+        stats.latencies.append(latency)
+        if truncated:
+            stats.truncated += 1
+        LLM_REQUEST_SECONDS.observe(latency, provider=provider, model=model)
+        LLM_TOKENS.inc(prompt_tokens, provider=provider, model=model, kind='prompt')
+        LLM_TOKENS.inc(completion_tokens, provider=provider, model=model, kind='completion')
+        
+        if purpose:
+            samples = self._completions.setdefault(purpose, deque(maxlen=self.config.window))
+            samples.append(max_tokens * 2 if truncated and max_tokens else completion_tokens)
+        
+        # Учет на чат нужен только для лимитов; старше часа события не хранятся
+        chat_id = _current_chat.get()
+        if chat_id is not None and (self.config.chat_tokens_per_hour or self.config.chat_seconds_per_hour):
+            events = self._chats.setdefault(chat_id, deque())
+            events.append((time.time(), prompt_tokens + completion_tokens, latency))
+            self._expire_chat(events)
+    
+    def check_chat(self, chat_id: int) -> Optional[str]:
+        """
+        Проверка лимитов чата
+        
+        Returns:
+            Причина отказа или None, если лимит не исчерпан
+        """
+        config = self.config
+        if not config.chat_tokens_per_hour and not config.chat_seconds_per_hour:
+            return None
+        
+        tokens, seconds = self.chat_usage(chat_id)
+        if config.chat_tokens_per_hour and tokens >= config.chat_tokens_per_hour:
+            return f"исчерпан лимит токенов LLM ({tokens}/{config.chat_tokens_per_hour} за час)"
+        if config.chat_seconds_per_hour and seconds >= config.chat_seconds_per_hour:
+            return f"исчерпан лимит времени LLM ({seconds:.0f}/{config.chat_seconds_per_hour:.0f}с за час)"
+        return None
+    
+    def chat_usage(self, chat_id: int) -> Tuple[int, float]:
+        """Токены и секунды LLM чата за последний час"""
+        events = self._chats.get(chat_id)
+        if not events:
+            return 0, 0.0
+        self._expire_chat(events)
+        return sum(event[1] for event in events), sum(event[2] for event in events)
+    
+    @staticmethod
+    def _expire_chat(events: Deque[Tuple[float, int, float]]) -> None:
+        """Удаление событий чата старше часа"""
+        cutoff = time.time() - 3600
+        while events and events[0][0] < cutoff:
+            events.popleft()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Статистика по моделям и текущие адаптивные лимиты"""
+        models = {}
+        for (provider, model), stats in self._models.items():
+            models[f"{provider}/{model}"] = {
+                'calls': stats.calls,
+                'prompt_tokens': stats.prompt_tokens,
+                'completion_tokens': stats.completion_tokens,
+                'truncated': stats.truncated,
+                'p50': stats.latency_quantile(0.5),
+                'p95': stats.latency_quantile(0.95),
+            }
+        return {
+            'models': models,
+            'max_tokens': {purpose: self.max_tokens(purpose, None) for purpose in self._completions},
+        }
+
+
+# Общий учет для всех LLMAgent процесса
+llm_budget = LLMBudget()
@@ -0,0 +1,104 @@
+"""
+Общий HTTP клиент для запросов к LLM провайдерам
+"""
+import asyncio
+import time
+from typing import Any, Dict, Iterable, Optional
+
+import aiohttp
+
+from ..utils.config import HTTPClientConfig
+
+
+class SharedHTTPClient:
+    """
+    Одна aiohttp сессия на процесс вместо сессии в каждом LLMAgent.
+    
+    Соединения к провайдеру держатся открытыми (keep-alive), DNS ответы
+    кэшируются, число соединений на хост ограничено. warm_up открывает
+    соединение (TCP + TLS) заранее, чтобы первая команда не ждала рукопожатия.
+    Сессия создается лениво в текущем event loop и закрывается в close().
+    """
+    
+    def __init__(self):
+        self.config = HTTPClientConfig()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock: Optional[asyncio.Lock] = None
+        
+        # Статистика
+        self.sessions_created = 0
+        self.warmed_up: Dict[str, float] = {}
+    
+    def configure(self, config: HTTPClientConfig) -> None:
+        """Настройка пула соединений (действует для следующей созданной сессии)"""
+        self.config = config
+    
+    async def session(self) -> aiohttp.ClientSession:
+        """Общая сессия (создается при первом обращении)"""
+        if self._session is not None and not self._session.closed:
+            return self._session
+        
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self._session is None or self._session.closed:
+                self._session = self._create_session()
+        return self._session
+    
+    def _create_session(self) -> aiohttp.ClientSession:
+        config = self.config
+        connector = aiohttp.TCPConnector(
+            limit=config.limit,
+            limit_per_host=config.limit_per_host,
+            ttl_dns_cache=config.dns_ttl,
+            use_dns_cache=config.dns_ttl > 0,
+            keepalive_timeout=config.keepalive_timeout,
+            enable_cleanup_closed=True
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=config.total_timeout,
+            sock_connect=config.connect_timeout
+        )
+        self.sessions_created += 1
+        return aiohttp.ClientSession(connector=connector, timeout=timeout)
+    
+    async def warm_up(self, urls: Iterable[str]) -> None:
+        """
+        Открытие соединений заранее (ответ не важен, важен живой сокет в пуле)
+        
+        Args:
+            urls: Адреса провайдеров
+        """
+        session = await self.session()
+        for url in dict.fromkeys(url for url in urls if url):
+            start = time.time()
+            try:
+                timeout = aiohttp.ClientTimeout(total=self.config.connect_timeout * 2)
+                async with session.get(url, timeout=timeout) as response:
+                    await response.read()
+                self.warmed_up[url] = time.time() - start
+                print(f"🔌 Соединение с {url} готово за {self.warmed_up[url]:.2f}с")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"⚠️  Не удалось заранее подключиться к {url}: {e}")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Состояние пула соединений"""
+        session = self._session
+        connector = session.connector if session is not None and not session.closed else None
+        return {
+            'open': connector is not None,
+            'sessions_created': self.sessions_created,
+            'limit': self.config.limit,
+            'limit_per_host': self.config.limit_per_host,
+            'warmed_up': dict(self.warmed_up),
+        }
+    
+    async def close(self) -> None:
+        """Закрытие сессии и всех соединений"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+# Общий клиент для всех LLMAgent процесса
+http_client = SharedHTTPClient()
@@ -0,0 +1,154 @@
+"""
+Структурированный ответ LLM: JSON схема для провайдеров и восстанавливающий парсер
+"""
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Схема ответа на analysis_prompt
+ANALYSIS_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "analysis": {"type": "string"},
+        "search_targets": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "text": {"type": "string"},
+                    "type": {"type": "string", "enum": ["button", "text", "dialogue", "menu"]},
+                    "description": {"type": "string"}
+                },
+                "required": ["text", "type"]
+            }
+        },
+        "action_description": {"type": "string"}
+    },
+    "required": ["analysis", "search_targets", "action_description"]
+}
+
+_FENCE_RE = re.compile(r"```(?:json|JSON)?\s*\n?(.*?)(?:```|$)", re.DOTALL)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+# Сколько раз отрезать незаконченный хвост обрезанного ответа
+_MAX_REPAIR_STEPS = 32
+
+
+def parse_llm_json(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Разбор JSON объекта из ответа LLM
+    
+    Понимает markdown блоки (```json), текст до и после объекта,
+    висячие запятые и ответ, обрезанный по max_tokens: незаконченный
+    последний элемент (в том числе оборванная строка) отбрасывается,
+    массивы и объекты закрываются. Цели поиска без обязательных полей
+    схемы (text, type) удаляются.
+    
+    Args:
+        text: Текст ответа модели
+    
+    Returns:
+        Словарь или None, если JSON объект восстановить не удалось
+    """
+    if not text:
+        return None
+    
+    text = text.strip()
+    fence = _FENCE_RE.search(text)
+    if fence:
+        text = fence.group(1).strip()
+    
+    start = text.find('{')
+    if start == -1:
+        return None
+    text = text[start:]
+    
+    # Целый объект (возможно, с текстом после него)
+    try:
+        result, _ = json.JSONDecoder().raw_decode(text)
+        return _drop_incomplete_targets(result)
+    except ValueError:
+        pass
+    
+    try:
+        result, _ = json.JSONDecoder().raw_decode(_TRAILING_COMMA_RE.sub(r"\1", text))
+        return _drop_incomplete_targets(result)
+    except ValueError:
+        pass
+    
+    return _drop_incomplete_targets(_repair_truncated(text))
+
+
+def _drop_incomplete_targets(result: Any) -> Optional[Dict[str, Any]]:
+    """Только объект; из search_targets убираются элементы без полей text и type"""
+    if not isinstance(result, dict):
+        return None
+    
+    targets = result.get('search_targets')
+    if isinstance(targets, list):
+        required = ANALYSIS_SCHEMA['properties']['search_targets']['items']['required']
+        result['search_targets'] = [
+            target for target in targets
+            if isinstance(target, dict) and all(target.get(key) for key in required)
+        ]
+    return result
+
+
+def _repair_truncated(text: str) -> Optional[Dict[str, Any]]:
+    """Закрытие обрезанного JSON, при неудаче - отбрасывание последнего элемента"""
+    for _ in range(_MAX_REPAIR_STEPS):
+        closed, cut = _close_open(text)
+        if closed is not None:
+            try:
+                return json.loads(closed)
+            except ValueError:
+                pass
+        
+        if cut is None:
+            return None
+        text = text[:cut]
+    return None
+
+
+def _close_open(text: str) -> Tuple[Optional[str], Optional[int]]:
+    """
+    Закрытие скобок обрезанного JSON
+    
+    Returns:
+        (закрытый текст или None, если текст оборван внутри строки;
+        длина текста без последнего элемента или None, если отрезать нечего)
+    """
+    stack = []
+    cuts: List[int] = []
+    in_string = False
+    escape = False
+    for i, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append(char)
+            cuts.append(i + 1)
+        elif char in '}]' and stack:
+            stack.pop()
+        elif char == ',':
+            cuts.append(i)
+    
+    # Границы элементов вне строк, после которых текст короче исходного
+    cut = next((position for position in reversed(cuts) if position < len(text)), None)
+    
+    # Оборванную строку не закрываем: "Нов" вместо "Новая игра" - ложная цель
+    if in_string:
+        return None, cut
+    
+    text = text.rstrip()
+    if text.endswith(','):
+        text = text[:-1]
+    return text + ''.join('}' if bracket == '{' else ']' for bracket in reversed(stack)), cut
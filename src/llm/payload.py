@@ -0,0 +1,131 @@
+"""
+Подготовка изображений для vision LLM: уменьшение и сжатие с потерями
+"""
+import base64
+from dataclasses import dataclass
+from typing import Any, Dict, Tuple
+
+from PIL import Image, features
+
+from ..utils.config import ImagePayloadConfig
+from ..utils.executor import encode_image, executors
+
+
+_MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'WEBP': 'image/webp',
+    'PNG': 'image/png',
+}
+
+
+def resize_and_encode(image: Image.Image, max_side: int, format: str,
+                      quality: int) -> Tuple[bytes, Tuple[int, int]]:
+    """
+    Уменьшение изображения до max_side по длинной стороне и кодирование
+    (функция верхнего уровня - подходит для пула процессов)
+    
+    Returns:
+        (байты, размер закодированного изображения)
+    """
+    width, height = image.size
+    longest = max(width, height)
+    if max_side and longest > max_side:
+        ratio = max_side / longest
+        image = image.resize((max(1, round(width * ratio)), max(1, round(height * ratio))),
+                             Image.LANCZOS)
+    
+    if format in ('JPEG', 'WEBP') and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    
+    params: Dict[str, Any] = {}
+    if format == 'JPEG':
+        params = {'quality': quality, 'optimize': True}
+    elif format == 'WEBP':
+        params = {'quality': quality, 'method': 4}
+    else:
+        params = {'optimize': True}
+    
+    return encode_image(image, format, **params), image.size
+
+
+@dataclass
+class EncodedImage:
+    """Закодированное изображение и преобразование координат в исходный кадр"""
+    data: bytes
+    mime: str
+    size: Tuple[int, int]  # размер, который видит модель
+    native_size: Tuple[int, int]  # размер исходного скриншота
+    
+    @property
+    def scale(self) -> Tuple[float, float]:
+        """Множители перевода координат модели в координаты кадра"""
+        return (self.native_size[0] / self.size[0], self.native_size[1] / self.size[1])
+    
+    @property
+    def b64(self) -> str:
+        """Изображение в base64"""
+        return base64.b64encode(self.data).decode('utf-8')
+    
+    @property
+    def data_url(self) -> str:
+        """data: URL для OpenAI-совместимых API"""
+        return f"data:{self.mime};base64,{self.b64}"
+    
+    def to_native(self, x: float, y: float) -> Tuple[int, int]:
+        """Координаты на изображении модели -> координаты исходного кадра"""
+        scale_x, scale_y = self.scale
+        native_x = min(max(int(round(x * scale_x)), 0), self.native_size[0] - 1)
+        native_y = min(max(int(round(y * scale_y)), 0), self.native_size[1] - 1)
+        return native_x, native_y
+    
+    def map_coordinates(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Перевод координат из ответа LLM в координаты кадра (на месте)
+        
+        Поддерживаются "coordinates": [x, y] и пары "x"/"y" в объекте.
+        """
+        coordinates = data.get('coordinates')
+        if isinstance(coordinates, (list, tuple)) and len(coordinates) == 2:
+            try:
+                data['coordinates'] = self.to_native(float(coordinates[0]), float(coordinates[1]))
+            except (TypeError, ValueError):
+                pass
+        
+        if 'x' in data and 'y' in data:
+            try:
+                data['x'], data['y'] = self.to_native(float(data['x']), float(data['y']))
+            except (TypeError, ValueError):
+                pass
+        return data
+
+
+class PayloadEncoder:
+    """
+    Кодировщик скриншотов для vision LLM
+    
+    OCR и детектор работают с исходным кадром, модель получает уменьшенную
+    JPEG/WebP копию - меньше трафика и vision токенов на каждую команду.
+    """
+    
+    def __init__(self, config: ImagePayloadConfig):
+        self.max_side = config.max_side
+        self.quality = config.quality
+        self.format = config.format.upper()
+        
+        if self.format not in _MIME_TYPES:
+            print(f"⚠️  Неизвестный формат изображения {config.format}, используется JPEG")
+            self.format = 'JPEG'
+        if self.format == 'WEBP' and not features.check('webp'):
+            print("⚠️  PIL собран без WebP, используется JPEG")
+            self.format = 'JPEG'
+    
+    async def encode(self, screenshot: Image.Image) -> EncodedImage:
+        """Уменьшение и кодирование скриншота в пуле encode"""
+        data, size = await executors.run(
+            'encode', resize_and_encode, screenshot, self.max_side, self.format, self.quality
+        )
+        
+        image = EncodedImage(data=data, mime=_MIME_TYPES[self.format],
+                             size=size, native_size=screenshot.size)
+        print(f"📏 Изображение для LLM: {screenshot.size} -> {size} {self.format}, {len(data)} байт")
+        return image
@@ -0,0 +1,170 @@
+"""
+Кэш планов: команда + состояние экрана -> цели поиска без запроса к LLM
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from ..utils.config import PlanCacheConfig
+from ..vision.image_hash import hamming_distance
+
+
+_PUNCT_RE = re.compile(r"[^\w\s]", re.UNICODE)
+
+PlanKey = Tuple[str, bytes]
+
+
+def normalize_command(command: str) -> str:
+    """Команда без регистра, пунктуации и лишних пробелов"""
+    return ' '.join(_PUNCT_RE.sub(' ', command.casefold().replace('ё', 'е')).split())
+
+
+@dataclass
+class ScreenFingerprint:
+    """Грубый отпечаток экрана: перцептивный хэш кадра и надписи интерфейса"""
+    frame_hash: bytes
+    labels: FrozenSet[str]
+    
+    def label_overlap(self, other: 'ScreenFingerprint') -> float:
+        """Доля общих надписей (Жаккар); два экрана без текста совпадают"""
+        if not self.labels and not other.labels:
+            return 1.0
+        return len(self.labels & other.labels) / len(self.labels | other.labels)
+
+
+@dataclass
+class _PlanEntry:
+    fingerprint: ScreenFingerprint
+    plan: Dict[str, Any]
+    created_at: float
+
+
+class PlanCache:
+    """
+    LRU/TTL кэш планов LLM
+    
+    План (search_targets и action_description) сохраняется только после
+    успешного поиска элемента, когда каждая цель найдена в тексте экрана,
+    и удаляется, если цели не нашлись или действие не удалось. Экран считается тем же, если хэши кадров
+    близки по Хэммингу и набор надписей в основном совпадает.
+    """
+    
+    def __init__(self, config: PlanCacheConfig):
+        self.max_size = config.max_size
+        self.ttl = config.ttl
+        self.max_distance = config.max_distance
+        self.min_label_overlap = config.min_label_overlap
+        
+        self._entries: "OrderedDict[PlanKey, _PlanEntry]" = OrderedDict()
+        self._commands: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+    
+    @staticmethod
+    def fingerprint(frame_hash: bytes, texts: Iterable[str]) -> ScreenFingerprint:
+        """Отпечаток экрана по хэшу кадра и OCR строкам (короткий шум отбрасывается)"""
+        labels = frozenset(
+            label for label in (normalize_command(text) for text in texts)
+            if len(label) >= 3
+        )
+        return ScreenFingerprint(frame_hash=frame_hash, labels=labels)
+    
+    def has_command(self, command: str) -> bool:
+        """Есть ли планы для команды (без учета экрана)"""
+        with self._lock:
+            return self._commands.get(normalize_command(command), 0) > 0
+    
+    def get(self, command: str, fingerprint: ScreenFingerprint) -> Optional[Tuple[PlanKey, Dict[str, Any]]]:
+        """
+        Поиск плана для команды на похожем экране
+        
+        Returns:
+            (ключ записи, план) или None
+        """
+        normalized = normalize_command(command)
+        with self._lock:
+            self._expire()
+            
+            best = None
+            best_distance = None
+            for key, entry in self._entries.items():
+                if key[0] != normalized:
+                    continue
+                distance = hamming_distance(key[1], fingerprint.frame_hash)
+                if distance > self.max_distance:
+                    continue
+                if entry.fingerprint.label_overlap(fingerprint) < self.min_label_overlap:
+                    continue
+                if best_distance is None or distance < best_distance:
+                    best, best_distance = key, distance
+            
+            if best is None:
+                self.misses += 1
+                return None
+            
+            self._entries.move_to_end(best)
+            self.hits += 1
+            return best, dict(self._entries[best].plan)
+    
+    def put(self, command: str, fingerprint: ScreenFingerprint, plan: Dict[str, Any]) -> PlanKey:
+        """Сохранение успешного плана"""
+        key = (normalize_command(command), fingerprint.frame_hash)
+        stored = {
+            'search_targets': [dict(target) for target in plan.get('search_targets', [])],
+            'action_description': plan.get('action_description', ''),
+        }
+        with self._lock:
+            if key not in self._entries:
+                self._commands[key[0]] = self._commands.get(key[0], 0) + 1
+            self._entries[key] = _PlanEntry(fingerprint, stored, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+        return key
+    
+    def invalidate(self, key: PlanKey) -> None:
+        """Удаление плана, который не сработал"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                self.invalidations += 1
+    
+    def clear(self) -> None:
+        """Очистка кэша"""
+        with self._lock:
+            self._entries.clear()
+            self._commands.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Статистика кэша"""
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+    
+    def _expire(self) -> None:
+        if self.ttl <= 0:
+            return
+        now = time.monotonic()
+        expired: List[PlanKey] = [key for key, entry in self._entries.items()
+                                  if now - entry.created_at > self.ttl]
+        for key in expired:
+            self._remove(key)
+    
+    def _remove(self, key: PlanKey) -> None:
+        del self._entries[key]
+        remaining = self._commands.get(key[0], 0) - 1
+        if remaining > 0:
+            self._commands[key[0]] = remaining
+        else:
+            self._commands.pop(key[0], None)
@@ -0,0 +1,40 @@
+"""
+Разделение промптов на статическую и изменяемую части (кэш префикса у провайдера)
+"""
+from dataclasses import dataclass
+
+
+@dataclass
+class PromptParts:
+    """Промпт, разделенный для кэширования префикса"""
+    static: str   # Одинаков во всех запросах - отправляется первым (system)
+    dynamic: str  # Меняется от запроса к запросу (команда пользователя)
+
+
+def split_prompt(template: str, field: str = 'command', **values: str) -> PromptParts:
+    """
+    Разделение шаблона промпта по строке с подстановкой
+    
+    Строки с {field} уходят в изменяемую часть, остальные - в статическую,
+    поэтому префикс запроса не меняется между командами и кэшируется
+    провайдером (cache_control у Anthropic, автоматический кэш у OpenAI,
+    DeepSeek и Ollama).
+    
+    Args:
+        template: Шаблон из конфигурации (str.format синтаксис)
+        field: Имя подставляемого поля
+        **values: Значения полей
+    
+    Returns:
+        Статическая и изменяемая части
+    """
+    marker = '{' + field + '}'
+    static_lines = []
+    dynamic_lines = []
+    for line in template.splitlines():
+        (dynamic_lines if marker in line else static_lines).append(line)
+    
+    # В статической части нет подстановок - format только снимает {{ }}
+    static = '\n'.join(static_lines).format(**values).strip()
+    dynamic = '\n'.join(dynamic_lines).format(**values).strip()
+    return PromptParts(static=static, dynamic=dynamic)
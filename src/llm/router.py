@@ -0,0 +1,251 @@
+"""
+Маршрутизация запросов по нескольким LLM бэкендам: failover, circuit breaker, hedging
+"""
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from ..utils.config import LLMBackendConfig, LLMConfig, RouterConfig
+
+
+ChunkCallback = Callable[[str], None]
+# Запрос к одному бэкенду: (бэкенд, on_chunk) -> ответ или None при ошибке
+BackendCall = Callable[[LLMBackendConfig, Optional[ChunkCallback]], Awaitable[Optional[Dict[str, Any]]]]
+
+
+@dataclass
+class BackendHealth:
+    """Задержки и состояние circuit breaker одного бэкенда"""
+    latencies: Deque[float]
+    consecutive_failures: int = 0
+    open_until: float = 0.0      # До этого момента бэкенд пропускается
+    half_open: bool = False      # После паузы пропускаем одну пробную попытку
+    successes: int = 0
+    failures: int = 0
+    hedges: int = 0
+    
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def backends_from_config(config: LLMConfig) -> List[LLMBackendConfig]:
+    """Основной бэкенд (поля верхнего уровня llm) и резервные из llm.fallbacks"""
+    primary = LLMBackendConfig(
+        provider=config.provider,
+        model=config.model,
+        vision_model=config.vision_model,
+        base_url=config.base_url,
+        api_key=config.api_key,
+        name=config.provider
+    )
+    return [primary] + list(config.fallbacks)
+
+
+class LLMRouter:
+    """
+    Упорядоченный список LLM бэкендов.
+    
+    Запрос идет в первый доступный бэкенд; при ошибке или таймауте попытки
+    (attempt_timeout) - сразу в следующий. После failure_threshold ошибок
+    подряд бэкенд пропускается cooldown секунд (circuit breaker), затем
+    получает одну пробную попытку. С hedge: true, если бэкенд не ответил
+    за свой p90 (по последним latency_window запросам), параллельно
+    отправляется запрос в следующий - побеждает первый успешный ответ.
+    Потоковые фрагменты передаются от одной попытки (ответившей первой);
+    фрагменты остальных копятся. Если эта попытка упала или победила
+    другая, вызывается on_reset и передаются накопленные фрагменты новой.
+    """
+    
+    def __init__(self, backends: List[LLMBackendConfig], config: RouterConfig):
+        self.backends = backends
+        self.config = config
+        self.health: Dict[int, BackendHealth] = {
+            index: BackendHealth(latencies=deque(maxlen=config.latency_window))
+            for index in range(len(backends))
+        }
+    
+    def available(self) -> List[int]:
+        """Индексы бэкендов с закрытым (или пробным) circuit breaker по порядку"""
+        now = time.monotonic()
+        indexes = []
+        for index in range(len(self.backends)):
+            health = self.health[index]
+            if health.open_until > now:
+                continue
+            if health.open_until:
+                # Пауза прошла - одна пробная попытка
+                health.open_until = 0.0
+                health.half_open = True
+            indexes.append(index)
+        # Все бэкенды отключены - пробуем по порядку, чем отказывать сразу
+        return indexes or list(range(len(self.backends)))
+    
+    def hedge_delay(self, index: int) -> Optional[float]:
+        """Через сколько отправлять дублирующий запрос (None - не дублировать)"""
+        if not self.config.hedge:
+            return None
+        health = self.health[index]
+        if len(health.latencies) < self.config.min_samples:
+            return self.config.hedge_default_delay
+        return max(self.config.hedge_min_delay, health.quantile(self.config.hedge_quantile))
+    
+    def record_success(self, index: int, latency: float) -> None:
+        health = self.health[index]
+        health.latencies.append(latency)
+        health.successes += 1
+        health.consecutive_failures = 0
+        health.half_open = False
+    
+    def record_failure(self, index: int) -> None:
+        health = self.health[index]
+        health.failures += 1
+        health.consecutive_failures += 1
+        if health.half_open or health.consecutive_failures >= self.config.failure_threshold:
+            health.open_until = time.monotonic() + self.config.cooldown
+            health.half_open = False
+            print(f"🔌 LLM бэкенд {self._name(index)} отключен на {self.config.cooldown:.0f}с")
+    
+    async def call(self, request: BackendCall,
+                   on_chunk: Optional[ChunkCallback] = None,
+                   on_reset: Optional[Callable[[], None]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Выполнение запроса с failover и hedging
+        
+        Args:
+            request: Запрос к одному бэкенду
+            on_chunk: Потоковые фрагменты ответа
+            on_reset: Переданные фрагменты больше не действительны (их попытка
+                упала или проиграла) - дальше придет поток другой попытки
+        
+        Returns:
+            Первый успешный ответ или None, если все бэкенды не ответили
+        """
+        candidates = self.available()
+        stream_owner: List[int] = []
+        chunks: Dict[int, List[str]] = {}
+        attempts: Dict[asyncio.Future, int] = {}
+        started: Dict[int, float] = {}
+        
+        def chunk_gate(index: int) -> Optional[ChunkCallback]:
+            if on_chunk is None:
+                return None
+            
+            def forward(chunk: str) -> None:
+                chunks.setdefault(index, []).append(chunk)
+                if not stream_owner:
+                    stream_owner.append(index)
+                if stream_owner[0] == index:
+                    on_chunk(chunk)
+            return forward
+        
+        def switch_stream(index: Optional[int]) -> None:
+            """Сброс потока и повтор накопленных фрагментов попытки index"""
+            stream_owner.clear()
+            if on_reset:
+                on_reset()
+            if index is None or not chunks.get(index):
+                return
+            stream_owner.append(index)
+            for chunk in chunks[index]:
+                on_chunk(chunk)
+        
+        def launch(hedged: bool = False) -> None:
+            index = candidates.pop(0)
+            if hedged:
+                self.health[index].hedges += 1
+                print(f"⏩ Дублируем запрос в {self._name(index)}")
+            started[index] = time.monotonic()
+            attempt = self._attempt(request, self.backends[index], chunk_gate(index))
+            attempts[asyncio.ensure_future(attempt)] = index
+        
+        launch()
+        try:
+            while attempts:
+                delay = None
+                if candidates and not stream_owner:
+                    last = list(attempts.values())[-1]
+                    hedge_after = self.hedge_delay(last)
+                    if hedge_after is not None:
+                        delay = max(0.0, started[last] + hedge_after - time.monotonic())
+                done, _ = await asyncio.wait(list(attempts), timeout=delay,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Бэкенд медленнее своего p90 - дублируем в следующий
+                    launch(hedged=True)
+                    continue
+                
+                for future in done:
+                    index = attempts.pop(future)
+                    owner = stream_owner[0] if stream_owner else None
+                    result = None if future.cancelled() or future.exception() else future.result()
+                    if result is not None:
+                        self.record_success(index, time.monotonic() - started[index])
+                        if owner is not None and owner != index:
+                            # Победил не тот, чей поток передавался
+                            switch_stream(index)
+                        return result
+                    self.record_failure(index)
+                    chunks.pop(index, None)
+                    if owner == index:
+                        # Поток упавшей попытки недействителен - берем поток живой
+                        running = [i for i in attempts.values() if chunks.get(i)]
+                        switch_stream(running[0] if running else None)
+                
+                if candidates and not attempts:
+                    # Failover: ошибка без параллельных попыток - следующий бэкенд
+                    launch()
+            return None
+        finally:
+            for future in attempts:
+                if not future.done():
+                    future.cancel()
+                elif not future.cancelled():
+                    future.exception()
+    
+    async def _attempt(self, request: BackendCall, backend: LLMBackendConfig,
+                       on_chunk: Optional[ChunkCallback]) -> Optional[Dict[str, Any]]:
+        timeout = self.config.attempt_timeout or None
+        try:
+            return await asyncio.wait_for(request(backend, on_chunk), timeout)
+        except asyncio.TimeoutError:
+            print(f"⏱️  LLM бэкенд {backend.name or backend.provider} не ответил за {timeout:.0f}с")
+            return None
+    
+    def stats(self) -> List[Dict[str, Any]]:
+        """Состояние бэкендов"""
+        now = time.monotonic()
+        return [
+            {
+                'name': self._name(index),
+                'model': backend.model,
+                'available': self.health[index].open_until <= now,
+                'successes': self.health[index].successes,
+                'failures': self.health[index].failures,
+                'hedges': self.health[index].hedges,
+                'p50': self.health[index].quantile(0.5),
+                'p90': self.health[index].quantile(0.9),
+            }
+            for index, backend in enumerate(self.backends)
+        ]
+    
+    def _name(self, index: int) -> str:
+        backend = self.backends[index]
+        return backend.name or f"{backend.provider}#{index}"
+
+
+# Один роутер на конфигурацию: статистика общая для всех LLMAgent процесса
+_routers: Dict[int, LLMRouter] = {}
+
+
+def shared_router(config: LLMConfig) -> LLMRouter:
+    """Роутер для конфигурации LLM (создается один раз)"""
+    router = _routers.get(id(config))
+    if router is None:
+        router = LLMRouter(backends_from_config(config), config.router)
+        _routers[id(config)] = router
+    return router
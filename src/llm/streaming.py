@@ -0,0 +1,229 @@
+"""
+Потоковые ответы LLM и инкрементальное извлечение JSON
+"""
+import json
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import aiohttp
+
+
+async def iter_ollama_stream(response: aiohttp.ClientResponse,
+                             usage: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+    """Фрагменты текста из NDJSON потока Ollama (/api/generate), usage - из последнего фрагмента"""
+    async for line in response.content:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            chunk = json.loads(line)
+        except ValueError:
+            continue
+        if chunk.get('response'):
+            yield chunk['response']
+        if chunk.get('done'):
+            if usage is not None:
+                usage.update(ollama_usage(chunk))
+            break
+
+
+async def iter_openai_stream(response: aiohttp.ClientResponse,
+                             usage: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+    """Фрагменты текста из SSE потока OpenAI-совместимого API (/v1/chat/completions)"""
+    async for line in response.content:
+        line = line.strip()
+        if not line.startswith(b'data:'):
+            continue
+        data = line[5:].strip()
+        if data == b'[DONE]':
+            break
+        try:
+            chunk = json.loads(data)
+        except ValueError:
+            continue
+        if usage is not None:
+            # Последний фрагмент (stream_options.include_usage) несет usage без choices
+            usage.update(openai_usage(chunk))
+        for choice in chunk.get('choices', []):
+            content = choice.get('delta', {}).get('content')
+            if content:
+                yield content
+
+
+async def iter_anthropic_stream(response: aiohttp.ClientResponse,
+                                usage: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+    """Фрагменты текста из SSE потока Anthropic Messages API (/v1/messages)"""
+    async for line in response.content:
+        line = line.strip()
+        if not line.startswith(b'data:'):
+            continue
+        try:
+            event = json.loads(line[5:].strip())
+        except ValueError:
+            continue
+        if event.get('type') == 'content_block_delta':
+            text = event.get('delta', {}).get('text')
+            if text:
+                yield text
+        elif event.get('type') == 'message_start' and usage is not None:
+            usage.update(anthropic_usage(event.get('message', {})))
+        elif event.get('type') == 'message_delta' and usage is not None:
+            usage.update(anthropic_usage(event))
+        elif event.get('type') == 'message_stop':
+            break
+
+
+def ollama_usage(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Токены и признак обрезки из ответа Ollama"""
+    usage: Dict[str, Any] = {}
+    if 'prompt_eval_count' in result:
+        usage['prompt_tokens'] = result['prompt_eval_count']
+    if 'eval_count' in result:
+        usage['completion_tokens'] = result['eval_count']
+    if result.get('done_reason') == 'length':
+        usage['truncated'] = True
+    return usage
+
+
+def openai_usage(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Токены и признак обрезки из ответа (фрагмента) OpenAI-совместимого API"""
+    usage: Dict[str, Any] = {}
+    reported = result.get('usage') or {}
+    if 'prompt_tokens' in reported:
+        usage['prompt_tokens'] = reported['prompt_tokens']
+    if 'completion_tokens' in reported:
+        usage['completion_tokens'] = reported['completion_tokens']
+    if any(choice.get('finish_reason') == 'length' for choice in result.get('choices') or []):
+        usage['truncated'] = True
+    return usage
+
+
+def anthropic_usage(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Токены и признак обрезки из ответа (события) Anthropic Messages API"""
+    usage: Dict[str, Any] = {}
+    reported = result.get('usage') or {}
+    if 'input_tokens' in reported:
+        usage['prompt_tokens'] = (reported['input_tokens'] + reported.get('cache_read_input_tokens', 0)
+                                  + reported.get('cache_creation_input_tokens', 0))
+    if 'output_tokens' in reported:
+        usage['completion_tokens'] = reported['output_tokens']
+    stop_reason = result.get('stop_reason') or (result.get('delta') or {}).get('stop_reason')
+    if stop_reason == 'max_tokens':
+        usage['truncated'] = True
+    return usage
+
+
+class StreamingJSONExtractor:
+    """
+    Инкрементальный разбор JSON ответа analysis_prompt по мере прихода токенов
+    
+    Как только очередной объект в "search_targets" закрыт, вызывается on_target;
+    пока генерируется "action_description", частичный текст уходит в on_progress.
+    """
+    
+    def __init__(self, on_target: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 on_progress: Optional[Callable[[str], None]] = None):
+        self.on_target = on_target
+        self.on_progress = on_progress
+        self.reset()
+    
+    def reset(self) -> None:
+        """Начать разбор заново (поток ответа перешел к другому бэкенду)"""
+        self.targets: List[Dict[str, Any]] = []
+        self.text = ""
+        
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._started = False
+        self._string_start = 0
+        self._current_key: Optional[str] = None  # ключ верхнего уровня
+        self._expect_key = False
+        self._value_string_key: Optional[str] = None
+        self._target_start: Optional[int] = None
+    
+    def feed(self, chunk: str) -> None:
+        """Добавление очередного фрагмента ответа"""
+        self.text += chunk
+        while self._pos < len(self.text):
+            self._step(self.text[self._pos])
+            self._pos += 1
+        
+        # Частичное значение action_description
+        if self._in_string and self._value_string_key == 'action_description' and self.on_progress:
+            partial = self.text[self._string_start + 1:self._pos]
+            self.on_progress(self._decode_partial(partial))
+    
+    def _step(self, ch: str) -> None:
+        if not self._started:
+            # Пропускаем все до первого объекта (например, ```json)
+            if ch == '{':
+                self._started = True
+                self._depth = 1
+                self._expect_key = True
+            return
+        
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == '\\':
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                self._close_string()
+            return
+        
+        if ch == '"':
+            self._in_string = True
+            self._string_start = self._pos
+            if self._depth == 1 and not self._expect_key and self._current_key:
+                self._value_string_key = self._current_key
+            else:
+                self._value_string_key = None
+        elif ch in '{[':
+            self._depth += 1
+            if ch == '{' and self._depth == 3 and self._current_key == 'search_targets':
+                self._target_start = self._pos
+        elif ch in '}]':
+            if ch == '}' and self._depth == 3 and self._target_start is not None:
+                self._emit_target(self.text[self._target_start:self._pos + 1])
+                self._target_start = None
+            self._depth -= 1
+        elif ch == ':' and self._depth == 1:
+            self._expect_key = False
+        elif ch == ',' and self._depth == 1:
+            self._expect_key = True
+            self._current_key = None
+    
+    def _close_string(self) -> None:
+        raw = self.text[self._string_start:self._pos + 1]
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            value = raw.strip('"')
+        
+        if self._depth == 1 and self._expect_key:
+            self._current_key = value
+        elif self._value_string_key == 'action_description' and self.on_progress:
+            self.on_progress(value)
+        self._value_string_key = None
+    
+    def _emit_target(self, raw: str) -> None:
+        try:
+            target = json.loads(raw)
+        except ValueError:
+            return
+        if isinstance(target, dict):
+            self.targets.append(target)
+            if self.on_target:
+                self.on_target(target)
+    
+    @staticmethod
+    def _decode_partial(partial: str) -> str:
+        """Декодирование незакрытой JSON строки"""
+        if partial.endswith('\\'):
+            partial = partial[:-1]
+        try:
+            return json.loads(f'"{partial}"')
+        except ValueError:
+            return partial
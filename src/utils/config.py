@@ -4,7 +4,7 @@
 import os
 import yaml
 from typing import Dict, List, Any, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 
 
@@ -16,6 +16,76 @@ class TelegramConfig:
     admin_users: List[int]
 
 
+@dataclass
+class ImagePayloadConfig:
+    """Изображение, отправляемое vision LLM"""
+    max_side: int = 1280  # Длинная сторона в пикселях (0 - без уменьшения)
+    format: str = "JPEG"  # JPEG, WEBP или PNG
+    quality: int = 80
+
+
+@dataclass
+class PlanCacheConfig:
+    """Кэш планов LLM для повторяющихся команд"""
+    enabled: bool = True
+    max_size: int = 128              # Максимум планов
+    ttl: float = 3600.0              # Время жизни плана (сек)
+    max_distance: int = 10           # Допустимое различие хэшей кадра (из 64 бит)
+    min_label_overlap: float = 0.5   # Минимальная доля общих надписей на экране
+
+
+@dataclass
+class HTTPClientConfig:
+    """Пул HTTP соединений к LLM провайдеру"""
+    limit: int = 20                  # Всего соединений
+    limit_per_host: int = 8          # Соединений к одному хосту
+    dns_ttl: int = 300               # Кэш DNS (сек, 0 - без кэша)
+    keepalive_timeout: float = 60.0  # Сколько держать простаивающее соединение (сек)
+    connect_timeout: float = 10.0    # Таймаут подключения (сек)
+    total_timeout: float = 180.0     # Таймаут запроса: 3 минуты для медленной модели на Steam Deck
+    warm_up: bool = True             # Подключаться к провайдеру при запуске бота
+
+
+@dataclass
+class LLMBackendConfig:
+    """Резервный LLM бэкенд (поля как у основного в секции llm)"""
+    provider: str
+    model: str
+    base_url: str
+    vision_model: str = ""
+    api_key: str = ""
+    name: str = ""
+
+
+@dataclass
+class RouterConfig:
+    """Failover и hedging между LLM бэкендами"""
+    attempt_timeout: float = 60.0      # Таймаут одной попытки (сек, 0 - только HTTP таймаут)
+    failure_threshold: int = 3         # Ошибок подряд до отключения бэкенда
+    cooldown: float = 30.0             # На сколько отключать бэкенд (сек)
+    hedge: bool = False                # Дублировать медленный запрос в следующий бэкенд
+    hedge_quantile: float = 0.9        # Дублировать, если ответа нет дольше этого квантиля задержек
+    hedge_min_delay: float = 1.0       # Не дублировать раньше (сек)
+    hedge_default_delay: float = 15.0  # Задержка дублирования, пока мало статистики (сек)
+    min_samples: int = 5               # Ответов для расчета квантиля
+    latency_window: int = 50           # Последних задержек в статистике
+
+
+@dataclass
+class BudgetConfig:
+    """Учет токенов и задержек LLM, адаптивный max_tokens, лимиты чатов"""
+    vision_max_tokens: int = 500       # max_tokens vision запросов (начальный для analysis_prompt)
+    adaptive_max_tokens: bool = True   # Подбирать max_tokens analysis_prompt по длине прошлых ответов
+    quantile: float = 0.95             # Квантиль длины ответа
+    headroom: float = 1.3              # Запас над квантилем
+    min_tokens: int = 128              # Нижняя граница адаптивного лимита
+    max_tokens: int = 1024             # Верхняя граница адаптивного лимита
+    min_samples: int = 10              # Ответов до включения адаптации
+    window: int = 100                  # Последних ответов в статистике
+    chat_tokens_per_hour: int = 0      # Лимит токенов на чат за час (0 - без лимита)
+    chat_seconds_per_hour: float = 0.0 # Лимит секунд LLM на чат за час (0 - без лимита)
+
+
 @dataclass 
 class LLMConfig:
     """Конфигурация LLM"""
@@ -27,6 +97,14 @@ class LLMConfig:
     max_tokens: int
     temperature: float
     analysis_prompt: str
+    stream: bool = False  # Потоковые ответы: цели поиска и прогресс до окончания генерации
+    json_mode: bool = True  # Просить у провайдера ответ строго в JSON (схема, response_format)
+    image: ImagePayloadConfig = field(default_factory=ImagePayloadConfig)
+    plan_cache: PlanCacheConfig = field(default_factory=PlanCacheConfig)
+    http: HTTPClientConfig = field(default_factory=HTTPClientConfig)
+    fallbacks: List[LLMBackendConfig] = field(default_factory=list)
+    router: RouterConfig = field(default_factory=RouterConfig)
+    budget: BudgetConfig = field(default_factory=BudgetConfig)
 
 
 @dataclass
@@ -38,6 +116,33 @@ class MultiDisplayConfig:
     display_scaling: float
 
 
+@dataclass
+class QueueConfig:
+    """Очередь игровых команд"""
+    max_pending: int = 20    # Всего команд в очереди
+    max_per_chat: int = 3    # Команд одного чата в очереди
+    coalesce: bool = True    # Склеивать повтор той же команды, пока она ждет
+
+
+@dataclass
+class InputConfig:
+    """Эмуляция ввода"""
+    backend: str = "auto"    # auto, xtest, pyautogui
+    key_hold: float = 0.02   # Удержание кнопки/клавиши (сек), чтобы игра увидела нажатие
+
+
+@dataclass
+class SettleConfig:
+    """Ожидание реакции игры на действие по изменению кадров"""
+    enabled: bool = True          # False - фиксированные паузы action_delay
+    poll_interval: float = 0.05   # Период опроса кадров (сек)
+    threshold: float = 0.01       # Доля изменившихся пикселей, ниже которой экран стабилен
+    stable_polls: int = 2         # Сколько опросов подряд экран должен быть стабилен
+    react_timeout: float = 0.3    # Сколько ждать первой реакции на действие (сек)
+    timeout: float = 2.0          # Максимальное ожидание (сек)
+    thumb_width: int = 320        # Ширина уменьшенного кадра для сравнения
+
+
 @dataclass
 class GameConfig:
     """Конфигурация игры"""
@@ -45,12 +150,39 @@ class GameConfig:
     screenshot_interval: float
     action_delay: float
     multi_display: MultiDisplayConfig
+    capture_backend: str = "auto"  # auto, x11, script
+    queue: QueueConfig = field(default_factory=QueueConfig)
+    input: InputConfig = field(default_factory=InputConfig)
+    settle: SettleConfig = field(default_factory=SettleConfig)
+
+
+@dataclass
+class OCRConfig:
+    """Конфигурация OCR"""
+    incremental: bool = True           # Перераспознавать только изменившиеся области кадра
+    tile_size: int = 64                # Размер тайла для поиска изменений (px)
+    full_refresh_ratio: float = 0.5    # Доля изменившейся площади для полного OCR
+    cache_size: int = 32               # Максимум кадров в кэше OCR результатов
+    cache_ttl: float = 600.0           # Время жизни записи кэша (сек)
+    cache_hash_size: int = 32          # Размер перцептивного хэша (hash_size^2 бит)
+    fuzzy_min_score: float = 0.75      # Минимальная схожесть для нечеткого совпадения текста
+
+
+@dataclass
+class FastPathConfig:
+    """Конфигурация разрешения команд по OCR без LLM"""
+    enabled: bool = True
+    min_score: float = 0.9             # Минимальная схожесть команды и надписи
+    min_margin: float = 0.1            # Отрыв лучшей надписи от следующей
+    max_words: int = 4                 # Более длинные команды сразу идут в LLM
 
 
 @dataclass
 class VisionConfig:
     """Конфигурация модуля зрения"""
     describe_prompt: str
+    ocr: OCRConfig = field(default_factory=OCRConfig)
+    fast_path: FastPathConfig = field(default_factory=FastPathConfig)
 
 
 @dataclass
@@ -70,6 +202,49 @@ class SecurityConfig:
     max_session_time: int
 
 
+@dataclass
+class PerformanceConfig:
+    """Конфигурация пулов исполнителей для блокирующей работы"""
+    vision_workers: int = 2            # Потоки для OCR и OpenCV
+    encode_workers: int = 2            # Потоки/процессы для кодирования изображений
+    encode_in_processes: bool = False  # Кодировать изображения в отдельных процессах
+
+
+@dataclass
+class TracingConfig:
+    """Трассировка стадий команды"""
+    enabled: bool = True               # Писать трассы команд в журнал
+    file: str = "logs/traces.jsonl"    # Отдельный файл трасс (пусто - в общий журнал)
+    summary_every: int = 20            # Сводка p50/p95 по стадиям каждые N команд (0 - без сводки)
+    window: int = 200                  # Последних замеров на стадию
+
+
+@dataclass
+class MetricsConfig:
+    """HTTP эндпоинт метрик в формате Prometheus"""
+    enabled: bool = False              # Поднимать эндпоинт в процессе бота
+    host: str = "127.0.0.1"            # Только локальный доступ по умолчанию
+    port: int = 9108
+    path: str = "/metrics"
+
+
+@dataclass
+class RecorderConfig:
+    """Запись команд для офлайн воспроизведения"""
+    enabled: bool = False
+    directory: str = "recordings"      # Каталог сессий (подкаталог на запуск бота)
+    max_frames: int = 2000             # Максимум сохраненных кадров за сессию
+    frame_format: str = "PNG"          # Без потерь - OCR при воспроизведении видит тот же кадр
+
+
+@dataclass
+class MonitoringConfig:
+    """Мониторинг производительности"""
+    tracing: TracingConfig = field(default_factory=TracingConfig)
+    metrics: MetricsConfig = field(default_factory=MetricsConfig)
+    recorder: RecorderConfig = field(default_factory=RecorderConfig)
+
+
 @dataclass
 class Config:
     """Основная конфигурация"""
@@ -79,6 +254,8 @@ class Config:
     vision: VisionConfig
     logging: LoggingConfig
     security: SecurityConfig
+    performance: PerformanceConfig = field(default_factory=PerformanceConfig)
+    monitoring: MonitoringConfig = field(default_factory=MonitoringConfig)
     
     @classmethod
     def load(cls, config_path: Optional[str] = None) -> 'Config':
@@ -108,17 +285,60 @@ class Config:
         # Обрабатываем game конфигурацию с multi_display
         game_data = data['game'].copy()
         multi_display_data = game_data.pop('multi_display')
+        queue_data = game_data.pop('queue', None) or {}
+        input_data = game_data.pop('input', None) or {}
+        settle_data = game_data.pop('settle', None) or {}
+        
+        # Вложенные секции llm и vision необязательны
+        llm_data = data['llm'].copy()
+        image_data = llm_data.pop('image', None) or {}
+        plan_cache_data = llm_data.pop('plan_cache', None) or {}
+        http_data = llm_data.pop('http', None) or {}
+        router_data = llm_data.pop('router', None) or {}
+        budget_data = llm_data.pop('budget', None) or {}
+        fallbacks_data = llm_data.pop('fallbacks', None) or []
+        
+        vision_data = data['vision'].copy()
+        
+        monitoring_data = (data.get('monitoring') or {}).copy()
+        tracing_data = monitoring_data.pop('tracing', None) or {}
+        metrics_data = monitoring_data.pop('metrics', None) or {}
+        recorder_data = monitoring_data.pop('recorder', None) or {}
+        ocr_data = vision_data.pop('ocr', None) or {}
+        fast_path_data = vision_data.pop('fast_path', None) or {}
         
         return cls(
             telegram=TelegramConfig(**data['telegram']),
-            llm=LLMConfig(**data['llm']),
+            llm=LLMConfig(
+                image=ImagePayloadConfig(**image_data),
+                plan_cache=PlanCacheConfig(**plan_cache_data),
+                http=HTTPClientConfig(**http_data),
+                fallbacks=[LLMBackendConfig(**backend) for backend in fallbacks_data],
+                router=RouterConfig(**router_data),
+                budget=BudgetConfig(**budget_data),
+                **llm_data
+            ),
             game=GameConfig(
                 multi_display=MultiDisplayConfig(**multi_display_data),
+                queue=QueueConfig(**queue_data),
+                input=InputConfig(**input_data),
+                settle=SettleConfig(**settle_data),
                 **game_data
             ),
-            vision=VisionConfig(**data['vision']),
+            vision=VisionConfig(
+                ocr=OCRConfig(**ocr_data),
+                fast_path=FastPathConfig(**fast_path_data),
+                **vision_data
+            ),
             logging=LoggingConfig(**data['logging']),
-            security=SecurityConfig(**data['security'])
+            security=SecurityConfig(**data['security']),
+            performance=PerformanceConfig(**(data.get('performance') or {})),
+            monitoring=MonitoringConfig(
+                tracing=TracingConfig(**tracing_data),
+                metrics=MetricsConfig(**metrics_data),
+                recorder=RecorderConfig(**recorder_data),
+                **monitoring_data
+            )
         )
     
     def validate(self) -> bool:
@@ -0,0 +1,102 @@
+"""
+Пулы исполнителей для CPU-нагруженной работы вне event loop
+"""
+import asyncio
+import functools
+import io
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from PIL import Image
+
+
+def encode_image(image: Image.Image, format: str = 'PNG', **params: Any) -> bytes:
+    """
+    Кодирование изображения в байты (функция верхнего уровня - подходит для пула процессов)
+    
+    Args:
+        image: PIL Image
+        format: Формат PIL (PNG, JPEG, WEBP)
+        **params: Параметры кодека (quality, optimize и т.д.)
+    
+    Returns:
+        Закодированные байты
+    """
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **params)
+    return buffer.getvalue()
+
+
+class ExecutorPools:
+    """
+    Пулы для блокирующих стадий конвейера:
+    
+    - vision: OCR, контурный анализ OpenCV, поиск элементов
+    - capture: захват скриншотов (бэкенды держат соединение с X сервером)
+    - input: эмуляция ввода (один поток, события идут строго по порядку)
+    - encode: кодирование PNG/JPEG (потоки или процессы)
+    
+    easyocr/torch, OpenCV и кодеки PIL отпускают GIL, поэтому потоков достаточно,
+    чтобы polling Telegram и другие чаты не ждали распознавания. Vision и capture
+    всегда работают в потоках: OCR модель и X соединение общие для процесса.
+    """
+    
+    def __init__(self):
+        self.vision_workers = 2
+        self.encode_workers = 2
+        self.encode_in_processes = False
+        self._pools: Dict[str, Executor] = {}
+    
+    def configure(self, vision_workers: int = 2, encode_workers: int = 2,
+                  encode_in_processes: bool = False) -> None:
+        """Настройка размеров пулов (уже созданные пулы пересоздаются)"""
+        self.shutdown()
+        self.vision_workers = max(1, vision_workers)
+        self.encode_workers = max(1, encode_workers)
+        self.encode_in_processes = encode_in_processes
+    
+    def _get_pool(self, stage: str) -> Executor:
+        """Ленивое создание пула стадии"""
+        pool = self._pools.get(stage)
+        if pool is None:
+            if stage == 'encode' and self.encode_in_processes:
+                pool = ProcessPoolExecutor(max_workers=self.encode_workers)
+            elif stage == 'encode':
+                pool = ThreadPoolExecutor(max_workers=self.encode_workers, thread_name_prefix='encode')
+            elif stage in ('capture', 'input'):
+                pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix=stage)
+            else:
+                pool = ThreadPoolExecutor(max_workers=self.vision_workers, thread_name_prefix=stage)
+            self._pools[stage] = pool
+        return pool
+    
+    async def run(self, stage: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Выполнение блокирующей функции в пуле стадии"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_pool(stage), functools.partial(fn, *args, **kwargs))
+    
+    async def run_vision(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """OCR, OpenCV и поиск элементов"""
+        return await self.run('vision', fn, *args, **kwargs)
+    
+    async def run_capture(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Захват экрана"""
+        return await self.run('capture', fn, *args, **kwargs)
+    
+    async def run_input(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Эмуляция ввода"""
+        return await self.run('input', fn, *args, **kwargs)
+    
+    async def encode(self, image: Image.Image, format: str = 'PNG', **params: Any) -> bytes:
+        """Кодирование изображения"""
+        return await self.run('encode', encode_image, image, format, **params)
+    
+    def shutdown(self, wait: bool = False) -> None:
+        """Остановка пулов"""
+        for pool in self._pools.values():
+            pool.shutdown(wait=wait)
+        self._pools.clear()
+
+
+# Общие пулы процесса
+executors = ExecutorPools()
@@ -0,0 +1,201 @@
+"""
+Метрики процесса в текстовом формате Prometheus и HTTP эндпоинт для них
+"""
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+from loguru import logger
+
+from .config import MetricsConfig
+
+
+Labels = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+@dataclass
+class MetricFamily:
+    """Метрика с набором значений по меткам (результат сборщика)"""
+    name: str
+    type: str  # counter, gauge
+    help: str
+    samples: List[Tuple[Dict[str, str], float]] = field(default_factory=list)
+
+
+def _labels_key(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ''
+    pairs = []
+    for key, value in items:
+        value = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    if value == float('inf'):
+        return '+Inf'
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Counter:
+    """Монотонный счетчик"""
+    
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = _labels_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Гистограмма длительностей с фиксированными корзинами"""
+    
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, List[float]] = {}  # счетчики корзин + [sum, count]
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float, **labels: str) -> None:
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in self._series.items():
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', _format_value(bound)))} "
+                                 f"{_format_value(count)}")
+                lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', '+Inf'))} {_format_value(series[-1])}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(series[-2])}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {_format_value(series[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Метрики процесса.
+    
+    Счетчики и гистограммы обновляются в момент события (стадии трасс,
+    LLM запросы), а состояние компонентов (очередь, кэши, память) снимается
+    сборщиками при каждом запросе /metrics.
+    """
+    
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+    
+    def counter(self, name: str, help: str) -> Counter:
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = Counter(name, help)
+        return metric
+    
+    def histogram(self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = Histogram(name, help, buckets)
+        return metric
+    
+    def register_collector(self, collector: Callable[[], Iterable[MetricFamily]]) -> None:
+        """Сборщик значений на момент запроса"""
+        self._collectors.append(collector)
+    
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus 0.0.4"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+                continue
+            for family in families:
+                lines.append(f"# HELP {family.name} {family.help}")
+                lines.append(f"# TYPE {family.name} {family.type}")
+                for labels, value in family.samples:
+                    lines.append(f"{family.name}{_format_labels(_labels_key(labels))} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def process_metrics() -> Iterable[MetricFamily]:
+    """Память процесса (Linux /proc)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            rss_pages = int(statm.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return []
+    return [MetricFamily('process_resident_memory_bytes', 'gauge', 'Resident memory size in bytes',
+                         [({}, rss_pages * os.sysconf('SC_PAGE_SIZE'))])]
+
+
+class MetricsServer:
+    """Локальный HTTP эндпоинт метрик на aiohttp"""
+    
+    def __init__(self, config: MetricsConfig, registry: 'MetricsRegistry'):
+        self.config = config
+        self.registry = registry
+        self._runner: Optional[web.AppRunner] = None
+    
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get(self.config.path, self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.config.host, self.config.port)
+        await site.start()
+        logger.info(f"📈 Метрики: http://{self.config.host}:{self.config.port}{self.config.path}")
+    
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+    
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.registry.render(), content_type='text/plain',
+                            headers={'X-Content-Type-Options': 'nosniff'}, charset='utf-8')
+
+
+# Общий реестр метрик процесса
+metrics = MetricsRegistry()
+metrics.register_collector(process_metrics)
+
+STAGE_SECONDS = metrics.histogram('disco_stage_duration_seconds', 'Duration of command pipeline stages')
+LLM_REQUEST_SECONDS = metrics.histogram('disco_llm_request_duration_seconds', 'LLM request latency per backend')
+LLM_TOKENS = metrics.counter('disco_llm_tokens_total', 'LLM tokens by backend and kind (prompt, completion)')
@@ -0,0 +1,191 @@
+"""
+Запись игровых команд для офлайн воспроизведения: кадр, обмен с LLM, результат детектора, действия
+"""
+import contextvars
+import hashlib
+import itertools
+import json
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from PIL import Image
+from loguru import logger
+
+from .config import RecorderConfig
+from .executor import executors
+
+
+COMMANDS_FILE = "commands.jsonl"
+FRAMES_DIR = "frames"
+
+
+@dataclass
+class CommandRecord:
+    """Одна команда сессии (строка commands.jsonl)"""
+    record_id: int
+    ts: float
+    chat_id: int
+    command: str
+    frame: Optional[str] = None                    # Файл кадра в frames/ (одинаковые кадры не дублируются)
+    llm: List[Dict[str, Any]] = field(default_factory=list)
+    detection: Dict[str, Any] = field(default_factory=dict)
+    actions: List[Dict[str, Any]] = field(default_factory=list)
+    attrs: Dict[str, Any] = field(default_factory=dict)
+    finished: bool = False
+
+
+_current_record: "contextvars.ContextVar[Optional[CommandRecord]]" = contextvars.ContextVar('record', default=None)
+
+
+def save_frame(image: Image.Image, directory: str, format: str = 'PNG') -> str:
+    """
+    Сохранение кадра с именем по содержимому (выполняется в пуле encode)
+    
+    Returns:
+        Имя файла относительно каталога кадров
+    """
+    digest = hashlib.sha1(image.tobytes()).hexdigest()[:16]
+    name = f"{digest}.{format.lower()}"
+    path = Path(directory) / name
+    if not path.exists():
+        image.save(path, format=format, **({'compress_level': 1} if format.upper() == 'PNG' else {}))
+    return name
+
+
+class SessionRecorder:
+    """
+    Журнал команд сессии на диске.
+    
+    Каталог сессии: commands.jsonl (строка JSON на команду) и frames/ с
+    входными кадрами. Запись создается на команду и активируется в ее
+    стадиях так же, как трасса (activate); запросы к LLM внутри попадают
+    в активную запись через контекст. Запись выключена по умолчанию и
+    при выключенной ничего не делает.
+    """
+    
+    def __init__(self):
+        self.config = RecorderConfig()
+        self._ids = itertools.count(1)
+        self._session_dir: Optional[Path] = None
+        self.frames = 0
+        self.commands = 0
+    
+    def configure(self, config: RecorderConfig) -> None:
+        """Настройка записи"""
+        self.config = config
+    
+    @property
+    def session_dir(self) -> Path:
+        """Каталог текущей сессии (создается при первой записи)"""
+        if self._session_dir is None:
+            self._session_dir = Path(self.config.directory) / datetime.now().strftime("%Y%m%d-%H%M%S")
+            (self._session_dir / FRAMES_DIR).mkdir(parents=True, exist_ok=True)
+            logger.info(f"📼 Запись команд: {self._session_dir}")
+        return self._session_dir
+    
+    def new_record(self, chat_id: int, command: str) -> Optional[CommandRecord]:
+        """Новая запись команды (None, если запись выключена)"""
+        if not self.config.enabled:
+            return None
+        return CommandRecord(record_id=next(self._ids), ts=time.time(), chat_id=chat_id, command=command)
+    
+    @contextmanager
+    def activate(self, record: Optional[CommandRecord]) -> Iterator[Optional[CommandRecord]]:
+        """Запросы к LLM внутри блока пишутся в запись"""
+        token = _current_record.set(record)
+        try:
+            yield record
+        finally:
+            _current_record.reset(token)
+    
+    async def add_frame(self, record: Optional[CommandRecord], screenshot: Image.Image) -> None:
+        """Входной кадр команды"""
+        if record is None:
+            return
+        if self.frames >= self.config.max_frames:
+            record.attrs['frame_skipped'] = True
+            return
+        directory = str(self.session_dir / FRAMES_DIR)
+        record.frame = await executors.run('encode', save_frame, screenshot, directory, self.config.frame_format)
+        record.attrs['frame_size'] = list(screenshot.size)
+        self.frames += 1
+    
+    def record_llm(self, provider: str, model: str, purpose: str, prompt: str,
+                   response: Dict[str, Any], latency: float) -> None:
+        """Обмен с LLM в активной записи (вызывается агентом)"""
+        record = _current_record.get()
+        if record is None:
+            return
+        record.llm.append({
+            'provider': provider,
+            'model': model,
+            'purpose': purpose,
+            'prompt': prompt,
+            'response': response.get('response', ''),
+            'usage': response.get('usage') or {},
+            'latency': round(latency, 4),
+        })
+    
+    def record_detection(self, record: Optional[CommandRecord], result: Optional[Dict[str, Any]]) -> None:
+        """Результат гибридного анализатора"""
+        if record is None or not result:
+            return
+        analysis = result.get('analysis')
+        record.detection = {
+            'method': result.get('method'),
+            'success': result.get('success'),
+            'coordinates': list(result['coordinates']) if result.get('coordinates') else None,
+            'action_description': result.get('action_description'),
+            'search_targets': analysis.get('search_targets') if isinstance(analysis, dict) else None,
+        }
+    
+    def record_actions(self, record: Optional[CommandRecord], actions: List[Dict[str, Any]], success: bool) -> None:
+        """Действия, выполненные в игре"""
+        if record is None:
+            return
+        record.actions = actions
+        record.attrs['actions_success'] = success
+    
+    def finish(self, record: Optional[CommandRecord], **attrs: Any) -> None:
+        """Запись команды в commands.jsonl (однократно)"""
+        if record is None or record.finished:
+            return
+        record.finished = True
+        record.attrs.update(attrs)
+        try:
+            with open(self.session_dir / COMMANDS_FILE, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(asdict(record), ensure_ascii=False, default=str) + '\n')
+            self.commands += 1
+        except OSError as e:
+            logger.warning(f"Не удалось записать команду в журнал сессии: {e}")
+
+
+def load_session(path: str) -> List[Dict[str, Any]]:
+    """
+    Команды записанной сессии
+    
+    Args:
+        path: Каталог сессии или путь к commands.jsonl
+    
+    Returns:
+        Записи в порядке выполнения
+    """
+    commands_path = Path(path)
+    if commands_path.is_dir():
+        commands_path = commands_path / COMMANDS_FILE
+    
+    records = []
+    with open(commands_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    return records
+
+
+# Общий журнал команд процесса
+session_recorder = SessionRecorder()
@@ -0,0 +1,175 @@
+"""
+Легковесная трассировка конвейера команды: спаны стадий и p50/p95 по стадиям
+"""
+import contextvars
+import itertools
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from loguru import logger
+
+from .config import TracingConfig
+from .metrics import STAGE_SECONDS
+
+
+@dataclass
+class Span:
+    """Стадия конвейера (время - time.perf_counter)"""
+    name: str
+    start: float
+    end: Optional[float] = None
+    parent: Optional[str] = None
+    attrs: Dict[str, Any] = field(default_factory=dict)
+    
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+
+@dataclass
+class Trace:
+    """Одна команда от постановки в очередь до ответа в Telegram"""
+    trace_id: int
+    name: str
+    started_at: float   # time.time() для журнала
+    start: float        # time.perf_counter() для длительностей
+    attrs: Dict[str, Any] = field(default_factory=dict)
+    spans: List[Span] = field(default_factory=list)
+    finished: bool = False
+
+
+_current_trace: "contextvars.ContextVar[Optional[Trace]]" = contextvars.ContextVar('trace', default=None)
+_current_span: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar('span', default=None)
+
+
+class Tracer:
+    """
+    Спаны с монотонным временем поверх contextvars.
+    
+    Трасса создается на команду и активируется в каждой ее стадии
+    (activate), спаны внутри (span) находят трассу и родителя через
+    контекст, в том числе в задачах asyncio, созданных внутри стадии.
+    Завершенная трасса пишется в loguru одной JSON строкой (extra["trace"]),
+    длительности стадий копятся для p50/p95. Код в пулах потоков контекст
+    не наследует - спаны ставятся вокруг await.
+    """
+    
+    def __init__(self):
+        self.config = TracingConfig()
+        self._ids = itertools.count(1)
+        self._durations: Dict[str, Deque[float]] = {}
+        self.traces = 0
+    
+    def configure(self, config: TracingConfig) -> None:
+        """Настройка трассировки"""
+        self.config = config
+    
+    def new_trace(self, name: str, **attrs: Any) -> Trace:
+        """Новая трасса (активируется отдельно в каждой стадии)"""
+        return Trace(trace_id=next(self._ids), name=name, started_at=time.time(),
+                     start=time.perf_counter(), attrs=attrs)
+    
+    @contextmanager
+    def activate(self, trace: Optional[Trace]) -> Iterator[Optional[Trace]]:
+        """Спаны внутри блока относятся к трассе"""
+        token = _current_trace.set(trace)
+        try:
+            yield trace
+        finally:
+            _current_trace.reset(token)
+    
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Span]:
+        """Замер стадии; без активной трассы копится только статистика"""
+        parent = _current_span.get()
+        span = Span(name=name, start=time.perf_counter(), parent=parent.name if parent else None, attrs=attrs)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs['error'] = type(e).__name__
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end = time.perf_counter()
+            self._record(span)
+    
+    def add_span(self, trace: Optional[Trace], name: str, start: float, end: float, **attrs: Any) -> None:
+        """Спан, измеренный снаружи (например, ожидание в очереди)"""
+        span = Span(name=name, start=start, end=end, attrs=attrs)
+        self._record(span, trace)
+    
+    def finish(self, trace: Optional[Trace], **attrs: Any) -> None:
+        """Завершение трассы: JSON в журнал и сводка каждые summary_every трасс"""
+        if trace is None or trace.finished:
+            return
+        trace.finished = True
+        trace.attrs.update(attrs)
+        total = time.perf_counter() - trace.start
+        self._durations.setdefault('total', deque(maxlen=self.config.window)).append(total)
+        STAGE_SECONDS.observe(total, stage='total')
+        self.traces += 1
+        
+        if not self.config.enabled:
+            return
+        
+        record = {
+            'trace_id': trace.trace_id,
+            'name': trace.name,
+            'ts': trace.started_at,
+            'total_ms': round(total * 1000, 1),
+            'attrs': trace.attrs,
+            'spans': [
+                {
+                    'name': span.name,
+                    'parent': span.parent,
+                    'offset_ms': round((span.start - trace.start) * 1000, 1),
+                    'duration_ms': round(span.duration * 1000, 1),
+                    **({'attrs': span.attrs} if span.attrs else {}),
+                }
+                for span in sorted(trace.spans, key=lambda item: item.start)
+            ],
+        }
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        logger.bind(trace=record).info(line)
+        
+        if self.config.summary_every and self.traces % self.config.summary_every == 0:
+            logger.info(f"⏱️ Стадии команд (p50/p95, мс): {self.summary()}")
+    
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """p50/p95 (сек) и число замеров по стадиям"""
+        result = {}
+        for name, durations in self._durations.items():
+            ordered = sorted(durations)
+            result[name] = {
+                'count': len(ordered),
+                'p50': ordered[int(0.5 * (len(ordered) - 1))],
+                'p95': ordered[int(0.95 * (len(ordered) - 1))],
+            }
+        return result
+    
+    def summary(self) -> str:
+        """Сводка для журнала: стадия p50/p95 в миллисекундах"""
+        return ', '.join(
+            f"{name} {values['p50'] * 1000:.0f}/{values['p95'] * 1000:.0f}"
+            for name, values in sorted(self.stats().items(), key=lambda item: -item[1]['p95'])
+        )
+    
+    def _record(self, span: Span, trace: Optional[Trace] = None) -> None:
+        durations = self._durations.get(span.name)
+        if durations is None:
+            durations = self._durations[span.name] = deque(maxlen=self.config.window)
+        durations.append(span.duration)
+        STAGE_SECONDS.observe(span.duration, stage=span.name)
+        
+        trace = trace or _current_trace.get()
+        if trace is not None and not trace.finished:
+            trace.spans.append(span)
+
+
+# Общий трассировщик процесса
+tracer = Tracer()
@@ -0,0 +1,249 @@
+"""
+Бэкенды захвата скриншотов игрового окна
+"""
+import os
+import subprocess
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageGrab
+
+from ..game.window_tracker import WindowTracker, get_window_tracker
+
+try:
+    from Xlib import X, display as xdisplay
+    from Xlib.error import XError
+    XLIB_AVAILABLE = True
+except ImportError:
+    XLIB_AVAILABLE = False
+    X = xdisplay = None
+    XError = Exception
+
+
+class CaptureBackend(ABC):
+    """Базовый класс бэкенда захвата экрана"""
+    
+    name = "base"
+    
+    def is_available(self) -> bool:
+        """Может ли бэкенд работать в текущем окружении"""
+        return True
+    
+    @abstractmethod
+    def grab(self) -> Optional[Image.Image]:
+        """Захват кадра игрового окна в RGB"""
+    
+    def close(self) -> None:
+        """Освобождение ресурсов"""
+
+
+class X11CaptureBackend(CaptureBackend):
+    """
+    Прямой захват через X11 (XGetImage) без запуска процессов и записи на диск.
+    
+    Держит одно соединение с X сервером; окно игры и его геометрию берет
+    у общего WindowTracker, которым пользуется и GameController.
+    """
+    
+    name = "x11"
+    
+    def __init__(self, window_title: str, tracker: Optional[WindowTracker] = None):
+        self.window_title = window_title
+        self.tracker = tracker or get_window_tracker(window_title)
+        self._display = None
+        self._lock = threading.Lock()
+    
+    def is_available(self) -> bool:
+        return XLIB_AVAILABLE and bool(os.environ.get('DISPLAY'))
+    
+    def grab(self) -> Optional[Image.Image]:
+        frame = self.grab_array()
+        if frame is None:
+            return None
+        
+        height, width = frame.shape[:2]
+        return Image.frombuffer("RGB", (width, height), frame.tobytes(), "raw", "BGRX", 0, 1)
+    
+    def grab_array(self) -> Optional[np.ndarray]:
+        """
+        Захват кадра в виде numpy массива (H, W, 4) в порядке BGRX
+        
+        Returns:
+            Массив пикселей окна игры или None при ошибке
+        """
+        with self._lock:
+            try:
+                return self._grab_locked()
+            except XError:
+                # Окно могло закрыться или пересоздаться - ищем заново
+                self.tracker.invalidate()
+                try:
+                    return self._grab_locked()
+                except XError as e:
+                    print(f"X11 capture error: {e}")
+                    return None
+    
+    def _grab_locked(self) -> Optional[np.ndarray]:
+        disp = self._get_display()
+        root = disp.screen().root
+        
+        x, y, width, height = self._window_rect(disp)
+        if width <= 0 or height <= 0:
+            return None
+        
+        raw = root.get_image(x, y, width, height, X.ZPixmap, 0xffffffff)
+        data = raw.data if isinstance(raw.data, bytes) else raw.data.encode('latin-1')
+        
+        # ZPixmap для глубины 24/32 - 4 байта на пиксель (BGRX)
+        bytes_per_line = len(data) // height
+        frame = np.frombuffer(data, dtype=np.uint8).reshape(height, bytes_per_line)
+        return frame[:, :width * 4].reshape(height, width, 4)
+    
+    def _window_rect(self, disp) -> Tuple[int, int, int, int]:
+        """Прямоугольник окна игры в координатах экрана (обрезанный по экрану)"""
+        screen = disp.screen()
+        screen_w, screen_h = screen.width_in_pixels, screen.height_in_pixels
+        
+        geometry = self.tracker.geometry()
+        if geometry is None:
+            # Окно не найдено - снимаем весь экран
+            return 0, 0, screen_w, screen_h
+        
+        x, y, width, height = geometry
+        x1, y1 = max(x, 0), max(y, 0)
+        x2 = min(x + width, screen_w)
+        y2 = min(y + height, screen_h)
+        return x1, y1, x2 - x1, y2 - y1
+    
+    def _get_display(self):
+        if self._display is None:
+            self._display = xdisplay.Display()
+        return self._display
+    
+    def close(self) -> None:
+        with self._lock:
+            if self._display is not None:
+                self._display.close()
+                self._display = None
+
+
+class ScriptCaptureBackend(CaptureBackend):
+    """Захват через скрипт screenshot-tool (spectacle/scrot/grim) и временный PNG"""
+    
+    name = "script"
+    
+    def __init__(self, window_title: str):
+        self.window_title = window_title
+    
+    def grab(self) -> Optional[Image.Image]:
+        try:
+            # Используем упрощенный инструмент для Steam Deck
+            with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_file:
+                cmd_screenshot = f"screenshot-tool {tmp_file.name} '{self.window_title}'"
+                print(f"📸 Создаем скриншот: {cmd_screenshot}")
+                
+                result = subprocess.run(
+                    cmd_screenshot,
+                    shell=True,
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                    timeout=10  # Увеличили таймаут
+                )
+                
+                print(f"✅ Скриншот создан: {tmp_file.name}")
+                if result.stdout:
+                    print(f"📝 Вывод: {result.stdout.strip()}")
+                
+                screenshot = Image.open(tmp_file.name)
+                screenshot.load()
+                os.unlink(tmp_file.name)
+                return screenshot
+        
+        except Exception as e:
+            error_msg = str(e)
+            print(f"Linux screenshot error: {error_msg}")
+            
+            # Проверяем на конкретные ошибки и даем советы
+            if "screenshot-tool" in error_msg or "convert" in error_msg or "xwd" in error_msg:
+                print("💡 Проблема с инструментами для скриншотов.")
+                print("   Запустите: ./install.sh --reinstall")
+                print("   Или установите вручную: sudo pacman -S grim (для Wayland) или scrot (для X11)")
+            return None
+
+
+class ScreenGrabBackend(CaptureBackend):
+    """Последний резерв: снимок всего экрана через PIL.ImageGrab"""
+    
+    name = "fullscreen"
+    
+    def grab(self) -> Optional[Image.Image]:
+        try:
+            return ImageGrab.grab()
+        except Exception as e:
+            print(f"Fallback screenshot also failed: {e}")
+            return None
+
+
+class CaptureChain(CaptureBackend):
+    """Цепочка бэкендов: пробует по порядку до первого успешного кадра"""
+    
+    name = "chain"
+    
+    def __init__(self, backends: List[CaptureBackend]):
+        self.backends = [backend for backend in backends if backend.is_available()]
+        print(f"📸 Бэкенды захвата: {[backend.name for backend in self.backends]}")
+    
+    def grab(self) -> Optional[Image.Image]:
+        for backend in self.backends:
+            screenshot = backend.grab()
+            if screenshot is not None:
+                return screenshot
+        return None
+    
+    @property
+    def has_array_grab(self) -> bool:
+        """Есть ли бэкенд с дешевым захватом массивом (без процессов и PNG)"""
+        return any(hasattr(backend, 'grab_array') for backend in self.backends)
+    
+    def grab_array(self) -> Optional[np.ndarray]:
+        """Кадр в BGRX от первого бэкенда, который умеет отдавать массив"""
+        for backend in self.backends:
+            if hasattr(backend, 'grab_array'):
+                frame = backend.grab_array()
+                if frame is not None:
+                    return frame
+        return None
+    
+    def close(self) -> None:
+        for backend in self.backends:
+            backend.close()
+
+
+def create_capture_backend(window_title: str, preferred: str = "auto") -> CaptureChain:
+    """
+    Создание цепочки бэкендов захвата
+    
+    Args:
+        window_title: Заголовок окна игры
+        preferred: "auto" (x11, при неудаче script), "x11" или "script"
+    
+    Returns:
+        CaptureChain с доступными бэкендами и полноэкранным резервом
+    """
+    preferred = preferred.lower()
+    x11 = X11CaptureBackend(window_title)
+    script = ScriptCaptureBackend(window_title)
+    
+    if preferred == "script":
+        backends = [script]
+    elif preferred == "x11":
+        backends = [x11]
+    else:
+        backends = [x11, script]
+    
+    backends.append(ScreenGrabBackend())
+    return CaptureChain(backends)
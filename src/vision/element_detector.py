@@ -10,41 +10,95 @@ import time
 from .models import GameElement
 from .ocr_detector import OCRDetector  
 from .ui_detector import UIDetector
+from .scene_index import SceneIndex
+from ..utils.config import OCRConfig
 
 
 class GameElementDetector:
     """Главный детектор игровых элементов"""
     
-    def __init__(self):
-        self.ocr_detector = OCRDetector()
+    # Приоритет методам
+    METHOD_PRIORITY = {
+        "ocr_exact": 10,
+        "ocr_partial": 8,
+        "ocr_fuzzy": 7,
+        "ui_button": 6,
+        "ui_contour": 4
+    }
+    
+    def __init__(self, ocr_config: Optional[OCRConfig] = None):
+        self.ocr_detector = OCRDetector(ocr_config)
         self.ui_detector = UIDetector()
     
     def find_element(self, screenshot: Image.Image, target: str) -> Optional[GameElement]:
         """Поиск элемента на скриншоте"""
+        index = self.build_scene_index(screenshot)
+        return self.find_in_index(index, target)
+    
+    def build_scene_index(self, screenshot: Image.Image) -> SceneIndex:
+        """
+        Однократный анализ кадра: OCR и контуры UI
+        
+        Args:
+            screenshot: PIL Image скриншота
+            
+        Returns:
+            SceneIndex для быстрых повторных поисков по этому кадру
+        """
         start_time = time.time()
         
         # Конвертируем в OpenCV формат
         cv_image = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
+        gray = cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
         
-        candidates = []
-        
-        # OCR поиск
+        # OCR всего кадра
+        ocr_results = None
         if self.ocr_detector.available:
-            ocr_candidates = self.ocr_detector.find_text_elements(cv_image, target)
-            candidates.extend(ocr_candidates)
+            ocr_results = self.ocr_detector.read_text(cv_image)
+        
+        # UI элементы не зависят от цели - ищем один раз
+        ui_elements = self.ui_detector.detect(gray)
+        
+        index = SceneIndex(screenshot.size, ocr_results, ui_elements)
+        
+        elapsed = time.time() - start_time
+        print(f"🗂️  Индекс сцены: {len(index.ocr_results)} строк текста, "
+              f"{len(ui_elements)} UI элементов за {elapsed:.2f}с")
+        return index
+    
+    def find_in_index(self, index: SceneIndex, target: str) -> Optional[GameElement]:
+        """Поиск цели в готовом индексе сцены"""
+        candidates = self.match_text_candidates(index, target)
         
         # UI поиск
-        ui_candidates = self.ui_detector.find_ui_elements(cv_image, target)
-        candidates.extend(ui_candidates)
+        candidates.extend(index.ui_elements)
         
         if not candidates:
             return None
         
         # Выбираем лучший кандидат
-        best = self._select_best_candidate(candidates, target)
+        return self._select_best_candidate(candidates, target)
+    
+    def match_text_candidates(self, index: SceneIndex, target: str) -> List[GameElement]:
+        """
+        Текстовые кандидаты цели, ранжированные от лучшего к худшему
         
-        elapsed = time.time() - start_time
-        return best
+        Args:
+            index: Индекс сцены
+            target: Искомый текст
+            
+        Returns:
+            Кандидаты OCR (точные, частичные, нечеткие)
+        """
+        if not index.has_text:
+            return []
+        
+        if index.matcher is None:
+            index.matcher = self.ocr_detector.build_matcher(index.ocr_results)
+        
+        candidates = self.ocr_detector.match_text(index.ocr_results, target, index.matcher)
+        candidates.sort(key=lambda x: (self.METHOD_PRIORITY.get(x.method, 0), x.confidence), reverse=True)
+        return candidates
     
     def find_elements(self, screenshot_path: str, target: str) -> List[GameElement]:
         """Поиск всех подходящих элементов (для совместимости)"""
@@ -57,18 +111,8 @@ class GameElementDetector:
         if len(candidates) == 1:
             return candidates[0]
         
-        # Приоритет методам
-        method_priority = {
-            "ocr_exact": 10,
-            "ocr_partial": 8,
-            "ui_button": 6,
-            "ui_contour": 4
-        }
-        
-        # Сортируем по приоритету метода и уверенности
-        candidates.sort(key=lambda x: (
-            method_priority.get(x.method, 0),
+        # Выбираем по приоритету метода и уверенности
+        return max(candidates, key=lambda x: (
+            self.METHOD_PRIORITY.get(x.method, 0),
             x.confidence
-        ), reverse=True)
-        
-        return candidates[0]
\ No newline at end of file
+        ))
\ No newline at end of file
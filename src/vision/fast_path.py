@@ -0,0 +1,187 @@
+"""
+Быстрый путь: команды, которые разрешаются по OCR без запроса к LLM
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from ..utils.config import FastPathConfig
+from .models import GameElement
+from .scene_index import SceneIndex
+from .text_matcher import fold_text, match_key, similarity
+
+
+# Слова-связки в командах выбора варианта
+_OPTION_WORDS = {
+    'вариант', 'варианта', 'ответ', 'ответа', 'пункт', 'номер', 'реплика', 'реплику',
+    'выбрать', 'выбери', 'выбираю', 'выбор', 'option', 'choose', 'select', 'answer', 'no',
+}
+
+# Порядковые числительные целиком (после fold_text: й -> и), чтобы
+# "пятно" или "вторник" не считались номером варианта
+_HARD_ENDINGS = r"(?:ыи|ои|ая|ое|ую|ого|ому|ом)"
+_SOFT_ENDINGS = r"(?:ии|яя|ее|юю|его|ему|ем|еи)"
+_ORDINALS = [
+    (re.compile(pattern), number) for pattern, number in (
+        (r"перв" + _HARD_ENDINGS, 1), (r"втор" + _HARD_ENDINGS, 2),
+        (r"трет(?:ии|ья|ье|ью|ьего|ьему|ьем|ьеи)", 3), (r"четверт" + _HARD_ENDINGS, 4),
+        (r"пят" + _HARD_ENDINGS, 5), (r"шест" + _HARD_ENDINGS, 6),
+        (r"седьм" + _HARD_ENDINGS, 7), (r"восьм" + _HARD_ENDINGS, 8),
+        (r"девят" + _HARD_ENDINGS, 9),
+        (r"последн" + _SOFT_ENDINGS, -1),
+        (r"first", 1), (r"second", 2), (r"third", 3), (r"fourth", 4), (r"fifth", 5),
+        (r"sixth", 6), (r"seventh", 7), (r"eighth", 8), (r"ninth", 9), (r"last", -1),
+    )
+]
+
+# Глаголы перед названием кнопки: "нажми Новая игра" -> "Новая игра"
+_ACTION_VERBS = {
+    'нажми', 'нажать', 'нажмите', 'кликни', 'кликнуть', 'клик', 'выбери', 'выбрать',
+    'открой', 'открыть', 'click', 'press', 'select', 'choose', 'open',
+}
+
+# Строка варианта диалога: "1. - Текст", "2) Текст"
+_OPTION_LINE_RE = re.compile(r"^\s*(\d{1,2})\s*[\.\)\:]")
+
+
+@dataclass
+class FastPathResult:
+    """Команда, разрешенная без LLM"""
+    element: GameElement
+    kind: str  # "dialogue_option" или "label"
+    action_description: str
+    confidence: float
+
+
+class CommandResolver:
+    """
+    Разрешение команд по уже распознанному тексту экрана:
+    
+    - номер варианта диалога ("2", "вариант 3", "выбрать первый вариант")
+    - надпись интерфейса, с которой команда совпадает почти дословно
+      ("Новая игра", "нажми продолжить")
+    
+    Неоднозначные команды (низкая схожесть или несколько похожих надписей)
+    остаются LLM.
+    """
+    
+    def __init__(self, config: FastPathConfig):
+        self.min_score = config.min_score
+        self.min_margin = config.min_margin
+        self.max_words = config.max_words
+    
+    def is_option(self, command: str) -> bool:
+        """Выбор варианта по номеру: стоит ждать OCR до запроса к LLM"""
+        return self.parse_option_number(command) is not None
+    
+    def is_label_candidate(self, command: str) -> bool:
+        """
+        Короткая команда, которая может совпасть с надписью
+        
+        Такие команды ("открыть инвентарь", "осмотреть стол") чаще всего не
+        совпадают ни с одной надписью, поэтому надпись ищется параллельно с
+        запросом к LLM, а не перед ним.
+        """
+        label = self._label(command)
+        return bool(label) and len(label.split()) <= self.max_words
+    
+    def parse_option_number(self, command: str) -> Optional[int]:
+        """
+        Номер варианта из команды (-1 - последний вариант)
+        
+        Returns:
+            Номер или None, если команда не про выбор варианта
+        """
+        words = [word for word in fold_text(command).split() if word not in _OPTION_WORDS]
+        if len(words) != 1:
+            return None
+        
+        word = words[0]
+        if word.isdigit():
+            number = int(word)
+            return number if 0 < number < 100 else None
+        for pattern, number in _ORDINALS:
+            if pattern.fullmatch(word):
+                return number
+        return None
+    
+    def resolve(self, command: str, index: SceneIndex) -> Optional[FastPathResult]:
+        """Попытка разрешить команду по индексу сцены"""
+        if not index.has_text:
+            return None
+        
+        number = self.parse_option_number(command)
+        if number is not None:
+            return self._resolve_option(number, index)
+        return self._resolve_label(command, index)
+    
+    def _resolve_option(self, number: int, index: SceneIndex) -> Optional[FastPathResult]:
+        """Вариант диалога по номеру в начале строки"""
+        options: Dict[int, GameElement] = {}
+        for element in index.text_elements:
+            match = _OPTION_LINE_RE.match(element.text_found)
+            if not match:
+                continue
+            option = int(match.group(1))
+            # Актуальные варианты - внизу панели диалога, выше может быть история
+            if option not in options or element.center_y > options[option].center_y:
+                options[option] = element
+        
+        if not options:
+            return None
+        
+        if number == -1:
+            number = max(options)
+        element = options.get(number)
+        if element is None:
+            return None
+        
+        print(f"⚡ Вариант {number} найден по OCR: '{element.text_found}'")
+        return FastPathResult(
+            element=element,
+            kind="dialogue_option",
+            action_description=f"Выбрал вариант {number}: {element.text_found}",
+            confidence=element.confidence
+        )
+    
+    def _resolve_label(self, command: str, index: SceneIndex) -> Optional[FastPathResult]:
+        """Надпись, почти дословно совпадающая с командой"""
+        label = self._label(command)
+        if not label or len(label.split()) > self.max_words:
+            return None
+        
+        key = match_key(label)
+        if len(key) < 3:
+            return None
+        
+        scored: List[tuple] = []
+        for element in index.text_elements:
+            text_key = match_key(element.text_found)
+            if text_key:
+                scored.append((similarity(key, text_key), text_key, element))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        
+        if not scored or scored[0][0] < self.min_score:
+            return None
+        
+        best_score, best_key, best = scored[0]
+        # Другая надпись почти так же похожа - решает LLM
+        for score, text_key, _ in scored[1:]:
+            if text_key != best_key and score > best_score - self.min_margin:
+                return None
+        
+        print(f"⚡ Надпись найдена по OCR: '{best.text_found}' ({best_score:.2f})")
+        return FastPathResult(
+            element=best,
+            kind="label",
+            action_description=f"Нажал «{best.text_found}»",
+            confidence=best_score
+        )
+    
+    @staticmethod
+    def _label(command: str) -> str:
+        """Команда без глагола действия"""
+        words = fold_text(command).split()
+        while words and words[0] in _ACTION_VERBS:
+            words = words[1:]
+        return ' '.join(words)
@@ -0,0 +1,136 @@
+"""
+Поиск изменившихся областей между последовательными кадрами
+"""
+from typing import List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+Rect = Tuple[int, int, int, int]  # (x1, y1, x2, y2)
+
+
+def to_gray(cv_image: np.ndarray) -> np.ndarray:
+    """Перевод BGR/BGRX/серого кадра в градации серого"""
+    if cv_image.ndim == 2:
+        return cv_image
+    if cv_image.shape[2] == 4:
+        return cv2.cvtColor(cv_image, cv2.COLOR_BGRA2GRAY)
+    return cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
+
+
+def changed_fraction(prev_gray: np.ndarray, gray: np.ndarray, pixel_threshold: int = 25) -> float:
+    """Доля пикселей, изменившихся сильнее порога (кадры одного размера)"""
+    diff = cv2.absdiff(prev_gray, gray)
+    return float(np.count_nonzero(diff > pixel_threshold)) / diff.size
+
+
+def dirty_tiles(previous: np.ndarray, gray: np.ndarray, tile_size: int = 64,
+                pixel_threshold: int = 25, tile_threshold: float = 0.002) -> np.ndarray:
+    """
+    Маска изменившихся тайлов двух серых кадров одного размера
+    
+    Returns:
+        Массив uint8 (строки x столбцы тайлов), 1 - тайл изменился
+    """
+    height, width = gray.shape
+    changed = (cv2.absdiff(previous, gray) > pixel_threshold).astype(np.float32)
+    
+    rows = max(1, -(-height // tile_size))
+    cols = max(1, -(-width // tile_size))
+    
+    # INTER_AREA усредняет маску - получаем долю изменений в каждом тайле
+    tile_scores = cv2.resize(changed, (cols, rows), interpolation=cv2.INTER_AREA)
+    return (tile_scores > tile_threshold).astype(np.uint8)
+
+
+class FrameDiffTracker:
+    """
+    Трекер «грязных» тайлов: сравнивает кадр с предыдущим по сетке тайлов
+    и возвращает прямоугольники изменившихся областей.
+    """
+    
+    def __init__(self, tile_size: int = 64, pixel_threshold: int = 25,
+                 tile_threshold: float = 0.002, padding: int = 8):
+        self.tile_size = tile_size
+        self.pixel_threshold = pixel_threshold
+        self.tile_threshold = tile_threshold  # доля изменившихся пикселей в тайле
+        self.padding = padding
+        self.previous: Optional[np.ndarray] = None
+    
+    def reset(self) -> None:
+        """Сброс истории (следующий кадр будет считаться полностью новым)"""
+        self.previous = None
+    
+    def update(self, cv_image: np.ndarray) -> Optional[List[Rect]]:
+        """
+        Сравнение кадра с предыдущим и запоминание его как нового эталона
+        
+        Args:
+            cv_image: Кадр в формате OpenCV
+        
+        Returns:
+            Список изменившихся прямоугольников (пустой, если кадр не изменился)
+            или None, если сравнивать не с чем (первый кадр или другой размер)
+        """
+        gray = to_gray(cv_image)
+        previous, self.previous = self.previous, gray
+        
+        if previous is None or previous.shape != gray.shape:
+            return None
+        
+        dirty = dirty_tiles(previous, gray, self.tile_size, self.pixel_threshold, self.tile_threshold)
+        if not dirty.any():
+            return []
+        
+        height, width = gray.shape
+        return self._merge_tiles(dirty, width, height)
+    
+    def _merge_tiles(self, dirty: np.ndarray, width: int, height: int) -> List[Rect]:
+        """Объединение соседних грязных тайлов в прямоугольники"""
+        count, _, stats, _ = cv2.connectedComponentsWithStats(dirty, connectivity=8)
+        
+        rects = []
+        for label in range(1, count):
+            tx, ty, tw, th = stats[label][:4]
+            x1 = max(0, int(tx) * self.tile_size - self.padding)
+            y1 = max(0, int(ty) * self.tile_size - self.padding)
+            x2 = min(width, int(tx + tw) * self.tile_size + self.padding)
+            y2 = min(height, int(ty + th) * self.tile_size + self.padding)
+            rects.append((x1, y1, x2, y2))
+        
+        return rects
+
+
+def rect_area(rect: Rect) -> int:
+    """Площадь прямоугольника"""
+    return max(0, rect[2] - rect[0]) * max(0, rect[3] - rect[1])
+
+
+def rects_intersect(a: Rect, b: Rect) -> bool:
+    """Пересекаются ли прямоугольники"""
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def rect_union(a: Rect, b: Rect) -> Rect:
+    """Описывающий прямоугольник двух прямоугольников"""
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def merge_rects(rects: List[Rect]) -> List[Rect]:
+    """Слияние пересекающихся прямоугольников до непересекающегося набора"""
+    merged = list(rects)
+    changed = True
+    while changed:
+        changed = False
+        result: List[Rect] = []
+        for rect in merged:
+            for i, other in enumerate(result):
+                if rects_intersect(rect, other):
+                    result[i] = rect_union(rect, other)
+                    changed = True
+                    break
+            else:
+                result.append(rect)
+        merged = result
+    return merged
@@ -3,13 +3,21 @@
 """
 import asyncio
 import os
-from typing import Optional, Tuple, Dict, Any, List
+from typing import Callable, Optional, Tuple, Dict, Any, List
 from PIL import Image
+import numpy as np
 import time
 
 from ..utils.config import Config
 from ..llm.agent import LLMAgent
+from ..llm import plan_cache as plans
+from ..utils.executor import executors
+from ..utils.tracing import tracer
 from .element_detector import GameElementDetector
+from .fast_path import CommandResolver, FastPathResult
+from .image_hash import dhash
+from .models import GameElement
+from .scene_index import SceneIndex
 
 
 class HybridScreenAnalyzer:
@@ -18,39 +26,156 @@ class HybridScreenAnalyzer:
     def __init__(self, config: Config):
         self.config = config
         self.llm_agent = LLMAgent(config)
-        self.element_detector = GameElementDetector()
+        self.element_detector = GameElementDetector(config.vision.ocr)
         
-    async def analyze_and_find_element(self, screenshot: Image.Image, command: str) -> Dict[str, Any]:
+        # Номера вариантов и названия кнопок разрешаются по OCR без LLM
+        fast_path = config.vision.fast_path
+        self.command_resolver = CommandResolver(fast_path) if fast_path.enabled else None
+        
+        # Успешные планы LLM для повторяющихся команд
+        self.plan_cache = plans.PlanCache(config.llm.plan_cache) if config.llm.plan_cache.enabled else None
+    
+    async def analyze_and_find_element(self, screenshot: Image.Image, command: str,
+                                       on_progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
         """
         Главный метод: LLM анализирует скриншот, детектор ищет точные координаты
         
         Args:
             screenshot: PIL Image скриншота
             command: Команда для анализа
-            
+            on_progress: Частичное описание действия по мере генерации ответа
+        
         Returns:
             Dict с результатами анализа и координатами
         """
+        # Анализ кадра (OCR + UI) идет параллельно с ответом LLM
+        index_task = asyncio.ensure_future(self._build_scene_index(screenshot))
+        lookups: Dict[str, asyncio.Future] = {}
+        
+        def on_target(target: Dict[str, Any]) -> None:
+            # Цель из потокового ответа ищем, не дожидаясь конца генерации
+            text = target.get('text')
+            if text and text not in lookups:
+                lookups[text] = asyncio.ensure_future(self._lookup_target(index_task, text))
+        
+        try:
+            return await self._analyze_and_find(screenshot, command, index_task, lookups,
+                                                on_target, on_progress)
+        finally:
+            for future in [index_task, *lookups.values()]:
+                if not future.done():
+                    future.cancel()
+                elif not future.cancelled():
+                    future.exception()
+    
+    async def _build_scene_index(self, screenshot: Image.Image) -> SceneIndex:
+        """Индекс сцены в пуле vision"""
+        with tracer.span('scene_index'):
+            return await executors.run_vision(self.element_detector.build_scene_index, screenshot)
+    
+    async def _analyze_and_find(self, screenshot: Image.Image, command: str,
+                                index_task: asyncio.Future, lookups: Dict[str, asyncio.Future],
+                                on_target: Callable[[Dict[str, Any]], None],
+                                on_progress: Optional[Callable[[str], None]]) -> Dict[str, Any]:
+        """LLM анализ и поиск координат по индексу кадра"""
+        # 0. Номер варианта однозначно находится в тексте экрана - LLM не нужен
+        if self.command_resolver and self.command_resolver.is_option(command):
+            with tracer.span('fast_path'):
+                index: SceneIndex = await asyncio.shield(index_task)
+                resolved = self.command_resolver.resolve(command, index)
+            if resolved:
+                return self._fast_path_result(resolved)
+        
+        # Надпись ищем параллельно с LLM: для обычных коротких команд
+        # ожидание OCR не должно задерживать запрос
+        llm_task = None
+        if self.command_resolver and self.command_resolver.is_label_candidate(command):
+            llm_task = asyncio.ensure_future(
+                self._traced_analysis(screenshot, command, on_target, on_progress))
+        
+        try:
+            return await self._analyze_with_llm(screenshot, command, index_task, lookups,
+                                                on_target, on_progress, llm_task)
+        finally:
+            if llm_task is not None and not llm_task.done():
+                llm_task.cancel()
+    
+    async def _analyze_with_llm(self, screenshot: Image.Image, command: str,
+                                index_task: asyncio.Future, lookups: Dict[str, asyncio.Future],
+                                on_target: Callable[[Dict[str, Any]], None],
+                                on_progress: Optional[Callable[[str], None]],
+                                llm_task: Optional[asyncio.Future]) -> Dict[str, Any]:
+        """Кэш планов, LLM и поиск координат; llm_task - уже запущенный запрос к LLM"""
+        if llm_task is not None:
+            with tracer.span('fast_path'):
+                index: SceneIndex = await asyncio.shield(index_task)
+                resolved = self.command_resolver.resolve(command, index)
+            if resolved:
+                # Надпись найдена - ответ LLM не нужен (запрос отменяется)
+                return self._fast_path_result(resolved)
+        
+        # План для этой команды на похожем экране уже известен - LLM не нужен
+        fingerprint = None
+        if self.plan_cache and self.plan_cache.has_command(command):
+            with tracer.span('plan_cache'):
+                fingerprint = await self._fingerprint(screenshot, index_task)
+                cached = self.plan_cache.get(command, fingerprint)
+            if cached:
+                plan_key, plan = cached
+                precise_coords = None
+                # Контур UI есть почти на любом кадре, поэтому план верен, только
+                # если каждая его цель найдена в тексте экрана
+                if await self._plan_matches_text(index_task, plan['search_targets']):
+                    precise_coords = await self._find_precise_coordinates(index_task, plan['search_targets'], lookups)
+                
+                if precise_coords:
+                    action_desc = plan.get('action_description') or 'Выполнил игровое действие'
+                    print(f"📋 План из кэша: ({precise_coords[0]}, {precise_coords[1]}) для: {action_desc}")
+                    
+                    return {
+                        'method': 'plan_cache',
+                        'analysis': plan,
+                        'coordinates': precise_coords,
+                        'action_description': action_desc,
+                        'plan_key': plan_key,
+                        'success': True
+                    }
+                
+                # Цели плана не найдены - экран уже другой
+                self.plan_cache.invalidate(plan_key)
+        
         # 1. LLM анализирует скриншот и определяет что искать
-        screen_analysis = await self._analyze_screen_elements(screenshot, command)
+        if llm_task is not None:
+            screen_analysis = await llm_task
+        else:
+            screen_analysis = await self._traced_analysis(screenshot, command, on_target, on_progress)
         
         # 2. Если есть объекты для поиска
         if screen_analysis.get('search_targets'):
             # Используем детектор для поиска точных координат
-            precise_coords = await self._find_precise_coordinates(
-                screenshot, 
-                screen_analysis['search_targets']
-            )
+            with tracer.span('detector'):
+                precise_coords = await self._find_precise_coordinates(
+                    index_task,
+                    screen_analysis['search_targets'],
+                    lookups
+                )
             
             if precise_coords:
                 action_desc = screen_analysis.get('action_description', 'Выполнил игровое действие')
                 print(f"🎯 Найдены координаты: ({precise_coords[0]}, {precise_coords[1]}) для: {action_desc}")
                 
+                # Запоминаем план, цели которого найдены в тексте этого экрана
+                plan_key = None
+                if self.plan_cache and await self._plan_matches_text(index_task, screen_analysis['search_targets']):
+                    fingerprint = fingerprint or await self._fingerprint(screenshot, index_task)
+                    plan_key = self.plan_cache.put(command, fingerprint, screen_analysis)
+                
                 return {
                     'method': 'hybrid',
                     'analysis': screen_analysis,
                     'coordinates': precise_coords,
                     'action_description': action_desc,
+                    'plan_key': plan_key,
                     'success': True
                 }
         
@@ -75,10 +200,37 @@ class HybridScreenAnalyzer:
             'success': False
         }
     
-    async def _analyze_screen_elements(self, screenshot: Image.Image, command: str) -> Dict[str, Any]:
+    @staticmethod
+    def _fast_path_result(resolved: FastPathResult) -> Dict[str, Any]:
+        """Результат быстрого пути в формате analyze_and_find_element"""
+        element = resolved.element
+        return {
+            'method': 'fast_path',
+            'analysis': {
+                'kind': resolved.kind,
+                'text': element.text_found,
+                'confidence': resolved.confidence,
+            },
+            'coordinates': (element.center_x, element.center_y),
+            'action_description': resolved.action_description,
+            'success': True
+        }
+    
+    async def _traced_analysis(self, screenshot: Image.Image, command: str,
+                               on_target: Optional[Callable[[Dict[str, Any]], None]],
+                               on_progress: Optional[Callable[[str], None]]) -> Dict[str, Any]:
+        """Запрос к LLM со спаном llm (может идти отдельной задачей)"""
+        with tracer.span('llm'):
+            return await self._analyze_screen_elements(screenshot, command, on_target, on_progress)
+    
+    async def _analyze_screen_elements(self, screenshot: Image.Image, command: str,
+                                       on_target: Optional[Callable[[Dict[str, Any]], None]] = None,
+                                       on_progress: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
         """LLM анализирует скриншот и определяет объекты для поиска"""
         # Используем специальный метод для анализа элементов
-        result = await self.llm_agent.analyze_for_elements(screenshot, command)
+        result = await self.llm_agent.analyze_for_elements(
+            screenshot, command, on_target=on_target, on_progress=on_progress
+        )
         
         # Обрабатываем результат
         if result and result.get('success'):
@@ -91,24 +243,58 @@ class HybridScreenAnalyzer:
         
         return {'analysis': 'LLM analysis failed', 'search_targets': [], 'coordinates': None}
     
-
     
-    async def _find_precise_coordinates(self, screenshot: Image.Image, search_targets: List[Dict[str, Any]]) -> Optional[Tuple[int, int]]:
+    
+    async def _find_precise_coordinates(self, index_task: asyncio.Future, search_targets: List[Dict[str, Any]],
+                                        lookups: Optional[Dict[str, asyncio.Future]] = None) -> Optional[Tuple[int, int]]:
         """Использует детектор для поиска точных координат"""
-        # Ищем каждую цель
-        for target in search_targets:
-            text_to_find = target.get('text', '')
-            
-            if text_to_find:
-                # Используем детектор элементов
-                element = self.element_detector.find_element(screenshot, text_to_find)
-                
-                if element:
-                    # Возвращаем координаты найденного элемента
-                    return (element.center_x, element.center_y)
+        texts = [target.get('text', '') for target in search_targets if target.get('text')]
+        if not texts:
+            return None
+        
+        lookups = lookups if lookups is not None else {}
+        
+        # Один анализ кадра на все цели, дальше - дешевые поиски по индексу.
+        # Цели проверяются в порядке приоритета; часть уже найдена во время стрима
+        for text in texts:
+            if text not in lookups:
+                lookups[text] = asyncio.ensure_future(self._lookup_target(index_task, text))
+            element = await lookups[text]
+            if element:
+                # Возвращаем координаты найденного элемента
+                return (element.center_x, element.center_y)
         
         return None
     
+    async def _plan_matches_text(self, index_task: asyncio.Future, search_targets: List[Dict[str, Any]]) -> bool:
+        """Каждая цель плана найдена в тексте кадра (точно, частично или нечетко выше порога)"""
+        texts = [target.get('text', '') for target in search_targets if target.get('text')]
+        if not texts:
+            return False
+        
+        index: SceneIndex = await asyncio.shield(index_task)
+        return await executors.run_vision(
+            lambda: all(self.element_detector.match_text_candidates(index, text) for text in texts)
+        )
+    
+    def forget_plan(self, result: Dict[str, Any]) -> None:
+        """Удаление плана из кэша, если действие по нему не удалось"""
+        plan_key = result.get('plan_key') if result else None
+        if self.plan_cache and plan_key:
+            self.plan_cache.invalidate(plan_key)
+    
+    async def _fingerprint(self, screenshot: Image.Image, index_task: asyncio.Future) -> "plans.ScreenFingerprint":
+        """Отпечаток экрана для кэша планов: хэш кадра и надписи из индекса сцены"""
+        index: SceneIndex = await asyncio.shield(index_task)
+        frame_hash = dhash(np.asarray(screenshot), hash_size=8)
+        return plans.PlanCache.fingerprint(frame_hash, (text for _, text, _ in index.ocr_results))
+    
+    async def _lookup_target(self, index_task: asyncio.Future, text: str) -> Optional[GameElement]:
+        """Поиск одной цели, как только готов индекс кадра"""
+        # shield: отмена одного поиска не должна отменять общий анализ кадра
+        index: SceneIndex = await asyncio.shield(index_task)
+        return await executors.run_vision(self.element_detector.find_in_index, index, text)
+    
     async def close(self):
         """Освобождение ресурсов"""
         if hasattr(self.llm_agent, 'close'):
@@ -0,0 +1,31 @@
+"""
+Перцептивные хэши кадров
+"""
+import cv2
+import numpy as np
+
+from .frame_diff import to_gray
+
+
+def dhash(cv_image: np.ndarray, hash_size: int = 16) -> bytes:
+    """
+    Разностный хэш (dHash) уменьшенного кадра
+    
+    Кадр сжимается до (hash_size + 1) x hash_size, каждый бит - знак перепада
+    яркости между соседними пикселями. Устойчив к шуму и мелкой анимации.
+    
+    Args:
+        cv_image: Кадр в формате OpenCV (BGR, BGRX или серый)
+        hash_size: Размер стороны хэша (итого hash_size^2 бит)
+        
+    Returns:
+        Упакованные биты хэша
+    """
+    small = cv2.resize(to_gray(cv_image), (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return np.packbits(bits).tobytes()
+
+
+def hamming_distance(a: bytes, b: bytes) -> int:
+    """Число различающихся бит двух хэшей одинаковой длины"""
+    return bin(int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')).count('1')
@@ -0,0 +1,122 @@
+"""
+Ограниченный кэш OCR результатов с ключом по перцептивному хэшу кадра
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .frame_diff import dirty_tiles, to_gray
+from .image_hash import dhash
+
+
+class OCRResultCache:
+    """
+    LRU/TTL кэш OCR результатов
+    
+    Ключ - dHash уменьшенного кадра и его размер. Совпадение хэша - только
+    кандидат: смена одной строки диалога меняет хэш всего кадра на 1-2 бита,
+    поэтому кадр сверяется с сохраненным по тайлам (как в инкрементальном
+    OCR), и результат переиспользуется, только если ни один тайл не
+    изменился. Для сверки хранится серый кадр в половинном разрешении;
+    память ограничена max_size записями.
+    """
+    
+    def __init__(self, max_size: int = 32, ttl: float = 600.0,
+                 hash_size: int = 32, tile_size: int = 64):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hash_size = hash_size
+        self.tile_size = tile_size
+        self._entries: "OrderedDict[Tuple[Tuple[int, int], bytes], Tuple[Any, float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        self.hits = 0
+        self.collisions = 0  # хэш совпал, но тайлы кадра отличаются
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def key_for(self, cv_image: np.ndarray) -> Tuple[Tuple[int, int], bytes]:
+        """Ключ кэша для кадра"""
+        return (cv_image.shape[:2], dhash(cv_image, self.hash_size))
+    
+    def get(self, key: Tuple[Tuple[int, int], bytes], cv_image: np.ndarray) -> Optional[Any]:
+        """Поиск результата: точное совпадение хэша, подтвержденное сверкой тайлов"""
+        if self.max_size <= 0:
+            return None
+        
+        with self._lock:
+            self._expire()
+            
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not dirty_tiles(entry[2], self._snapshot(cv_image), self.tile_size // 2).any():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                self.collisions += 1
+            
+            self.misses += 1
+            return None
+    
+    def put(self, key: Tuple[Tuple[int, int], bytes], cv_image: np.ndarray, results: Any) -> None:
+        """Сохранение результата с вытеснением самых старых записей"""
+        if self.max_size <= 0:
+            return
+        
+        snapshot = self._snapshot(cv_image)
+        with self._lock:
+            self._entries[key] = (results, time.monotonic(), snapshot)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self) -> None:
+        """Очистка кэша (счетчики сохраняются)"""
+        with self._lock:
+            self._entries.clear()
+    
+    def _expire(self) -> None:
+        """Удаление записей старше ttl"""
+        if self.ttl <= 0:
+            return
+        
+        deadline = time.monotonic() - self.ttl
+        expired = [key for key, (_, created, _) in self._entries.items() if created < deadline]
+        for key in expired:
+            del self._entries[key]
+        self.expirations += len(expired)
+    
+    @staticmethod
+    def _snapshot(cv_image: np.ndarray) -> np.ndarray:
+        """Серый кадр в половинном разрешении для сверки тайлов"""
+        gray = to_gray(cv_image)
+        height, width = gray.shape
+        return cv2.resize(gray, (max(1, width // 2), max(1, height // 2)), interpolation=cv2.INTER_AREA)
+    
+    @property
+    def hit_rate(self) -> float:
+        """Доля попаданий"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+    
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики кэша"""
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'collisions': self.collisions,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': round(self.hit_rate, 3)
+        }
+    
+    def __len__(self) -> int:
+        return len(self._entries)
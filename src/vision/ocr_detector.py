@@ -1,67 +1,152 @@
 """
 OCR компонент для распознавания текста
 """
+import threading
 import time
 from typing import List, Optional
 import numpy as np
 from .models import GameElement
-
-try:
-    import easyocr
-    OCR_AVAILABLE = True
-except ImportError:
-    OCR_AVAILABLE = False
+from .ocr_engine import DEFAULT_LANGUAGES, ocr_engines
+from .ocr_cache import OCRResultCache
+from .text_layout import TextLayout
+from .text_matcher import TextMatchIndex, fold_text
+from ..utils.config import OCRConfig
 
 
 class OCRDetector:
     """Детектор текста на основе OCR"""
     
-    def __init__(self):
-        self.reader = None
-        self.cache = {}
+    def __init__(self, config: Optional[OCRConfig] = None, languages=DEFAULT_LANGUAGES):
+        self.config = config or OCRConfig()
+        self.languages = tuple(languages)
+        self._lock = threading.Lock()  # read_text вызывается из пула vision
+        self.cache = OCRResultCache(
+            max_size=self.config.cache_size,
+            ttl=self.config.cache_ttl,
+            hash_size=self.config.cache_hash_size,
+            tile_size=self.config.tile_size
+        )
         
-        if OCR_AVAILABLE:
-            self.reader = easyocr.Reader(['en', 'ru'], gpu=False)
+        # Раскладка текста сессии: между кадрами OCR только изменившихся областей
+        self.layout = None
+        if self.config.incremental:
+            self.layout = TextLayout(
+                tile_size=self.config.tile_size,
+                full_refresh_ratio=self.config.full_refresh_ratio
+            )
+    
+    @property
+    def reader(self):
+        """Общий для процесса easyocr.Reader (ждет окончания загрузки)"""
+        return ocr_engines.get_reader(self.languages)
     
     @property
     def available(self) -> bool:
-        """Проверка доступности OCR"""
-        return self.reader is not None
+        """Проверка доступности OCR (не блокирует, пока модели загружаются)"""
+        return ocr_engines.status(self.languages) not in ("unavailable", "failed")
     
     def find_text_elements(self, cv_image: np.ndarray, target: str) -> List[GameElement]:
         """Поиск текстовых элементов"""
         if not self.available:
             return []
         
-        candidates = []
+        ocr_results = self.read_text(cv_image)
+        if ocr_results is None:
+            return []
         
-        # Кэшируем OCR результаты
-        img_hash = hash(cv_image.tobytes())
-        if img_hash in self.cache:
-            ocr_results = self.cache[img_hash]
-        else:
-            ocr_results = self.reader.readtext(cv_image)
-            self.cache[img_hash] = ocr_results
+        return self.match_text(ocr_results, target)
+    
+    def match_text(self, ocr_results: list, target: str,
+                   matcher: Optional[TextMatchIndex] = None) -> List[GameElement]:
+        """
+        Поиск цели среди готовых OCR результатов
+        
+        Args:
+            ocr_results: Результаты read_text
+            target: Искомый текст
+            matcher: Готовый нечеткий индекс по этим результатам (если есть)
+            
+        Returns:
+            Кандидаты с точным и частичным совпадением, а если их нет -
+            нечеткие совпадения, ранжированные по схожести
+        """
+        candidates = []
         
-        target_lower = target.lower()
+        target_folded = fold_text(target)
         
         for (bbox, text, confidence) in ocr_results:
             if confidence < 0.3:
                 continue
                 
-            text_lower = text.lower().strip()
+            text_folded = fold_text(text)
+            if not text_folded:
+                continue
             
             # Точное совпадение
-            if target_lower == text_lower:
+            if target_folded == text_folded:
                 element = self._create_element_from_ocr(bbox, text, confidence, "ocr_exact")
                 candidates.append(element)
             # Частичное совпадение
-            elif target_lower in text_lower or text_lower in target_lower:
+            elif target_folded in text_folded or text_folded in target_folded:
                 element = self._create_element_from_ocr(bbox, text, confidence, "ocr_partial")
                 candidates.append(element)
         
+        if candidates:
+            return candidates
+        
+        # Нечеткий поиск: шум OCR, транслитерация, перепутанные алфавиты
+        if matcher is None:
+            matcher = self.build_matcher(ocr_results)
+        
+        for (bbox, text, confidence), score in matcher.search(target, min_score=self.config.fuzzy_min_score):
+            element = self._create_element_from_ocr(bbox, text, score, "ocr_fuzzy")
+            candidates.append(element)
+        
         return candidates
     
+    def build_matcher(self, ocr_results: list) -> TextMatchIndex:
+        """Триграммный индекс по OCR результатам для нечеткого поиска"""
+        return TextMatchIndex([
+            (result[1], result) for result in ocr_results if result[2] >= 0.3
+        ])
+    
+    def read_text(self, cv_image: np.ndarray) -> Optional[list]:
+        """
+        Распознавание всего текста на кадре
+        
+        Args:
+            cv_image: Кадр в формате OpenCV (BGR)
+            
+        Returns:
+            Результаты easyocr [(bbox, text, confidence), ...] или None, если OCR недоступен
+        """
+        reader = self.reader
+        if reader is None:
+            return None
+        
+        with self._lock:
+            return self._read_text_locked(reader, cv_image)
+    
+    def _read_text_locked(self, reader, cv_image: np.ndarray) -> list:
+        """Распознавание с кэшем и инкрементальной раскладкой (под блокировкой)"""
+        # Кэшируем OCR результаты по перцептивному хэшу кадра (с проверкой тайлов)
+        cache_key = self.cache.key_for(cv_image)
+        ocr_results = self.cache.get(cache_key, cv_image)
+        if ocr_results is not None:
+            if self.layout:
+                self.layout.adopt(cv_image, ocr_results)
+            return ocr_results
+        
+        start_time = time.time()
+        if self.layout:
+            ocr_results = self.layout.update(cv_image, reader.readtext)
+            print(f"🔤 OCR ({self.layout.last_update_kind}): {len(ocr_results)} строк за {time.time() - start_time:.2f}с")
+        else:
+            ocr_results = reader.readtext(cv_image)
+        
+        self.cache.put(cache_key, cv_image, ocr_results)
+        return ocr_results
+    
     def _create_element_from_ocr(self, bbox, text: str, confidence: float, method: str) -> GameElement:
         """Создание элемента из OCR результата"""
         # Вычисляем центр из bbox
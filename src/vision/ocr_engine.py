@@ -0,0 +1,137 @@
+"""
+Общий реестр OCR движков процесса
+"""
+import threading
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+try:
+    import easyocr
+    OCR_AVAILABLE = True
+except ImportError:
+    OCR_AVAILABLE = False
+    easyocr = None
+
+
+DEFAULT_LANGUAGES: Tuple[str, ...] = ('en', 'ru')
+
+
+class _EngineSlot:
+    """Состояние одного движка (набор языков -> easyocr.Reader)"""
+    
+    def __init__(self, languages: Tuple[str, ...]):
+        self.languages = languages
+        self.reader = None
+        self.error: Optional[Exception] = None
+        self.load_time: Optional[float] = None
+        self.thread: Optional[threading.Thread] = None
+        self.ready = threading.Event()
+
+
+class OCREngineRegistry:
+    """
+    Реестр OCR движков: один easyocr.Reader на набор языков на весь процесс.
+    
+    Модели загружаются лениво в фоновом потоке - при первом использовании
+    или заранее через preload() (например, в post_init бота).
+    """
+    
+    def __init__(self, gpu: bool = False):
+        self.gpu = gpu
+        self._lock = threading.Lock()
+        self._slots: Dict[Tuple[str, ...], _EngineSlot] = {}
+    
+    @property
+    def supported(self) -> bool:
+        """Установлен ли easyocr"""
+        return OCR_AVAILABLE
+    
+    def preload(self, languages: Sequence[str] = DEFAULT_LANGUAGES) -> None:
+        """Запуск фоновой загрузки движка без ожидания"""
+        if OCR_AVAILABLE:
+            self._ensure_loading(tuple(languages))
+    
+    def get_reader(self, languages: Sequence[str] = DEFAULT_LANGUAGES,
+                   wait: bool = True, timeout: Optional[float] = None):
+        """
+        Получение общего easyocr.Reader
+        
+        Args:
+            languages: Языки распознавания
+            wait: Ждать окончания загрузки, если движок еще загружается
+            timeout: Максимальное время ожидания (None - без ограничения)
+        
+        Returns:
+            easyocr.Reader или None, если OCR недоступен или еще не загружен
+        """
+        if not OCR_AVAILABLE:
+            return None
+        
+        slot = self._ensure_loading(tuple(languages))
+        if wait:
+            slot.ready.wait(timeout)
+        return slot.reader
+    
+    def status(self, languages: Sequence[str] = DEFAULT_LANGUAGES) -> str:
+        """Состояние движка: unavailable, not_loaded, loading, ready, failed"""
+        if not OCR_AVAILABLE:
+            return "unavailable"
+        
+        slot = self._slots.get(tuple(languages))
+        if slot is None:
+            return "not_loaded"
+        if not slot.ready.is_set():
+            return "loading"
+        return "ready" if slot.reader is not None else "failed"
+    
+    def is_ready(self, languages: Sequence[str] = DEFAULT_LANGUAGES) -> bool:
+        """Загружен ли движок"""
+        return self.status(languages) == "ready"
+    
+    def describe_status(self, languages: Sequence[str] = DEFAULT_LANGUAGES) -> str:
+        """Человекочитаемый статус для /help"""
+        status = self.status(languages)
+        if status == "ready":
+            load_time = self._slots[tuple(languages)].load_time
+            return f"🟢 Готов (загружен за {load_time:.1f}с)"
+        if status == "loading":
+            return "🟡 Загружается..."
+        if status == "not_loaded":
+            return "⚪ Будет загружен при первой команде"
+        if status == "failed":
+            return "🔴 Ошибка загрузки"
+        return "🔴 Недоступен (easyocr не установлен)"
+    
+    def _ensure_loading(self, languages: Tuple[str, ...]) -> _EngineSlot:
+        """Создание слота и запуск фонового потока загрузки (однократно)"""
+        with self._lock:
+            slot = self._slots.get(languages)
+            if slot is None:
+                slot = _EngineSlot(languages)
+                slot.thread = threading.Thread(
+                    target=self._load,
+                    args=(slot,),
+                    name=f"ocr-load-{'-'.join(languages)}",
+                    daemon=True
+                )
+                self._slots[languages] = slot
+                slot.thread.start()
+            return slot
+    
+    def _load(self, slot: _EngineSlot) -> None:
+        """Загрузка моделей easyocr (выполняется в фоновом потоке)"""
+        start_time = time.monotonic()
+        try:
+            print(f"🔤 Загружаем OCR модели {list(slot.languages)}...")
+            slot.reader = easyocr.Reader(list(slot.languages), gpu=self.gpu)
+            slot.load_time = time.monotonic() - start_time
+            print(f"✅ OCR модели загружены за {slot.load_time:.1f}с")
+        except Exception as e:
+            slot.error = e
+            print(f"❌ Ошибка загрузки OCR моделей: {e}")
+        finally:
+            slot.ready.set()
+
+
+# Единый реестр на процесс
+ocr_engines = OCREngineRegistry()
@@ -0,0 +1,52 @@
+"""
+Индекс сцены: результаты одного анализа кадра для многократного поиска
+"""
+from typing import List, Optional, Tuple
+
+from .models import GameElement
+
+
+class SceneIndex:
+    """
+    Все, что детектор знает о кадре: OCR строки и UI контуры.
+    
+    Строится один раз на кадр, после чего любое количество целей
+    ищется без повторного OCR и контурного анализа.
+    """
+    
+    def __init__(self, size: Tuple[int, int], ocr_results: Optional[list],
+                 ui_elements: List[GameElement]):
+        self.size = size
+        self.ocr_results = ocr_results or []
+        self.ui_elements = ui_elements
+        
+        self.text_elements: List[GameElement] = [
+            self._text_element(bbox, text, confidence)
+            for bbox, text, confidence in self.ocr_results
+        ]
+        
+        # Нечеткий индекс строится по требованию (см. OCRDetector.build_matcher)
+        self.matcher = None
+    
+    @property
+    def has_text(self) -> bool:
+        """Есть ли OCR результаты"""
+        return bool(self.ocr_results)
+    
+    @staticmethod
+    def _text_element(bbox, text: str, confidence: float) -> GameElement:
+        """GameElement для OCR строки"""
+        xs = [int(point[0]) for point in bbox]
+        ys = [int(point[1]) for point in bbox]
+        x1, y1, x2, y2 = min(xs), min(ys), max(xs), max(ys)
+        return GameElement(
+            name=text,
+            center_x=(x1 + x2) // 2,
+            center_y=(y1 + y2) // 2,
+            width=x2 - x1,
+            height=y2 - y1,
+            confidence=confidence,
+            method="ocr_text",
+            text_found=text,
+            bbox=(x1, y1, x2, y2)
+        )
@@ -4,12 +4,15 @@
 import asyncio
 import platform
 from typing import Optional, Tuple, Dict, Any
-from PIL import Image, ImageGrab
+from PIL import Image
 import cv2
 import numpy as np
 
 from ..utils.config import Config
 from ..llm.agent import LLMAgent
+from ..utils.executor import executors
+from .capture import create_capture_backend
+from .settle import ScreenSettler
 
 
 class ScreenAnalyzer:
@@ -22,10 +25,22 @@ class ScreenAnalyzer:
         self.last_screenshot = None
         self.last_screenshot_time = 0
         
+        # Бэкенд захвата: X11 напрямую, screenshot-tool как запасной вариант
+        self.capture = create_capture_backend(self.window_title, config.game.capture_backend)
+        
+        # Ожидание реакции игры на действия по изменению кадров
+        # (только с захватом массивом, иначе - фиксированная пауза)
+        self.settler = None
+        if config.game.settle.enabled:
+            if self.capture.has_array_grab:
+                self.settler = ScreenSettler(self.capture.grab_array, config.game.settle)
+            else:
+                print("⚠️  Ожидание реакции экрана недоступно без захвата X11, используется фиксированная пауза")
+        
         # Инициализируем детектор элементов
         try:
             from .element_detector import GameElementDetector
-            self.element_detector = GameElementDetector()
+            self.element_detector = GameElementDetector(config.vision.ocr)
             print("✅ Детектор элементов инициализирован в ScreenAnalyzer")
         except Exception as e:
             print(f"⚠️ Детектор элементов недоступен в ScreenAnalyzer: {e}")
@@ -43,62 +58,20 @@ class ScreenAnalyzer:
             if platform.system() != "Linux":
                 print("❌ Этот проект поддерживает только Steam Deck (Linux)")
                 return None
-                
+            
             return await self._take_screenshot_linux()
-                
+        
         except Exception as e:
             print(f"Error taking screenshot: {e}")
             return None
     
     async def _take_screenshot_linux(self) -> Optional[Image.Image]:
-        """Захват скриншота в Linux (Steam Deck)"""
-        try:
-            # Используем системную команду для захвата окна
-            import subprocess
-            import tempfile
-            import os
-            
-            # Используем упрощенный инструмент для Steam Deck
-            with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as tmp_file:
-                cmd_screenshot = f"screenshot-tool {tmp_file.name} '{self.window_title}'"
-                print(f"📸 Создаем скриншот: {cmd_screenshot}")
-                
-                result = subprocess.run(
-                    cmd_screenshot, 
-                    shell=True, 
-                    check=True, 
-                    capture_output=True, 
-                    text=True,
-                    timeout=10  # Увеличили таймаут
-                )
-                
-                print(f"✅ Скриншот создан: {tmp_file.name}")
-                if result.stdout:
-                    print(f"📝 Вывод: {result.stdout.strip()}")
-                
-                screenshot = Image.open(tmp_file.name)
-                print(f"🖼️  Размер изображения: {screenshot.size}")
-                os.unlink(tmp_file.name)
-                return screenshot
-                
-        except Exception as e:
-            error_msg = str(e)
-            print(f"Linux screenshot error: {error_msg}")
-            
-            # Проверяем на конкретные ошибки и даем советы
-            if "screenshot-tool" in error_msg or "convert" in error_msg or "xwd" in error_msg:
-                print("💡 Проблема с инструментами для скриншотов.")
-                print("   Запустите: ./install.sh --reinstall")
-                print("   Или установите вручную: sudo pacman -S grim (для Wayland) или scrot (для X11)")
-            
-            # Fallback на обычный скриншот экрана
-            try:
-                return ImageGrab.grab()
-            except Exception as fallback_e:
-                print(f"Fallback screenshot also failed: {fallback_e}")
-                return None
+        """Захват скриншота в Linux (Steam Deck) через цепочку бэкендов"""
+        screenshot = await executors.run_capture(self.capture.grab)
+        if screenshot is not None and screenshot.mode != 'RGB':
+            screenshot = screenshot.convert('RGB')
+        return screenshot
     
-
     async def describe_screen(self, screenshot: Optional[Image.Image] = None) -> Optional[str]:
         """
         Получение описания того, что происходит на экране
@@ -126,7 +99,7 @@ class ScreenAnalyzer:
             description = await self.llm_agent.describe_screen(screenshot)
             
             return description
-            
+        
         except Exception as e:
             print(f"Error describing screen: {e}")
             return None
@@ -134,11 +107,12 @@ class ScreenAnalyzer:
     def _optimize_screenshot(self, screenshot: Image.Image) -> Image.Image:
         """
         Подготовка скриншота для отправки в LLM
-        Скриншот передается без изменения размера для точного позиционирования
+        Размер не меняется: уменьшение и сжатие делает PayloadEncoder агента,
+        который переводит координаты ответа обратно в исходный кадр
         
         Args:
             screenshot: Исходный скриншот
-            
+        
         Returns:
             Скриншот в формате RGB без изменения размера
         """
@@ -160,7 +134,7 @@ class ScreenAnalyzer:
         if platform.system() != 'Linux':
             print("⚠️  Автоматическое определение размера окна доступно только на Linux")
             return None
-            
+        
         try:
             import subprocess
             
@@ -198,13 +172,13 @@ class ScreenAnalyzer:
                                             return (width, height)
                             except (subprocess.TimeoutExpired, ValueError, IndexError):
                                 continue
-                                
+                
                 except subprocess.TimeoutExpired:
                     continue
-                    
+        
         except Exception as e:
             print(f"❌ Ошибка при получении размера окна игры: {e}")
-            
+        
         print("⚠️  Окно игры не найдено, будет использован размер скриншота")
         return None
     
@@ -219,13 +193,13 @@ class ScreenAnalyzer:
         game_window_size = self._get_game_window_size()
         if game_window_size:
             return game_window_size
-            
+        
         # Если не удалось определить размер окна, используем размер последнего скриншота
         if self.last_screenshot:
             width, height = self.last_screenshot.size
             print(f"📐 Используем размер скриншота: {width}x{height}")
             return (width, height)
-            
+        
         # Fallback - типичное разрешение для Steam Deck
         print("⚠️  Не удалось определить разрешение игры, используем 1280x800")
         return (1280, 800)
@@ -236,7 +210,7 @@ class ScreenAnalyzer:
         
         Args:
             screenshot: Скриншот для анализа (если None, берется последний)
-            
+        
         Returns:
             Словарь с найденными элементами UI
         """
@@ -262,7 +236,7 @@ class ScreenAnalyzer:
             elements['dialogs'] = self._find_dialogs(cv_image)
             
             return elements
-            
+        
         except Exception as e:
             print(f"Error finding UI elements: {e}")
             return {}
@@ -340,7 +314,7 @@ class ScreenAnalyzer:
         
         Args:
             target: Название элемента для поиска
-            
+        
         Returns:
             Информация об элементе с точными координатами
         """
@@ -355,7 +329,7 @@ class ScreenAnalyzer:
                 return None
             
             # Используем детектор для поиска
-            element = self.element_detector.find_element(screenshot, target)
+            element = await executors.run_vision(self.element_detector.find_element, screenshot, target)
             
             if element:
                 return {
@@ -366,7 +340,7 @@ class ScreenAnalyzer:
                 }
             
             return None
-            
+        
         except Exception as e:
             print(f"❌ Ошибка поиска элемента '{target}': {e}")
             return None
@@ -374,4 +348,6 @@ class ScreenAnalyzer:
     async def close(self):
         """Закрытие ресурсов"""
         if hasattr(self, 'llm_agent'):
-            await self.llm_agent.close()
\ No newline at end of file
+            await self.llm_agent.close()
+        if hasattr(self, 'capture'):
+            self.capture.close()
\ No newline at end of file
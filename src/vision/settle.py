@@ -0,0 +1,114 @@
+"""
+Ожидание реакции игры на действие по изменению кадров
+"""
+import asyncio
+import time
+from typing import Callable, Optional
+
+import cv2
+import numpy as np
+
+from ..utils.config import SettleConfig
+from ..utils.executor import executors
+from ..utils.tracing import tracer
+from .frame_diff import changed_fraction, to_gray
+
+
+class ScreenSettler:
+    """
+    «Дождаться, пока экран успокоится» вместо фиксированных пауз.
+    
+    Опрашивает уменьшенные серые кадры: сначала (если есть кадр до действия)
+    ждет, пока экран изменится, затем - пока изменения между соседними
+    кадрами не станут меньше порога несколько опросов подряд.
+    Быстрый отклик интерфейса возвращается сразу, долгие переходы
+    дожидаются до timeout. Нужен дешевый захват массивом (X11): захват
+    через скрипт на каждый опрос запускал бы отдельный процесс.
+    """
+    
+    def __init__(self, grab_array: Callable[[], Optional[np.ndarray]], config: SettleConfig):
+        self.grab_array = grab_array
+        self.poll_interval = config.poll_interval
+        self.threshold = config.threshold
+        self.stable_polls = config.stable_polls
+        self.react_timeout = config.react_timeout
+        self.timeout = config.timeout
+        self.thumb_width = config.thumb_width
+    
+    def _thumbnail(self) -> Optional[np.ndarray]:
+        """Уменьшенный серый кадр (блокирующий вызов)"""
+        frame = self.grab_array()
+        if frame is None:
+            return None
+        
+        gray = to_gray(frame)
+        height, width = gray.shape[:2]
+        if width > self.thumb_width:
+            size = (self.thumb_width, max(1, height * self.thumb_width // width))
+            gray = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+        return gray
+    
+    async def snapshot(self) -> Optional[np.ndarray]:
+        """Кадр до действия (для wait)"""
+        return await executors.run_capture(self._thumbnail)
+    
+    async def wait(self, baseline: Optional[np.ndarray] = None,
+                   timeout: Optional[float] = None) -> bool:
+        """
+        Ожидание стабильного экрана
+        
+        Args:
+            baseline: Кадр до действия - сначала ждем, пока экран отреагирует
+            timeout: Максимальное ожидание (по умолчанию из конфигурации)
+        
+        Returns:
+            True если экран успокоился, False по таймауту или без захвата
+        """
+        with tracer.span('settle') as span:
+            settled = await self._wait(baseline, timeout)
+            span.attrs['settled'] = settled
+            return settled
+    
+    async def _wait(self, baseline: Optional[np.ndarray] = None,
+                    timeout: Optional[float] = None) -> bool:
+        """Опрос кадров: реакция на действие, затем стабильность"""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.time()
+        deadline = start + timeout
+        
+        previous = await self.snapshot()
+        if previous is None:
+            return False
+        
+        # Фаза 1: реакция на действие (интерфейс мог еще не перерисоваться)
+        if baseline is not None and baseline.shape == previous.shape:
+            react_deadline = min(deadline, start + self.react_timeout)
+            while changed_fraction(baseline, previous) < self.threshold:
+                if time.time() >= react_deadline:
+                    # Экран не изменился - действие без видимого эффекта
+                    return True
+                await asyncio.sleep(self.poll_interval)
+                current = await self.snapshot()
+                if current is None or current.shape != previous.shape:
+                    return False
+                previous = current
+        
+        # Фаза 2: экран перестал меняться
+        stable = 0
+        while time.time() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            current = await self.snapshot()
+            if current is None or current.shape != previous.shape:
+                return False
+            
+            if changed_fraction(previous, current) < self.threshold:
+                stable += 1
+                if stable >= self.stable_polls:
+                    print(f"⏱️  Экран стабилен через {time.time() - start:.2f}с")
+                    return True
+            else:
+                stable = 0
+            previous = current
+        
+        print(f"⏱️  Экран не успокоился за {timeout:.1f}с")
+        return False
@@ -0,0 +1,106 @@
+"""
+Постоянная раскладка распознанного текста с инкрементальным обновлением
+"""
+from typing import Any, Callable, List
+
+import numpy as np
+
+from .frame_diff import FrameDiffTracker, Rect, merge_rects, rect_area, rects_intersect, rect_union
+
+
+# Формат easyocr: (bbox из 4 точек, текст, уверенность)
+OCRResult = Any
+ReadFn = Callable[[np.ndarray], List[OCRResult]]
+
+
+def result_rect(result: OCRResult) -> Rect:
+    """Описывающий прямоугольник OCR результата"""
+    points = np.array(result[0])
+    return (int(np.min(points[:, 0])), int(np.min(points[:, 1])),
+            int(np.max(points[:, 0])), int(np.max(points[:, 1])))
+
+
+class TextLayout:
+    """
+    Текстовая раскладка сессии: хранит OCR результаты последнего кадра
+    и перераспознает только изменившиеся области следующих кадров.
+    """
+    
+    def __init__(self, tile_size: int = 64, full_refresh_ratio: float = 0.5,
+                 max_incremental_updates: int = 20):
+        self.tracker = FrameDiffTracker(tile_size=tile_size)
+        self.full_refresh_ratio = full_refresh_ratio
+        self.max_incremental_updates = max_incremental_updates
+        self.results: List[OCRResult] = []
+        self._incremental_updates = 0
+        self.last_update_kind = "none"
+    
+    def reset(self) -> None:
+        """Сброс раскладки (следующий кадр распознается целиком)"""
+        self.tracker.reset()
+        self.results = []
+        self._incremental_updates = 0
+    
+    def adopt(self, cv_image: np.ndarray, results: List[OCRResult]) -> None:
+        """Принять готовые результаты для кадра (например, из кэша)"""
+        self.tracker.update(cv_image)
+        self.results = list(results)
+        self._incremental_updates = 0
+    
+    def update(self, cv_image: np.ndarray, read_fn: ReadFn) -> List[OCRResult]:
+        """
+        Обновление раскладки по новому кадру
+        
+        Args:
+            cv_image: Кадр в формате OpenCV
+            read_fn: Функция OCR (обычно reader.readtext)
+        
+        Returns:
+            Актуальные OCR результаты в координатах полного кадра
+        """
+        regions = self.tracker.update(cv_image)
+        height, width = cv_image.shape[:2]
+        
+        if regions is None or self._needs_full_refresh(regions, width * height):
+            self.results = list(read_fn(cv_image))
+            self._incremental_updates = 0
+            self.last_update_kind = "full"
+            return self.results
+        
+        if not regions:
+            self.last_update_kind = "unchanged"
+            return self.results
+        
+        # Текст, задетый изменениями, перечитываем целиком вместе с областью
+        kept = []
+        for result in self.results:
+            rect = result_rect(result)
+            touched = False
+            for i, region in enumerate(regions):
+                if rects_intersect(rect, region):
+                    regions[i] = rect_union(region, rect)
+                    touched = True
+            if not touched:
+                kept.append(result)
+        
+        regions = merge_rects(regions)
+        kept = [result for result in kept
+                if not any(rects_intersect(result_rect(result), region) for region in regions)]
+        
+        for x1, y1, x2, y2 in regions:
+            crop = np.ascontiguousarray(cv_image[y1:y2, x1:x2])
+            for bbox, text, confidence in read_fn(crop):
+                shifted = [[point[0] + x1, point[1] + y1] for point in bbox]
+                kept.append((shifted, text, confidence))
+        
+        self.results = kept
+        self._incremental_updates += 1
+        self.last_update_kind = f"regions:{len(regions)}"
+        return self.results
+    
+    def _needs_full_refresh(self, regions: List[Rect], frame_area: int) -> bool:
+        """Полное распознавание, если изменилась большая часть кадра или накопился дрейф"""
+        if self._incremental_updates >= self.max_incremental_updates:
+            return True
+        dirty_area = sum(rect_area(region) for region in regions)
+        return dirty_area > frame_area * self.full_refresh_ratio
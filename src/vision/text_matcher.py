@@ -0,0 +1,166 @@
+"""
+Нечеткое сопоставление текста для OCR (триграммы + редакционное расстояние)
+"""
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Generic, List, Set, Tuple, TypeVar
+
+
+T = TypeVar('T')
+
+_CYRILLIC_RE = re.compile(r"[а-я]")
+_LATIN_RE = re.compile(r"[a-z]")
+_SPACES_RE = re.compile(r"\s+")
+_PUNCT_RE = re.compile(r"[^\w\s]", re.UNICODE)
+
+# Латинские буквы, которые OCR путает с кириллическими (и наоборот)
+_LATIN_TO_CYRILLIC = str.maketrans("aeopcxykmhtb", "аеорсхукмнтв")
+_CYRILLIC_TO_LATIN_LOOKALIKE = str.maketrans("аеорсхукмнтв", "aeopcxykmhtb")
+
+_TRANSLIT = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ж': 'zh',
+    'з': 'z', 'и': 'i', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n',
+    'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f',
+    'х': 'h', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch', 'ъ': '', 'ы': 'y',
+    'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+}
+
+
+def fold_text(text: str) -> str:
+    """
+    Нормализация для сравнения: регистр, диакритика (ё -> е, й -> и),
+    пунктуация, пробелы и смешение латиницы с кириллицей в одном слове
+    """
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    stripped = _SPACES_RE.sub(' ', _PUNCT_RE.sub(' ', stripped)).strip()
+    
+    words = []
+    for word in stripped.split(' '):
+        cyrillic = len(_CYRILLIC_RE.findall(word))
+        latin = len(_LATIN_RE.findall(word))
+        if cyrillic and latin:
+            # OCR перепутал похожие буквы - приводим к преобладающему алфавиту
+            if cyrillic >= latin:
+                word = word.translate(_LATIN_TO_CYRILLIC)
+            else:
+                word = word.translate(_CYRILLIC_TO_LATIN_LOOKALIKE)
+        words.append(word)
+    return ' '.join(words)
+
+
+def transliterate(text: str) -> str:
+    """Транслитерация кириллицы в латиницу (текст должен быть уже нормализован)"""
+    return ''.join(_TRANSLIT.get(ch, ch) for ch in text)
+
+
+def match_key(text: str) -> str:
+    """Ключ сравнения: нормализованный и транслитерированный текст"""
+    return transliterate(fold_text(text))
+
+
+def levenshtein(a: str, b: str) -> int:
+    """Редакционное расстояние Левенштейна"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ch_a in enumerate(a, 1):
+        current = [i]
+        for j, ch_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ch_a != ch_b)
+            ))
+        previous = current
+    return previous[-1]
+
+
+def similarity(a: str, b: str) -> float:
+    """Нормализованная схожесть 0..1 по расстоянию Левенштейна"""
+    if not a and not b:
+        return 1.0
+    return 1.0 - levenshtein(a, b) / max(len(a), len(b))
+
+
+def partial_similarity(a: str, b: str) -> float:
+    """Лучшая схожесть короткой строки с подстрокой длинной той же длины"""
+    short, long = (a, b) if len(a) <= len(b) else (b, a)
+    if not short:
+        return 0.0
+    window = len(short)
+    return max(
+        similarity(short, long[start:start + window])
+        for start in range(len(long) - window + 1)
+    )
+
+
+def trigrams(key: str) -> Set[str]:
+    """Триграммы ключа с граничными пробелами"""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TextMatchIndex(Generic[T]):
+    """
+    Триграммный индекс по строкам с ранжированием кандидатов
+    по нормализованному расстоянию Левенштейна
+    """
+    
+    # Штраф за совпадение только с частью строки
+    PARTIAL_WEIGHT = 0.9
+    # Фрагмент OCR короче запроса засчитывается, только если покрывает его большую часть
+    MIN_FRAGMENT_RATIO = 0.6
+    
+    def __init__(self, entries: List[Tuple[str, T]]):
+        self._keys: List[str] = []
+        self._payloads: List[T] = []
+        self._index: Dict[str, List[int]] = defaultdict(list)
+        
+        for text, payload in entries:
+            key = match_key(text)
+            if not key:
+                continue
+            entry_id = len(self._keys)
+            self._keys.append(key)
+            self._payloads.append(payload)
+            for gram in trigrams(key):
+                self._index[gram].append(entry_id)
+    
+    def __len__(self) -> int:
+        return len(self._keys)
+    
+    def search(self, query: str, min_score: float = 0.75, limit: int = 5) -> List[Tuple[T, float]]:
+        """
+        Поиск похожих строк
+        
+        Args:
+            query: Искомый текст
+            min_score: Минимальная схожесть 0..1
+            limit: Максимум результатов
+        
+        Returns:
+            [(payload, score), ...] по убыванию схожести
+        """
+        key = match_key(query)
+        if not key:
+            return []
+        
+        # Кандидаты - строки с общими триграммами
+        overlap: Dict[int, int] = defaultdict(int)
+        for gram in trigrams(key):
+            for entry_id in self._index.get(gram, ()):
+                overlap[entry_id] += 1
+        
+        scored = []
+        for entry_id in overlap:
+            candidate_key = self._keys[entry_id]
+            score = similarity(key, candidate_key)
+            if len(candidate_key) >= len(key) * self.MIN_FRAGMENT_RATIO:
+                score = max(score, partial_similarity(key, candidate_key) * self.PARTIAL_WEIGHT)
+            if score >= min_score:
+                scored.append((self._payloads[entry_id], score))
+        
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:limit]
@@ -12,22 +12,34 @@ class UIDetector:
     
     def find_ui_elements(self, cv_image: np.ndarray, target: str) -> List[GameElement]:
         """Поиск UI элементов (кнопки, поля и т.д.)"""
-        candidates = []
-        
         # Конвертируем в серый для анализа
         gray = cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
         
+        return self.detect(gray)
+    
+    def detect(self, gray: np.ndarray) -> List[GameElement]:
+        """
+        Поиск всех UI элементов на кадре (не зависит от цели поиска)
+        
+        Args:
+            gray: Кадр в градациях серого
+            
+        Returns:
+            Кнопки и контурные элементы
+        """
+        candidates = []
+        
         # Поиск прямоугольных элементов (кнопки)
-        button_candidates = self._find_buttons(gray, target)
+        button_candidates = self._find_buttons(gray)
         candidates.extend(button_candidates)
         
         # Поиск контуров
-        contour_candidates = self._find_contours(gray, target)
+        contour_candidates = self._find_contours(gray)
         candidates.extend(contour_candidates)
         
         return candidates
     
-    def _find_buttons(self, gray: np.ndarray, target: str) -> List[GameElement]:
+    def _find_buttons(self, gray: np.ndarray) -> List[GameElement]:
         """Поиск кнопочных элементов"""
         candidates = []
         
@@ -69,7 +81,7 @@ class UIDetector:
         
         return candidates
     
-    def _find_contours(self, gray: np.ndarray, target: str) -> List[GameElement]:
+    def _find_contours(self, gray: np.ndarray) -> List[GameElement]:
         """Поиск контурных элементов"""
         candidates = []
         